@@ -0,0 +1,84 @@
+# 對照 clean.py 的整欄版本與逐格版本：結果（含 dtype 與 NaN / NaT 位置）必須完全相同；
+# 另外確認 clean_one_csv 的結果不受分塊大小影響
+# 執行：python data/scripts/check_vectorized.py（在專案根目錄）
+import glob, os, sys, time
+import numpy as np, pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import clean
+
+EDGE_DATES = ["1100105", " 1100105 ", "1100230", "0000000", "110010", "11001050", "abcdefg",
+              "1101301", "", np.nan, None, "1120229", "1130229", "1100105.0"]
+EDGE_NUMBERS = ["1,234", " 12.5 ", "-3", "--3", "1.2.3", "", "abc", np.nan, None, "NT$ 9,999.9",
+                ".5", "5.", "-", "1-2", "1e5"]
+EDGE_FLOORS = ["十二層", "十層", "三十一層", "五層", "全", "頂樓加蓋", "陽台", "", "12", "一層，陽台",
+               "地下一層", np.nan, None, "三層，四層", "二十層"]
+
+def same(a: pd.Series, b: pd.Series) -> bool:
+    if a.dtype != b.dtype:
+        print(f"    dtype 不同: {a.dtype} vs {b.dtype}")
+        return False
+    if a.isna().tolist() != b.isna().tolist():
+        return False
+    return a[a.notna()].tolist() == b[b.notna()].tolist()
+
+def compare(name, s, scalar, vector) -> bool:
+    t0 = time.perf_counter()
+    try:
+        old = scalar(s)
+    except Exception as e:
+        old = e
+    t1 = time.perf_counter()
+    try:
+        new = vector(s)
+    except Exception as e:
+        new = e
+    t2 = time.perf_counter()
+    if isinstance(old, Exception) or isinstance(new, Exception):
+        ok = type(old) is type(new)
+        print(f"{'OK ' if ok else 'BAD'} {name}: 例外 {old!r} / {new!r}")
+        return ok
+    ok = same(old, new)
+    print(f"{'OK ' if ok else 'BAD'} {name}: {len(s):,} 筆，逐格 {t1 - t0:.3f}s / 整欄 {t2 - t1:.3f}s")
+    return ok
+
+def date_pair(s):
+    return (lambda x: pd.to_datetime(x.apply(clean.to_AD_date), errors="coerce"), clean.to_AD_date_series)
+
+def main():
+    ok = True
+    ok &= compare("邊界日期", pd.Series(EDGE_DATES, dtype=object), *date_pair(None))
+    ok &= compare("邊界數字", pd.Series(EDGE_NUMBERS, dtype=object),
+                  lambda x: x.apply(clean.to_number), clean.to_number_series)
+    ok &= compare("邊界樓層", pd.Series(EDGE_FLOORS, dtype=object),
+                  lambda x: x.apply(clean.cn_floor_to_int), clean.cn_floor_series)
+
+    for path in sorted(glob.glob(os.path.join(clean.RAW_DIR, "*.csv"))):
+        df = pd.read_csv(path, encoding="utf-8", low_memory=False)
+        df = df.rename(columns={k: v for k, v in clean.COLMAP.items() if k in df.columns})
+        base = os.path.basename(path)
+        for c in ["trade_date", "build_complete_date"]:
+            ok &= compare(f"{base} {c}", df[c], *date_pair(None))
+        for c in ["building_area_m2", "price_total", "unit_price_m2", "layout_room", "layout_living",
+                  "layout_bath", "parking_area_m2", "parking_price",
+                  "main_building_area_m2", "accessory_area_m2", "balcony_area_m2"]:
+            if c in df.columns:
+                ok &= compare(f"{base} {c}", df[c], lambda x: x.apply(clean.to_number), clean.to_number_series)
+        for c in ["total_floors", "transfer_floor"]:
+            ok &= compare(f"{base} {c}", df[c], lambda x: x.apply(clean.cn_floor_to_int), clean.cn_floor_series)
+            # 分塊讀取時樓層欄是 category
+            ok &= compare(f"{base} {c} (category)", df[c].astype("category"),
+                          lambda x: x.astype(object).apply(clean.cn_floor_to_int), clean.cn_floor_series)
+
+        # 分塊大小不影響結果：小分塊（類別聯集、跨塊排序）與整檔一次讀入相同
+        whole, removed = clean.clean_one_csv(path, chunk_rows=10**9)
+        small, removed_small = clean.clean_one_csv(path, chunk_rows=997)
+        same_chunks = removed == removed_small and whole.equals(small)
+        print(f"{'OK ' if same_chunks else 'BAD'} {base} 分塊 997 列 vs 整檔")
+        ok &= same_chunks
+
+    print("\n✅ 全部一致" if ok else "\n❌ 有不一致的結果")
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,11 +2,22 @@
 # glob：抓資料夾中符合條件的檔案路徑。
 # os：路徑/目錄操作。
 # re：正規表達式（清掉逗號等符號）。
+# concurrent.futures：多個季度檔平行清理（--workers）。
+# hashlib / json：逐檔快取的 manifest（只重新清理新增或變動的檔案）。
 import pandas as pd, numpy as np, glob, os, re
+import argparse, hashlib, json
+from concurrent.futures import ProcessPoolExecutor
 
 RAW_DIR = "data/raw"
 CLEAN_DIR = "data/clean"
 QC_DIR = "data/qc"
+# 逐檔清理結果的快取：每個原始檔一個 .pkl（DataFrame 逐欄保存，dtype 不變），
+# manifest 記錄 原始檔路徑 → 大小 / mtime / SHA-256 / 清理結果
+CACHE_DIR = os.path.join(CLEAN_DIR, "cache")
+MANIFEST_PATH = os.path.join(CACHE_DIR, "manifest.json")
+CLEAN_VERSION = 3  # clean_one_csv 的輸出改變時遞增，讓舊快取全部失效
+# 每次讀入的列數：原始檔分塊讀取、逐塊清理，記憶體用量取決於分塊大小而不是檔案大小
+CHUNK_ROWS = int(os.getenv("CLEAN_CHUNK_ROWS", 50000))
 os.makedirs(CLEAN_DIR, exist_ok=True)
 os.makedirs(QC_DIR, exist_ok=True)
 
@@ -59,6 +70,46 @@ COLMAP = {
     "移轉編號": "transfer_id",
 }
 
+# 原始欄位的型別（以中文欄名宣告，read_csv 直接解析，不先讀成 object 再轉）
+#   - category：重複值多的代碼型欄位（地區、用途、樓層描述等）
+#   - float64：面積、金額、房廳衛（可能空白，不能用 int）
+#   - str：日期（民國年有前導 0，不能當數字讀）、門牌、編號、備註等自由文字
+SOURCE_DTYPES = {
+    "鄉鎮市區": "category",
+    "土地位置建物門牌": "str",
+    "交易標的": "category",
+    "交易年月日": "str",
+    "交易筆棟數": "str",
+    "建物型態": "category",
+    "主要用途": "category",
+    "主要建材": "category",
+    "建築完成年月": "str",
+    "總樓層數": "category",
+    "移轉層次": "category",
+    "建物移轉總面積平方公尺": "float64",
+    "主建物面積": "float64",
+    "附屬建物面積": "float64",
+    "陽台面積": "float64",
+    "土地移轉總面積平方公尺": "float64",
+    "總價元": "float64",
+    "單價元平方公尺": "float64",
+    "建物現況格局-房": "float64",
+    "建物現況格局-廳": "float64",
+    "建物現況格局-衛": "float64",
+    "建物現況格局-隔間": "category",
+    "車位類別": "category",
+    "車位移轉總面積平方公尺": "float64",
+    "車位總價元": "float64",
+    "都市土地使用分區": "category",
+    "非都市土地使用分區": "category",
+    "非都市土地使用編定": "category",
+    "有無管理組織": "category",
+    "電梯": "category",
+    "備註": "str",
+    "編號": "str",
+    "移轉編號": "str",
+}
+
 # 想要保留的欄位
 KEEP_COLS = [
     "city",
@@ -152,8 +203,91 @@ def cn_floor_to_int(s):
     if pd.isna(val): return np.nan # 非一般中英文數字的描述，回傳 NaN（保留彈性以便後續擴充特殊處理）
     return int(val)
 
-def clean_one_csv(path):
-    df = pd.read_csv(path, encoding="utf-8", low_memory=False)
+# -----整欄版本（結果與上面逐格的函式相同，對照見 check_vectorized.py）-----
+# 日期、房廳衛等欄位重複值很多：先 factorize，只轉換不重複值，再依 codes 展開
+def _by_unique(s, fn):
+    codes, uniques = pd.factorize(s)
+    vals = fn(pd.Series(uniques, dtype=s.dtype))
+    out = pd.api.extensions.take(vals.array, codes, allow_fill=True)  # code -1（NaN）→ NaN / NaT
+    return pd.Series(out, index=s.index, name=s.name)
+
+# tool: 民國->西元年月日（整欄）：字串切片 + 整數運算，不逐列建立 Timestamp
+def to_AD_date_series(s):
+    return _by_unique(s, _to_AD_date_unique)
+
+def _to_AD_date_unique(s):
+    t = s.astype(str).str.strip()
+    ok = t.str.fullmatch(r"\d{7}").fillna(False).astype(bool)
+    digits = t.where(ok, "0000101")  # 無效值先填合法日期，最後再設回 NaT
+    parts = pd.DataFrame({
+        "year": pd.to_numeric(digits.str[:3]) + 1911,
+        "month": pd.to_numeric(digits.str[3:5]),
+        "day": pd.to_numeric(digits.str[5:7]),
+    })
+    out = pd.to_datetime(parts, errors="coerce")  # 不存在的日期（例如 2 月 30 日）為 NaT
+    return out.where(ok)
+
+# tool: 轉數字（整欄）：一次 str.replace，再整欄 astype(float)
+# 不用 to_numeric：它的快速解析在最後一位可能與 float() 不同（例如 108.21000000000001）
+FLOAT_RE = r"-?(?:\d+\.?\d*|\.\d+)"
+def to_number_series(s):
+    if pd.api.types.is_numeric_dtype(s):
+        return s.astype(float)
+    return _by_unique(s, _to_number_unique)
+
+def _to_number_unique(s):
+    t = s.astype(str).str.strip().str.replace(r"[^\d\.-]", "", regex=True)
+    ok = t.str.fullmatch(FLOAT_RE).fillna(False).astype(bool)  # float() 會失敗的字串設為 NaN
+    return t.where(ok, "nan").astype(float)
+
+# tool: 樓層字串->數字（整欄）：只對不重複值呼叫 cn_floor_to_int，再依 codes 展開
+# （不用 s.map：category 欄的 map 結果型別會隨對應值是否重複而改變）
+def cn_floor_series(s):
+    codes, uniques = pd.factorize(s)
+    vals = pd.Series([cn_floor_to_int(u) for u in uniques], dtype=None if len(uniques) else float)
+    out = pd.api.extensions.take(vals.to_numpy(), codes, allow_fill=True)
+    return pd.Series(out, index=s.index, name=s.name)
+
+# -----讀取原始檔-----
+def _skip_rows(path):
+    # 政府原始檔第二列是英文欄名（transaction year month and day...），讀取時直接跳過
+    first = pd.read_csv(path, encoding="utf-8", nrows=1, dtype=str)
+    date = first["交易年月日"].iloc[0] if len(first) and "交易年月日" in first.columns else None
+    return [1] if isinstance(date, str) and not date.strip().isdigit() else None
+
+def read_chunks(path, chunk_rows=CHUNK_ROWS, typed=True):
+    # 依 SOURCE_DTYPES 分塊讀取；typed=False 時數值欄也讀成字串（交給 to_number_series 清理）
+    dtypes = SOURCE_DTYPES if typed else {k: ("str" if v == "float64" else v) for k, v in SOURCE_DTYPES.items()}
+    # round_trip：與 float(字串) 的結果逐位相同
+    return pd.read_csv(path, encoding="utf-8", dtype=dtypes, skiprows=_skip_rows(path),
+                       chunksize=chunk_rows, float_precision="round_trip")
+
+def _concat_column(parts):
+    # 各分塊的 category 類別不同，先取聯集（依字串排序）再合併，合併後仍是 category
+    # （全空的分塊類別是 object、其餘是 str，統一成 object Index，作法同 database/dataset.py）
+    if isinstance(parts[0].dtype, pd.CategoricalDtype):
+        cats = pd.Index(sorted(set().union(*(p.cat.categories for p in parts))), dtype=object)
+        parts = [p.cat.set_categories(cats) for p in parts]
+    return pd.concat(parts, ignore_index=True)
+
+def concat_sorted(chunks, by):
+    # 合併清理後的分塊並依 by 穩定排序；逐欄合併、排序後立即釋放分塊中的該欄，
+    # 峰值只多一欄，不會同時存在「分塊」與「合併後」兩份完整資料
+    if not chunks:
+        return pd.DataFrame(columns=KEEP_COLS)
+    columns = list(chunks[0].columns)
+    keys = pd.DataFrame({c: _concat_column([ch[c] for ch in chunks]) for c in by})
+    order = keys.sort_values(by, kind="stable").index.to_numpy()
+    cols = {}
+    for c in columns:
+        col = keys[c] if c in by else _concat_column([ch[c] for ch in chunks])
+        cols[c] = col.take(order).reset_index(drop=True)
+        for ch in chunks:
+            del ch[c]
+    return pd.DataFrame(cols, columns=columns, copy=False)
+
+def clean_chunk(df):
+    # 單一分塊的清理：欄位映射 → 型別轉換 → 衍生欄位 → 過濾；回傳 (清理後的分塊, 過濾掉的列數)
     df["city"] = "NewTaipei"
 
     # -----欄位映射-----
@@ -169,8 +303,8 @@ def clean_one_csv(path):
     df = df[KEEP_COLS].copy()
 
     # -----日期處理-----
-    df["trade_date"] = pd.to_datetime(df["trade_date"].apply(to_AD_date), errors="coerce")
-    df["build_complete_date"] = pd.to_datetime(df["build_complete_date"].apply(to_AD_date), errors="coerce")
+    df["trade_date"] = to_AD_date_series(df["trade_date"])
+    df["build_complete_date"] = to_AD_date_series(df["build_complete_date"])
 
     num_cols = [
         "building_area_m2", "price_total", "unit_price_m2",
@@ -179,11 +313,11 @@ def clean_one_csv(path):
         "main_building_area_m2","accessory_area_m2","balcony_area_m2"
     ]
     for c in num_cols:
-        df[c] = df[c].apply(to_number)
+        df[c] = to_number_series(df[c])
 
     # -----樓層處理-----
-    df["total_floors_num"] = df["total_floors"].apply(cn_floor_to_int)
-    df["transfer_floor_num"] = df["transfer_floor"].apply(cn_floor_to_int)  # 暫時不處理例外
+    df["total_floors_num"] = cn_floor_series(df["total_floors"])
+    df["transfer_floor_num"] = cn_floor_series(df["transfer_floor"])  # 暫時不處理例外
 
     # -----坪數計算-----
     # 坪數 (m2 -> 坪)
@@ -205,34 +339,164 @@ def clean_one_csv(path):
     df = df[df["trade_date"].notna()] # 過濾缺失交易日期
     df = df[df["price_total"].notna() & (df["price_total"] > 100000)] # 總價要>十萬，否則廢棄(極端值)
     df = df[df["area_ping"].notna() & (df["area_ping"] > 1)] # 坪數要超過1坪
-    
-    # 去重（地區+日期+面積+總價）
-    df["dupe_key"] = (df["district"].astype(str) + "|" +
-                      df["trade_date"].astype(str) + "|" +
-                      df["area_ping"].round(2).astype(str) + "|" +
-                      df["price_total"].astype(int).astype(str))
-    df = df.drop_duplicates(subset=["dupe_key"]).drop(columns=["dupe_key"])
-
-    # 排序
-    df = df.sort_values(["city","district","trade_date"]).reset_index(drop=True)
-    removed = before - len(df)
+    return df, before - len(df)
+
+def clean_one_csv(path, chunk_rows=CHUNK_ROWS):
+    # 分塊讀取、逐塊清理，只保留過濾後的列；數值欄出現無法解析的值時改以字串重讀整個檔案
+    try:
+        parts = [clean_chunk(chunk) for chunk in read_chunks(path, chunk_rows)]
+    except ValueError as e:
+        print(f"WARN {os.path.basename(path)}: 數值欄無法直接解析（{e}），改以字串讀取")
+        parts = [clean_chunk(chunk) for chunk in read_chunks(path, chunk_rows, typed=False)]
+    removed = sum(p[1] for p in parts)  # 過濾掉的列數（缺日期、極端值）
+
+    # 去重移到合併之後（global_dedup），跨季度檔案的重複也能一併移除
+
+    # 排序（stable：同地區同日期的列維持原檔順序，去重時保留的是原檔中先出現的那筆）
+    df = concat_sorted([p[0] for p in parts], ["city","district","trade_date"])
     return df, removed
 
+# -----全域去重（地區+日期+面積+總價）-----
+def dedup_key_hash(df):
+    # 以型別欄位組成去重鍵，不建立字串；回傳 (鍵, 每列的 uint64 雜湊)
+    key = pd.DataFrame({
+        "district": pd.factorize(df["district"])[0].astype(np.int64),
+        "trade_date": df["trade_date"].to_numpy().astype("datetime64[ns]").view(np.int64),
+        "area_ping": np.rint(df["area_ping"].round(2).to_numpy() * 100).astype(np.int64),
+        "price_total": df["price_total"].to_numpy().astype(np.int64),
+    })
+    return key, pd.util.hash_pandas_object(key, index=False).to_numpy()
+
+def global_dedup(frames, names):
+    # 合併各檔並去重（保留先出現的一筆，檔案依 names 順序）
+    # 回傳 (去重後的 DataFrame, 各檔統計)；雜湊相同的列再以原始鍵確認，不會因碰撞誤刪
+    all_df = pd.concat(frames, ignore_index=True)
+    source = np.repeat(np.arange(len(frames)), [len(f) for f in frames])
+    key, h = dedup_key_hash(all_df)
+    cand = pd.Series(h).duplicated(keep=False).to_numpy()
+    dup = np.zeros(len(all_df), dtype=bool)
+    cross = np.zeros(len(all_df), dtype=bool)
+    if cand.any():
+        sub = key[cand]
+        dup[cand] = sub.duplicated(keep="first").to_numpy()
+        first_src = pd.Series(source[cand]).groupby([sub[c].to_numpy() for c in sub.columns], sort=False).transform("first")
+        cross[cand] = dup[cand] & (first_src.to_numpy() != source[cand])
+    stats = pd.DataFrame({
+        "file": names,
+        "rows": [len(f) for f in frames],
+        "duplicates": np.bincount(source[dup], minlength=len(frames)),
+        "cross_file": np.bincount(source[cross], minlength=len(frames)),  # 與較早的檔案重複
+    })
+    return all_df[~dup].reset_index(drop=True), stats
+
+# -----逐檔清理（可平行）-----
+def _clean_file(path):
+    # 在子行程執行：例外轉成字串回傳，單一檔案失敗不影響其他檔案
+    try:
+        df, removed = clean_one_csv(path)
+        return path, df, removed, None
+    except Exception as e:
+        return path, None, 0, e
+
+def clean_files(files, workers=1):
+    # 依 files 的順序回傳 [(path, df, removed, error)]；workers > 1 時以 process pool 平行處理
+    # 結果順序與序列執行相同，合併後的輸出也就相同
+    if workers <= 1 or len(files) <= 1:
+        return [_clean_file(f) for f in files]
+    with ProcessPoolExecutor(max_workers=min(workers, len(files))) as pool:
+        return list(pool.map(_clean_file, files))
+
+# -----逐檔快取-----
+def file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def load_manifest():
+    try:
+        with open(MANIFEST_PATH, encoding="utf-8") as fh:
+            manifest = json.load(fh)
+    except (OSError, ValueError):
+        return {}
+    return manifest if manifest.get("version") == CLEAN_VERSION else {}
+
+def save_manifest(manifest):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp = MANIFEST_PATH + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(manifest, fh, ensure_ascii=False, indent=1)
+    os.replace(tmp, MANIFEST_PATH)
+
+def is_fresh(entry, path):
+    # 大小不同 → 變動；mtime 相同 → 未變動；mtime 不同時以 SHA-256 判定（例如重新下載同一份檔案）
+    if not entry or not os.path.exists(os.path.join(CACHE_DIR, entry["output"])):
+        return False
+    st = os.stat(path)
+    if entry["size"] != st.st_size:
+        return False
+    if entry["mtime_ns"] == st.st_mtime_ns:
+        return True
+    if entry["sha256"] != file_sha256(path):
+        return False
+    entry["mtime_ns"] = st.st_mtime_ns  # 內容相同，更新 mtime 免得下次再算一次
+    return True
+
+def cache_output(path, df, removed):
+    # 寫入單檔快取，回傳 manifest 項目
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    name = os.path.splitext(os.path.basename(path))[0] + ".pkl"
+    df.to_pickle(os.path.join(CACHE_DIR, name))
+    st = os.stat(path)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": file_sha256(path),
+            "output": name, "rows": len(df), "removed": removed}
+
 # -----主程式-----
-def main():
-    files = glob.glob(os.path.join(RAW_DIR, "*.csv"))
-    frames, dupes = [], 0  # frames用來儲存從每個 CSV 檔案清洗後得到的 DataFrame；dupes計數器
+def main(workers=1, force=False):
+    # 檔案依名稱排序（glob 的順序依檔案系統而定），確保每次合併順序相同
+    files = sorted(glob.glob(os.path.join(RAW_DIR, "*.csv")))
+    manifest = {} if force else load_manifest()
+    entries = manifest.get("files", {})
+    stale = [f for f in files if not is_fresh(entries.get(f), f)]
+    dropped = sorted(set(entries) - set(files))  # 原始檔已刪除
+    out_path = os.path.join(CLEAN_DIR, "transactions_clean.csv")
+    if not stale and not dropped and os.path.exists(out_path) and manifest.get("output_files") == files:
+        print(f"UP-TO-DATE: {len(files)} files unchanged, {out_path} not rewritten")
+        return
+
+    # 只清理新增或變動的檔案，其餘讀取快取
+    cleaned = {f: (df, removed, err) for f, df, removed, err in clean_files(stale, workers)}
+    new_entries = {}
+    frames, names, filtered = [], [], 0  # frames用來儲存從每個 CSV 檔案清洗後得到的 DataFrame；filtered計數器
     for f in files:
+        if f in cleaned:
+            df, removed, err = cleaned[f]
+            if err is not None:
+                print(f"FAIL {f}: {err}")
+                continue
+            new_entries[f] = cache_output(f, df, removed)
+            status = "OK"
+        else:
+            new_entries[f] = entries[f]
+            df, removed = pd.read_pickle(os.path.join(CACHE_DIR, entries[f]["output"])), entries[f]["removed"]
+            status = "CACHED"
+        frames.append(df)
+        names.append(os.path.basename(f))
+        filtered += removed
+        print(f"{status} {os.path.basename(f)}: rows={len(df)} (filtered {removed})") # 輸出成功處理的檔案名、最終行數以及該檔案過濾掉的行數
+    for f in dropped:
+        print(f"REMOVED {os.path.basename(f)}")
         try:
-            df, removed = clean_one_csv(f)
-            frames.append(df)
-            dupes += removed
-            print(f"OK {os.path.basename(f)}: rows={len(df)} (dedup {removed})") # 輸出成功處理的檔案名、最終行數以及該檔案移除的重複行數
-        except Exception as e:
-            print(f"FAIL {f}: {e}")
-
-    # 將 frames 列表中所有清洗過的 DataFrame 垂直合併成一個大的 DataFrame：all_df
-    all_df = pd.concat(frames, ignore_index=True)
+            os.remove(os.path.join(CACHE_DIR, entries[f]["output"]))
+        except OSError:
+            pass
+
+    # 將 frames 列表中所有清洗過的 DataFrame 垂直合併成一個大的 DataFrame：all_df，並跨檔去重
+    all_df, dedup_stats = global_dedup(frames, names)
+    dupes = int(dedup_stats["duplicates"].sum())
+    print("\nDEDUP (地區+日期+面積+總價):")
+    print(dedup_stats.to_string(index=False))
     # QC 報表
     qc = {
         "rows_total":[len(all_df)],
@@ -240,6 +504,7 @@ def main():
         "date_max":[all_df['trade_date'].max()],
         "cities": [", ".join(sorted(all_df['city'].dropna().unique().tolist())[:10])],
         "dupes_removed":[dupes],
+        "rows_filtered":[filtered],
         "price_per_ping_min":[all_df['price_per_ping'].min()],
         "price_per_ping_p50":[all_df['price_per_ping'].median()],
         "price_per_ping_p95":[all_df['price_per_ping'].quantile(0.95)],
@@ -262,12 +527,20 @@ def main():
     all_df['floor'] = all_df['transfer_floor_num']
 
     # 欄位順序（交付版）
-    all_df = all_df[KEEP_COLS].sort_values(["city","district","trade_date"])
+    # stable 排序：同地區同日期的列維持合併順序，輸出不受排序演算法影響
+    all_df = all_df[KEEP_COLS].sort_values(["city","district","trade_date"], kind="stable")
 
-    out_path = os.path.join(CLEAN_DIR, "transactions_clean.csv")
     all_df.to_csv(out_path, index=False, encoding="utf-8-sig")
+    # 輸出寫完才更新 manifest；失敗的檔案不記錄，下次會再試
+    save_manifest({"version": CLEAN_VERSION, "files": new_entries,
+                   "output_files": [f for f in files if f in new_entries]})
     print(f"\nDONE: {out_path} ({len(all_df):,} rows)")
     print(f"QC: {os.path.join(QC_DIR,'summary.csv')}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="清理 data/raw 下的實價登錄季度檔")
+    parser.add_argument("-j", "--workers", type=int, default=int(os.getenv("CLEAN_WORKERS", 1)),
+                        help="平行處理的行程數（預設 1 = 逐檔處理；0 = 使用全部 CPU 核心）")
+    parser.add_argument("--force", action="store_true", help="忽略快取，重新清理所有檔案")
+    args = parser.parse_args()
+    main(workers=args.workers or os.cpu_count() or 1, force=args.force)
\ No newline at end of file
@@ -0,0 +1,90 @@
+# aggregate_cube.py — 月 / 年均價預先彙總
+# 載入時依 (city, district, usage, month) 計算 sum / count，再彙總出
+# district、usage、city 為「全部」的組合；/stats/* 直接查表，不必每次 groupby。
+# 保留 sum / count 基礎表，新增資料時只需彙總新列再合併（extended）。
+
+from itertools import combinations
+from typing import Optional
+import numpy as np
+import pandas as pd
+
+DIMS = ["city", "district", "usage"]
+_VALUE_COLS = ["sum_raw", "cnt_raw", "sum_adj", "cnt_adj", "n"]
+
+def _base_table(df: pd.DataFrame) -> pd.DataFrame:
+    """(city, district, usage, month) 的 sum / count 基礎表；month 為 NaT 的列也保留"""
+    raw = df["price_per_ping"].to_numpy(dtype=np.float64)
+    adj = df["adj_price_per_ping"].to_numpy(dtype=np.float64)
+    tmp = pd.DataFrame({
+        "city": df["city"].to_numpy(), "district": df["district"].to_numpy(),
+        "usage": df["usage"].to_numpy(),
+        "month": df["trade_date"].to_numpy().astype("datetime64[M]").astype("datetime64[ns]"),
+        "sum_raw": np.nan_to_num(raw), "cnt_raw": ~np.isnan(raw),
+        "sum_adj": np.nan_to_num(adj), "cnt_adj": ~np.isnan(adj),
+        "n": np.ones(len(df), dtype=np.int64),
+    })
+    return tmp.groupby(DIMS + ["month"], dropna=False, sort=False).sum().reset_index()
+
+def _finish(table: pd.DataFrame, period: str) -> pd.DataFrame:
+    """sum / count → 與原本 groupby().agg(mean, size) 相同欄位的結果（整張表一次算）"""
+    with np.errstate(invalid="ignore", divide="ignore"):
+        out = pd.DataFrame({
+            period: table[period].to_numpy(),
+            "avg_raw": np.where(table["cnt_raw"] > 0, table["sum_raw"] / table["cnt_raw"], np.nan),
+            "avg_adj": np.where(table["cnt_adj"] > 0, table["sum_adj"] / table["cnt_adj"], np.nan),
+            "n": table["n"].to_numpy(dtype=np.int64),
+        })
+    if period == "year":
+        out["year"] = table["year"].fillna(0).to_numpy(dtype=np.int32)  # NA 列稍後會被濾掉
+    return out
+
+def rollup_key(city, district, usage) -> tuple:
+    """查詢參數 → 彙總 key；與 /regions 的篩選相同，空值或 "ALL"（district / usage）表示不限"""
+    return (city or None,
+            None if not district or district == "ALL" else district,
+            None if not usage or usage == "ALL" else usage)
+
+def rollup_levels():
+    """所有彙總層級：保留的維度組合，從全部彙總 () 到完整 key"""
+    return [list(keep) for r in range(len(DIMS) + 1) for keep in combinations(DIMS, r)]
+
+def _merge_base(tables: list) -> pd.DataFrame:
+    """合併多個基礎表，同一 (city, district, usage, month) 的 sum / count 相加"""
+    base = pd.concat(tables, ignore_index=True)
+    return base.groupby(DIMS + ["month"], dropna=False, sort=False).sum().reset_index()
+
+class AggregateCube:
+    """key 為 (city, district, usage)，None 表示該維度「全部」"""
+
+    def __init__(self, df: Optional[pd.DataFrame] = None, base: Optional[pd.DataFrame] = None):
+        self._base = _base_table(df) if base is None else base
+        base = self._base.assign(year=self._base["month"].dt.year.astype("Int64"))
+        self._monthly, self._yearly = {}, {}
+        for keep in rollup_levels():
+            self._add_level(base, keep)
+
+    def extended(self, rows: pd.DataFrame) -> "AggregateCube":
+        """加入新成交後的新 cube（自身不變）；只對新列做逐列彙總，其餘由基礎表合併"""
+        return AggregateCube(base=_merge_base([self._base, _base_table(rows)]))
+
+    def _add_level(self, base: pd.DataFrame, keep: list):
+        for period, store in (("month", self._monthly), ("year", self._yearly)):
+            table = (base.groupby(keep + [period], dropna=False, observed=True)[_VALUE_COLS]
+                         .sum().reset_index())
+            out = _finish(table, period)
+            valid = table[period].notna().to_numpy()
+            # 只有 NaT 的 key 仍要登記（結果為空表），與原本「有資料但沒有月份」一致
+            groups = table.groupby(keep, observed=True).indices if keep else {(): np.arange(len(table))}
+            for key, idx in groups.items():
+                key = key if isinstance(key, tuple) else (key,)
+                values = dict(zip(keep, key))
+                rows = idx[valid[idx]]
+                store[tuple(values.get(d) for d in DIMS)] = out.iloc[rows].reset_index(drop=True)
+
+    def monthly(self, city, district="ALL", usage="ALL") -> Optional[pd.DataFrame]:
+        """月均價；沒有任何資料時回傳 None"""
+        return self._monthly.get(rollup_key(city, district, usage))
+
+    def yearly(self, city, district="ALL", usage="ALL") -> Optional[pd.DataFrame]:
+        """年均價；沒有任何資料時回傳 None"""
+        return self._yearly.get(rollup_key(city, district, usage))
@@ -1,14 +1,30 @@
 # app.py — FastAPI + 修正版 MySQL dump 解析器
 # 修正：使用正則表達式解析 tuple，成功解析所有 29 區
 
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import FastAPI, File, Header, HTTPException, Query, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
 from typing import Optional, List, Dict
 from pathlib import Path
 import pandas as pd
-import re, math, io, sys
-import os
-import urllib.request
+import numpy as np
+import re, io, sys, time
+import os, threading, traceback
+from urllib.parse import urlparse
+from contextlib import asynccontextmanager
+from email.utils import formatdate
+
+from sql_dump import SQL_CHUNK_SIZE, conform_frame, load_dump, print_progress
+from sql_download import download, fetch_published_sha256, print_download_progress
+from df_cache import load_or_build
+from derived_columns import add_risk_columns, risk_factor_scalar
+from partition_index import sort_for_index
+from dataset import Dataset, DatasetLoader, append_rows
+from response_cache import ResponseCache, ResponseCacheMiddleware
+from frame_json import FrameJSONResponse
+from sql_backend import SQLDataset
+import database_get
 
 sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
 
@@ -18,29 +34,45 @@ REMOTE_SQL_URL = os.getenv(
     "https://github.com/WuTing201y/data-system/releases/download/v1.0/houseDatabase_version_1.sql"
 )
 
-# 本地快取路徑
+# 本地快取路徑；遠端檔為 .gz / .zst 時原樣保存，解析時邊讀邊解壓
 SQL_PATH = Path(__file__).parent / "houseDatabase_version_1.sql"
+DUMP_PATHS = [SQL_PATH, SQL_PATH.with_name(SQL_PATH.name + ".gz"), SQL_PATH.with_name(SQL_PATH.name + ".zst")]
+# 發布的 SHA-256；未設定時嘗試讀取 <REMOTE_SQL_URL>.sha256
+REMOTE_SQL_SHA256 = os.getenv("REMOTE_SQL_SHA256")
+# 透過 /admin/ingest 加入的季度 CSV 保存在這裡，重新啟動時依檔名順序再套用一次
+INGEST_DIR = Path(os.getenv("INGEST_DIR", Path(__file__).parent / "ingested"))
+# 多個 worker 時，每隔這麼多秒檢查 INGEST_DIR 是否有其他 worker 加入的檔案
+INGEST_POLL = float(os.getenv("INGEST_POLL", 5))
+# 管理端點的權杖；未設定時 /admin/* 停用
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+# memory：啟動時載入 dump 到記憶體（預設）；sql：不載入，直接查 houses 資料表（連線設定見 database_get.py）
+DATA_BACKEND = os.getenv("DATA_BACKEND", "memory")
+if DATA_BACKEND not in ("memory", "sql"):
+    raise RuntimeError(f"DATA_BACKEND 必須是 memory 或 sql，而不是 {DATA_BACKEND!r}")
 PING_PER_M2 = 1 / 3.305785
 
-def _download_sql_if_needed():
-    """如果本地沒有 SQL 檔案，從遠端下載"""
-    if SQL_PATH.exists():
-        print(f"✅ 使用本地 SQL 檔案: {SQL_PATH}")
-        return
+def _download_sql_if_needed(progress=print_download_progress) -> Path:
+    """如果本地沒有 SQL 檔案，從遠端下載（可續傳，並驗證 SHA-256）；回傳 dump 路徑"""
+    for path in DUMP_PATHS:
+        if path.exists():
+            print(f"✅ 使用本地 SQL 檔案: {path}")
+            return path
     
     print(f"📥 本地無 SQL 檔案，開始從遠端下載...")
     print(f"   URL: {REMOTE_SQL_URL}")
     
+    suffix = Path(urlparse(REMOTE_SQL_URL).path).suffix
+    dest = SQL_PATH.with_name(SQL_PATH.name + suffix) if suffix in (".gz", ".zst") else SQL_PATH
     try:
-        # 下載到臨時檔案
-        temp_path = SQL_PATH.with_suffix('.sql.tmp')
-        urllib.request.urlretrieve(REMOTE_SQL_URL, temp_path)
-        
-        # 下載成功，重新命名
-        temp_path.rename(SQL_PATH)
+        sha256 = REMOTE_SQL_SHA256 or fetch_published_sha256(REMOTE_SQL_URL)
+        if not sha256:
+            print("⚠️  未提供 SHA-256，略過完整性檢查")
+        # 先寫入 .part，中斷時下次啟動從已下載處續傳；驗證通過才改名
+        download(REMOTE_SQL_URL, dest, sha256=sha256, progress=progress)
         
-        size_mb = SQL_PATH.stat().st_size / (1024 * 1024)
+        size_mb = dest.stat().st_size / (1024 * 1024)
         print(f"✅ 下載完成！檔案大小: {size_mb:.1f} MB")
+        return dest
         
     except Exception as e:
         print(f"❌ 下載失敗: {e}")
@@ -56,176 +88,42 @@ NEWTAIPEI_29 = [
 BASE29 = [d[:-1] for d in NEWTAIPEI_29]
 BASE_MAP = {b: b + "區" for b in BASE29}
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 資料在背景執行緒載入，uvicorn 可以立即綁定 port；載入完成前資料端點回 503
+    LOADER.start()
+    yield
+
 app = FastAPI(
     title="House AI Estimation API",
     version="1.0.0",
     description="新北市房價分析與估價 API",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan
+)
+# 唯讀端點的回應快取；先註冊 → 位於 CORS 內層，快取命中的回應仍有 CORS 標頭
+CACHED_PATHS = [
+    "/", "/health", "/regions", "/stats/monthly", "/stats/yearly",
+    "/api/monthly-stats", "/api/yearly-stats", "/debug/districts", "/debug/districts_full",
+]
+RESPONSE_CACHE = ResponseCache(maxsize=int(os.getenv("RESPONSE_CACHE_SIZE", 512)))
+app.add_middleware(
+    ResponseCacheMiddleware, cache=RESPONSE_CACHE, paths=CACHED_PATHS,
+    get_version=lambda: _dataset_version(), get_last_modified=lambda: LOADER.current.last_modified,
 )
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"], allow_methods=["*"], allow_headers=["*"], allow_credentials=True
 )
+# 表格型回應的輸出格式：records（預設，[{...}, ...]）或 columns（{"欄位": [...]}）
+FORMAT_QUERY = Query(default="records", pattern="^(records|columns)$", description="records 或 columns（欄式 JSON）")
 
-# ===================== 解析邏輯（已修正）=====================
-DEFAULT_COLS = [
-    "trade_date","year","quarter","city","district","age_years",
-    "area_m2","area_ping","price_total","price_per_ping","unit_price_m2",
-    "usage","total_floors","floor","risk_factor"
-]
-
-COL_ALIASES = {
-    "date":"trade_date", "tradedate":"trade_date",
-    "yr":"year", "yyyy":"year",
-    "q":"quarter","quart":"quarter",
-    "cty":"city","cityname":"city","city_name":"city",
-    "dist":"district","districtname":"district","district_name":"district",
-    "town":"district","region":"district","area_name":"district",
-    "age":"age_years","ageyear":"age_years",
-    "aream2":"area_m2","m2":"area_m2",
-    "areaping":"area_ping","ping":"area_ping",
-    "totalprice":"price_total","total_price":"price_total",
-    "pp_ping":"price_per_ping","priceperping":"price_per_ping",
-    "unitprice":"unit_price_m2","unitpricem2":"unit_price_m2",
-    "use":"usage","purpose":"usage",
-    "floors":"total_floors","totalfloor":"total_floors","total_floors":"total_floors",
-    "floorno":"floor","floor_num":"floor",
-    "risk":"risk_factor","riskfactor":"risk_factor"
-}
-
-def _norm_colname(s: str) -> str:
-    """正規化欄位名稱"""
-    if not s: return s
-    k = s.strip().strip("`").strip()
-    k = re.sub(r"\s+", "", k)
-    k = k.replace("__", "_").replace("-", "_").lower()
-    k = k.replace(" ", "").replace("\t","").replace("\r","").replace("\n","")
-    if k in DEFAULT_COLS:
-        return k
-    k2 = COL_ALIASES.get(k, k)
-    return k2
-
-def _parse_sql_value(val: str):
-    """解析單個 SQL 值"""
-    val = val.strip()
-    if val.upper() == "NULL":
-        return None
-    if val.startswith("'") and val.endswith("'"):
-        return val[1:-1].replace("\\'", "'").replace("\\\\", "\\")
-    try:
-        if "." in val:
-            return float(val)
-        return int(val)
-    except ValueError:
-        return val
-
-def _split_tuples_improved(values_text: str) -> list:
-    """改進的 tuple 切分與解析 - 使用正則表達式"""
-    values_text = values_text.strip()
-    rows = []
-    
-    # 使用正則表達式匹配每個 tuple
-    tuple_pattern = re.compile(r'\(((?:[^()\'"]|\'(?:[^\']|\\.)*\'|"(?:[^"]|\\.)*")*)\)', re.DOTALL)
-    
-    for match in tuple_pattern.finditer(values_text):
-        inner = match.group(1)
-        
-        # 解析 tuple 內的欄位
-        fields = []
-        current = []
-        in_quote = False
-        quote_char = None
-        escape_next = False
-        
-        for ch in inner:
-            if escape_next:
-                current.append(ch)
-                escape_next = False
-                continue
-                
-            if ch == '\\':
-                current.append(ch)
-                escape_next = True
-                continue
-            
-            if ch in ("'", '"') and not in_quote:
-                in_quote = True
-                quote_char = ch
-                current.append(ch)
-                continue
-            
-            if ch == quote_char and in_quote:
-                in_quote = False
-                quote_char = None
-                current.append(ch)
-                continue
-            
-            if ch == ',' and not in_quote:
-                fields.append(''.join(current).strip())
-                current = []
-                continue
-            
-            current.append(ch)
-        
-        if current:
-            fields.append(''.join(current).strip())
-        
-        # 解析每個欄位的值
-        parsed_fields = [_parse_sql_value(f) for f in fields]
-        
-        if len(parsed_fields) == len(DEFAULT_COLS):
-            rows.append(parsed_fields)
-    
-    return rows
-
-def _load_df_from_sql(sql_path) -> pd.DataFrame:
-    """載入並解析 SQL dump 檔案"""
-    sql_path = Path(sql_path)
-    if not sql_path.exists():
-        raise FileNotFoundError(f"SQL file not found: {sql_path}")
-    text = sql_path.read_text(encoding="utf-8", errors="ignore")
-
-    pattern = re.compile(
-        r"INSERT\s+INTO\s+`?houses`?\s*(\([^)]+\))?\s+VALUES\s*(.+?);",
-        flags=re.IGNORECASE | re.DOTALL
-    )
-
-    all_rows = []
-    insert_count = 0
-
-    for colgrp, values_blob in pattern.findall(text):
-        insert_count += 1
-        
-        # 取得欄位順序（如果有的話）
-        if colgrp:
-            raw_cols = [c.strip() for c in colgrp.strip()[1:-1].split(",")]
-            col_names = [_norm_colname(c) for c in raw_cols]
-        else:
-            col_names = DEFAULT_COLS.copy()
-
-        # 解析這個 INSERT 的所有 tuples
-        rows = _split_tuples_improved(values_blob)
-        
-        # 對齊欄位
-        for vals in rows:
-            if len(vals) < len(col_names):
-                vals += [None] * (len(col_names) - len(vals))
-            elif len(vals) > len(col_names):
-                vals = vals[:len(col_names)]
-            
-            row_map = dict(zip(col_names, vals))
-            row = [row_map.get(c, None) for c in DEFAULT_COLS]
-            all_rows.append(row)
-        
-        if insert_count % 5 == 0:
-            print(f"  處理 INSERT #{insert_count}，累計 {len(all_rows):,} 筆...")
-
-    df = pd.DataFrame(all_rows, columns=DEFAULT_COLS)
-    df["trade_date"] = pd.to_datetime(df["trade_date"], errors="coerce")
-    
+# ===================== 載入 SQL dump =====================
+def _load_df_from_sql(sql_path, progress=print_progress, chunk_size: int = SQL_CHUNK_SIZE) -> pd.DataFrame:
+    """串流載入並解析 SQL dump 檔案（實作見 sql_dump.py）"""
+    df = load_dump(sql_path, progress=progress, chunk_size=chunk_size)
     print(f"✅ 載入 {len(df):,} 筆 | 範圍 {df['trade_date'].min()} ~ {df['trade_date'].max()}")
-    
     return df
 
 # ===================== 正規化行政區 =====================
@@ -237,13 +135,18 @@ def _clean_str(s: str) -> str:
     s = s.replace("\u3000","")
     return s.strip()
 
+def _map_unique(s: pd.Series, fn) -> pd.Categorical:
+    """只對不重複值呼叫 fn，再依 codes 廣播回整欄；NaN/None 以 fn(None) 處理"""
+    codes, uniques = pd.factorize(s, use_na_sentinel=True)
+    mapped = [fn(u) for u in uniques] + [fn(None)]
+    # 多個原始值可能正規化成同一個值，重新編碼一次（類別依字串排序，groupby 順序與字串欄相同）
+    new_codes, cats = pd.factorize(pd.Series(mapped, dtype=object), sort=True, use_na_sentinel=True)
+    return pd.Categorical.from_codes(new_codes[codes], categories=cats)
+
 def _normalize_admin(df: pd.DataFrame) -> pd.DataFrame:
+    """行政區 / 城市 / 用途正規化；不重複值只有幾十個，逐值處理後存成 Categorical"""
     if "district_raw" not in df.columns:
-        df["district_raw"] = df["district"]
-
-    for c in ["city","district","usage","total_floors"]:
-        if c in df.columns:
-            df[c] = df[c].apply(_clean_str)
+        df["district_raw"] = df["district"].astype(pd.CategoricalDtype(sorted(df["district"].dropna().unique())))
 
     def map_city(x: str) -> str:
         if not x: return ""
@@ -251,7 +154,6 @@ def _normalize_admin(df: pd.DataFrame) -> pd.DataFrame:
         if x in {"新北市","新北","新北縣"}: return "NewTaipei"
         if key in {"newtaipei","newtaipeicity","newtaipecity"}: return "NewTaipei"
         return x
-    df["city"] = df["city"].apply(map_city)
 
     en2zh = {
         "banqiao":"板橋區","sanchong":"三重區","zhonghe":"中和區","yonghe":"永和區",
@@ -281,33 +183,35 @@ def _normalize_admin(df: pd.DataFrame) -> pd.DataFrame:
         if key in en2zh: return en2zh[key]
         return x0
 
-    df["district"] = df["district"].apply(norm_dist)
-    df.loc[df["district"].isin(NEWTAIPEI_29), "city"] = "NewTaipei"
-
     usage_map = {"住宅":"住家用","住家":"住家用","住家用":"住家用",
                  "辦公":"辦公用","商辦":"辦公用","辦公用":"辦公用"}
-    df["usage"] = df["usage"].replace(usage_map)
+
+    df["city"] = _map_unique(df["city"], lambda x: map_city(_clean_str(x)))
+    df["district"] = _map_unique(df["district"], norm_dist)
+    df["usage"] = _map_unique(df["usage"], lambda x: usage_map.get(_clean_str(x), _clean_str(x)))
+    if "total_floors" in df.columns:
+        df["total_floors"] = _map_unique(df["total_floors"], _clean_str)
+
+    city = df["city"].cat.add_categories([c for c in ["NewTaipei"] if c not in df["city"].cat.categories])
+    city[df["district"].isin(NEWTAIPEI_29)] = "NewTaipei"
+    df["city"] = city.cat.remove_unused_categories()
     return df
 
 # ===================== 風險 & 準備 =====================
-def _rf_age(a):
-    if a is None or pd.isna(a): return 0.5
-    a0, k = 30.0, 0.12
-    return round(1.0 / (1.0 + math.exp(-k * (float(a) - a0))), 3)
+_rf_age = risk_factor_scalar  # 單筆版本，整欄計算見 derived_columns.add_risk_columns
 
-def _prepare_df(sql_path: str):
+def _prepare_df(sql_path: str, progress=print_progress):
     print(f"🔧 載入 SQL: {sql_path}")
-    df = _load_df_from_sql(sql_path)
+    df = _load_df_from_sql(sql_path, progress=progress)
     
     print("🔧 正規化行政區...")
     df = _normalize_admin(df)
     
     print("🔧 計算風險係數...")
-    df["risk_factor"] = df["risk_factor"].where(~df["risk_factor"].isna(), df["age_years"].map(_rf_age))
-    df["adj_price_per_ping"] = df.apply(
-        lambda r: None if pd.isna(r["price_per_ping"]) else r["price_per_ping"] * (1 - float(r["risk_factor"])),
-        axis=1
-    )
+    df = add_risk_columns(df)
+    
+    # 依 (city, district, usage, trade_date) 排序，供分區索引切片使用
+    df = sort_for_index(df)
     
     # 統計區域
     districts = df.loc[df["city"]=="NewTaipei","district"].dropna().unique()
@@ -315,33 +219,141 @@ def _prepare_df(sql_path: str):
     
     return df
 
-print("⏳ 初始化中...")
-
-# 檢查並下載 SQL 檔案（如果需要）
-_download_sql_if_needed()
-
-DF = _prepare_df(SQL_PATH)
-print(f"✅ 載入完成！共 {len(DF):,} 筆資料")
-
-# ===================== 篩選 =====================
-def _filter_df(city=None, district=None, usage="住家用", start_date=None, end_date=None):
-    sub = DF.copy()
-    if usage and usage != "ALL": sub = sub[sub["usage"] == usage]
-    if city: sub = sub[sub["city"] == city]
-    if district and district != "ALL": sub = sub[sub["district"] == district]
-    if start_date: sub = sub[sub["trade_date"] >= pd.to_datetime(start_date)]
-    if end_date: sub = sub[sub["trade_date"] <= pd.to_datetime(end_date)]
-    return sub
+def _prepare_rows(raw: pd.DataFrame) -> pd.DataFrame:
+    """新一季的清理後資料（clean.py 輸出格式）→ 與 DF 相同欄位，已正規化、已算風險欄"""
+    df = conform_frame(raw)
+    df = df[df["trade_date"].notna()].reset_index(drop=True)
+    df = _normalize_admin(df)
+    return add_risk_columns(df)
+
+def _read_ingest_csv(source) -> pd.DataFrame:
+    return _prepare_rows(pd.read_csv(source, encoding="utf-8-sig", low_memory=False))
+
+def _ingest_files() -> list:
+    """INGEST_DIR 內已保存的季度檔（依檔名排序；寫入中的 .tmp 不算）"""
+    if not INGEST_DIR.is_dir():
+        return []
+    return sorted(p for p in INGEST_DIR.iterdir() if p.suffix.lower() == ".csv")
+
+# dump 本身的 (版本, mtime)；_build_dataset 設定，每個 worker 算出的值相同
+_BASE_STAMP = ("", 0.0)
+
+def _ingest_stamp(ingested: Dict[str, int]) -> tuple:
+    """(version, last_modified)：只取決於 dump 與已套用的檔案（不論套用順序），各 worker 的 ETag 一致"""
+    version, mtime = _BASE_STAMP
+    for name in sorted(ingested):
+        version = f"{version}+{name}:{ingested[name]}"
+        mtime = max(mtime, (INGEST_DIR / name).stat().st_mtime)
+    return version, formatdate(mtime, usegmt=True)
+
+def _build_dataset(report) -> Dataset:
+    """背景執行緒：下載 → 載入（快取或解析）→ 建立索引與彙總"""
+    print("⏳ 初始化中...")
+
+    # 檢查並下載 SQL 檔案（如果需要）
+    report("download")
+    dump_path = _download_sql_if_needed(
+        progress=lambda done, total: (print_download_progress(done, total), report("download", done, total)))
+
+    def progress(done, total, rows):
+        print_progress(done, total, rows)
+        report("parse", done, total, rows)
+
+    # 有欄式快取（.cache/）且 dump 未變動時直接載入，否則重新解析並寫入快取
+    report("parse")
+    df = load_or_build(dump_path, lambda p: _prepare_df(p, progress=progress),
+                       required=("adj_price_per_ping", "risk_factor"))
+    report("index", rows=len(df))
+    # 資料版本：SQL 檔與 API 版本不變時回應內容也不變，作為 ETag 的依據
+    global _BASE_STAMP
+    st = dump_path.stat()
+    _BASE_STAMP = (f"{app.version}-{len(df)}-{st.st_size:x}-{st.st_mtime_ns:x}", st.st_mtime)
+
+    # 先前透過 /admin/ingest 加入的季度
+    ingested = {}
+    for path in _ingest_files():
+        rows = _read_ingest_csv(path)
+        df = append_rows(df, rows)
+        ingested[path.name] = len(rows)
+        print(f"➕ 套用 {path.name}：{len(rows):,} 筆")
+
+    version, last_modified = _ingest_stamp(ingested)
+    dataset = Dataset(df, version=version, last_modified=last_modified, ingested=ingested)
+    print(f"✅ 載入完成！共 {len(df):,} 筆資料，{len(dataset.index.partitions)} 個分區")
+    return dataset
+
+def _connect_dataset(report) -> SQLDataset:
+    """DATA_BACKEND=sql：不載入資料，只建立連線池並讀取資料版本；篩選與彙總在資料庫端執行（見 sql_backend.py）"""
+    report("connect")
+    pool = database_get.get_pool()
+    dataset = SQLDataset(pool, version=app.version)
+    print(f"✅ SQL 模式（{pool.dialect}）：houses 共 {len(dataset):,} 筆資料")
+    return dataset
+
+LOADER = DatasetLoader(_connect_dataset if DATA_BACKEND == "sql" else _build_dataset)
+
+# ---- 多 worker：套用其他 worker 透過 /admin/ingest 加入的檔案 ----
+_sync_lock = threading.Lock()
+_sync_state = {"checked": 0.0, "thread": None}
+
+def _apply_pending_ingest():
+    def apply(cur: Dataset) -> Dataset:
+        # 在更新鎖內重新比對，本 worker 剛加入的檔案不會套用兩次
+        new = cur
+        for path in _ingest_files():
+            if path.name in new.ingested:
+                continue
+            rows = _read_ingest_csv(path)
+            version, last_modified = _ingest_stamp({**new.ingested, path.name: len(rows)})
+            new = new.extended(rows, version=version, last_modified=last_modified, name=path.name)
+            print(f"➕ 套用其他 worker 加入的 {path.name}：{len(rows):,} 筆")
+        return new
+    try:
+        LOADER.update(apply)
+    except Exception:
+        traceback.print_exc()
+
+def _sync_ingested():
+    """每 INGEST_POLL 秒檢查一次 INGEST_DIR；有尚未套用的檔案時在背景建立新版本（期間照常服務舊版本）"""
+    ds = LOADER.current
+    if DATA_BACKEND != "memory" or ds is None:
+        return
+    now = time.monotonic()
+    with _sync_lock:
+        thread = _sync_state["thread"]
+        if now - _sync_state["checked"] < INGEST_POLL or (thread is not None and thread.is_alive()):
+            return
+        _sync_state["checked"] = now
+        if all(p.name in ds.ingested for p in _ingest_files()):
+            return
+        thread = _sync_state["thread"] = threading.Thread(target=_apply_pending_ingest, name="ingest-sync", daemon=True)
+        thread.start()
+
+def _dataset_version() -> Optional[str]:
+    """載入完成前回傳 None，回應快取不會介入"""
+    _sync_ingested()
+    ds = LOADER.current
+    return ds.version if ds is not None else None
+
+def _data() -> Dataset:
+    """目前的資料集；尚未載入完成時回 503，請稍後重試"""
+    ds = LOADER.current
+    if ds is None:
+        detail = "dataset failed to load" if LOADER.state == "error" else "dataset is loading"
+        raise HTTPException(503, detail, headers={"Retry-After": "5"})
+    _sync_ingested()
+    return ds
 
 # ===================== API =====================
 @app.get("/")
 def root():
     """根路徑 - 返回 API 資訊和可用端點"""
+    ds = LOADER.current
     return {
         "name": "House AI Estimation API",
         "version": "1.0.0",
-        "status": "running",
-        "total_records": int(len(DF)),
+        "status": "running" if ds is not None else LOADER.state,
+        "total_records": int(len(ds)) if ds is not None else None,
         "endpoints": {
             "health": "/health",
             "documentation": "/docs",
@@ -356,59 +368,51 @@ def root():
 
 @app.get("/health")
 def health():
-    districts = DF.loc[DF["city"]=="NewTaipei","district"].dropna().unique().tolist()
+    ds = LOADER.current
+    if ds is None:
+        # 載入中回 200（服務本身正常），載入失敗回 503
+        body = {"status": LOADER.state, "loading": LOADER.status()}
+        return JSONResponse(body, status_code=503 if LOADER.state == "error" else 200)
+    districts = ds.districts("NewTaipei")
     missing = [d for d in NEWTAIPEI_29 if d not in districts]
+    lo, hi = ds.date_range()
     return {
         "status":"ok",
-        "rows":int(len(DF)),
-        "date_range":[str(DF["trade_date"].min().date()), str(DF["trade_date"].max().date())],
+        "backend": DATA_BACKEND,
+        "rows":int(len(ds)),
+        "date_range":[str(lo.date()), str(hi.date())],
         "districts_in_NewTaipei": len(districts),
         "district_list": sorted(districts),
         "missing_districts": missing
     }
 
 @app.get("/regions")
-def regions(city: Optional[str]=None, usage: str="住家用"):
-    sub = _filter_df(city=city, usage=usage)
-    if sub.empty: return []
-    g = (sub.groupby(["city","district"])["trade_date"]
-           .agg(min_date="min", max_date="max", n="size")
-           .reset_index().sort_values("n", ascending=False))
+def regions(city: Optional[str]=None, usage: str="住家用", format: str=FORMAT_QUERY):
+    g = _data().regions(city=city or None, usage=None if usage == "ALL" else usage)
     g["min_date"] = g["min_date"].dt.date.astype(str)
     g["max_date"] = g["max_date"].dt.date.astype(str)
-    return g.to_dict(orient="records")
+    return FrameJSONResponse(g, orient=format)
 
 @app.get("/stats/monthly")
-def stats_monthly(city: str, district: str="ALL", usage: str="住家用"):
-    sub = _filter_df(city, district, usage)
-    if sub.empty: raise HTTPException(404, "no data")
-    sub["month"] = sub["trade_date"].dt.to_period("M").dt.to_timestamp()
-    monthly = (sub.groupby("month")
-               .agg(avg_raw=("price_per_ping","mean"),
-                    avg_adj=("adj_price_per_ping","mean"),
-                    n=("price_per_ping","size")).reset_index())
-    return monthly.to_dict(orient="records")
+def stats_monthly(city: str, district: str="ALL", usage: str="住家用", format: str=FORMAT_QUERY):
+    # 直接查預先彙總的月均價（見 aggregate_cube.py）
+    monthly = _data().cube.monthly(city, district, usage)
+    if monthly is None: raise HTTPException(404, "no data")
+    return FrameJSONResponse(monthly, orient=format)
 
 @app.get("/stats/yearly")
-def stats_yearly(city: str, district: str="ALL", usage: str="住家用"):
-    sub = _filter_df(city, district, usage)
-    if sub.empty: raise HTTPException(404, "no data")
-    sub["year"] = sub["trade_date"].dt.year
-    yearly = (sub.groupby("year")
-              .agg(avg_raw=("price_per_ping","mean"),
-                   avg_adj=("adj_price_per_ping","mean"),
-                   n=("price_per_ping","size")).reset_index())
-    return yearly.to_dict(orient="records")
+def stats_yearly(city: str, district: str="ALL", usage: str="住家用", format: str=FORMAT_QUERY):
+    yearly = _data().cube.yearly(city, district, usage)
+    if yearly is None: raise HTTPException(404, "no data")
+    return FrameJSONResponse(yearly, orient=format)
 
 @app.get("/valuation")
 def valuation(city:str, district:str, area_m2:float, age_years:Optional[float]=None, usage:str="住家用"):
-    sub = _filter_df(city=city, district=district, usage=usage)
-    if sub.empty: raise HTTPException(404, "no region")
-    latest = sub["trade_date"].max()
-    cut = latest - pd.DateOffset(months=24)
-    sample = sub[sub["trade_date"] >= cut]
+    # 近 24 個月校正後單價中位數，已預先維護在 Dataset.baselines（見 valuation_baseline.py）
+    window = _data().baselines.get(city, district, usage)
+    if window is None: raise HTTPException(404, "no region")
     area_ping = area_m2 * PING_PER_M2
-    ref_pp = sample["adj_price_per_ping"].dropna().median()
+    ref_pp = window.median()
     if pd.isna(ref_pp): raise HTTPException(404, "no baseline")
     est_total = ref_pp * area_ping
     return {
@@ -416,18 +420,106 @@ def valuation(city:str, district:str, area_m2:float, age_years:Optional[float]=N
         "baseline_pp_ping":round(ref_pp,0),"est_total":round(est_total,0)
     }
 
+class ValuationItem(BaseModel):
+    """批次估價的單筆輸入，欄位與 /valuation 相同"""
+    city: str = "NewTaipei"
+    district: str
+    area_m2: float
+    age_years: Optional[float] = None
+    usage: str = "住家用"
+
+@app.post("/valuation/batch")
+def valuation_batch(items: List[ValuationItem]):
+    """批次估價：同一 (city, district, usage) 只查一次基準單價，再整批乘上面積
+
+    回傳與輸入同順序的 list；找不到區域或基準的項目以 {"error": ...} 表示，不影響其他項目。
+    """
+    baselines = _data().baselines
+    results: List[Dict] = [None] * len(items)
+    groups: Dict[tuple, List[int]] = {}
+    for i, it in enumerate(items):
+        groups.setdefault((it.city, it.district, it.usage), []).append(i)
+
+    for (city, district, usage), idx in groups.items():
+        window = baselines.get(city, district, usage)
+        ref_pp = float("nan") if window is None else window.median()
+        error = "no region" if window is None else ("no baseline" if pd.isna(ref_pp) else None)
+        area_m2 = np.array([items[i].area_m2 for i in idx], dtype=np.float64)
+        area_ping = area_m2 * PING_PER_M2
+        est_total = ref_pp * area_ping
+        for k, i in enumerate(idx):
+            res = {"city": city, "district": district, "area_m2": items[i].area_m2}
+            if error:
+                res["error"] = error
+            else:
+                res.update(area_ping=round(float(area_ping[k]), 2),
+                           baseline_pp_ping=round(ref_pp, 0), est_total=round(float(est_total[k]), 0))
+            results[i] = res
+    return results
+
+# ===================== 管理 =====================
+@app.post("/admin/ingest")
+def admin_ingest(file: UploadFile = File(..., description="clean.py 輸出格式的季度 CSV"),
+                 x_admin_token: Optional[str] = Header(default=None)):
+    """加入新一季資料：新版本在背景建立（彙總與估價基準只處理新列），完成後原子切換
+
+    需要 X-Admin-Token 標頭與環境變數 ADMIN_TOKEN 相符。檔案保存到 INGEST_DIR，
+    重新啟動後會再次套用；同名檔案不可重複加入。多個 worker 時，其他 worker 在
+    INGEST_POLL 秒內發現新檔案並套用，版本（ETag）與這個 worker 相同。
+    """
+    if not ADMIN_TOKEN: raise HTTPException(403, "admin endpoints are disabled (ADMIN_TOKEN not set)")
+    if x_admin_token != ADMIN_TOKEN: raise HTTPException(401, "invalid admin token")
+    if DATA_BACKEND == "sql": raise HTTPException(501, "SQL backend: load new quarters with load_houses.py")
+    _data()
+    name = Path(file.filename or "").name
+    if not name.lower().endswith(".csv"): raise HTTPException(400, "expected a .csv file")
+    target = INGEST_DIR / name
+    if target.exists(): raise HTTPException(409, f"{name} already ingested")
+
+    body = file.file.read()
+    try:
+        rows = _read_ingest_csv(io.BytesIO(body))
+    except (ValueError, UnicodeDecodeError, pd.errors.ParserError) as e:
+        raise HTTPException(400, f"cannot parse {name}: {e}")
+    if rows.empty: raise HTTPException(400, f"{name} has no rows with a trade_date")
+
+    def apply(cur: Dataset) -> Dataset:
+        # 在更新鎖內再檢查一次，同名檔案同時上傳時只會加入一次
+        if target.exists(): raise HTTPException(409, f"{name} already ingested")
+        new = cur.extended(rows, version=cur.version, last_modified=cur.last_modified, name=name)
+        # 先保存再切換，重新啟動時的重建結果才會與目前一致；
+        # os.link 在目標已存在時失敗，其他 worker 同時加入同名檔案也只有一個成功
+        INGEST_DIR.mkdir(parents=True, exist_ok=True)
+        tmp = target.with_name(f"{target.name}.{os.getpid()}.tmp")
+        tmp.write_bytes(body)
+        try:
+            os.link(tmp, target)
+        except FileExistsError:
+            raise HTTPException(409, f"{name} already ingested")
+        finally:
+            tmp.unlink()
+        # 版本依檔案的 mtime 計算，其他 worker 套用同一個檔案時得到相同的 ETag
+        new.version, new.last_modified = _ingest_stamp(new.ingested)
+        return new
+
+    t0 = time.perf_counter()
+    ds = LOADER.update(apply)
+    print(f"➕ 已加入 {name}：{len(rows):,} 筆（{time.perf_counter() - t0:.2f} 秒）")
+    return {"status": "ok", "file": name, "rows_added": int(len(rows)),
+            "total_records": int(len(ds)), "version": ds.version}
+
 # ===================== Debug =====================
 @app.get("/debug/districts")
-def debug_districts():
-    g = (DF.groupby("district").size().reset_index(name="n").sort_values("n", ascending=False))
-    return {"unique_count":int(g.shape[0]),"top":g.head(50).to_dict(orient="records")}
+def debug_districts(format: str=FORMAT_QUERY):
+    g = _data().district_counts()
+    return FrameJSONResponse({"unique_count":int(g.shape[0]),"top":g.head(50)}, orient=format)
 
 @app.get("/debug/districts_full")
-def debug_districts_full(limit:int=200):
-    g = (DF.groupby(["district_raw","district"]).size().reset_index(name="n").sort_values("n",ascending=False))
-    return {"unique_pairs":int(g.shape[0]),"top":g.head(limit).to_dict(orient="records")}
+def debug_districts_full(limit:int=200, format: str=FORMAT_QUERY):
+    g = _data().district_counts(raw=True)
+    return FrameJSONResponse({"unique_pairs":int(g.shape[0]),"top":g.head(limit)}, orient=format)
 
-print(f"🔧 SQL: {SQL_PATH}")
+print(f"🔧 SQL: {SQL_PATH}（或 .gz / .zst）" if DATA_BACKEND == "memory" else "🔧 資料來源：資料庫 houses 資料表（DATA_BACKEND=sql）")
 print("✅ API ready — run with: uvicorn app:app --reload")
 
 # ===================== 前端相容路由 =====================
@@ -435,17 +527,19 @@ print("✅ API ready — run with: uvicorn app:app --reload")
 def api_monthly_stats(
     city: str = Query(default="NewTaipei"),
     district: str = Query(default="ALL"),
-    usage: str = Query(default="住家用")
+    usage: str = Query(default="住家用"),
+    format: str = FORMAT_QUERY
 ):
-    return stats_monthly(city, district, usage)
+    return stats_monthly(city, district, usage, format)
 
 @app.get("/api/yearly-stats")
 def api_yearly_stats(
     city: str = Query(default="NewTaipei"),
     district: str = Query(default="ALL"),
-    usage: str = Query(default="住家用")
+    usage: str = Query(default="住家用"),
+    format: str = FORMAT_QUERY
 ):
-    return stats_yearly(city, district, usage)
+    return stats_yearly(city, district, usage, format)
 
 @app.get("/api/house-estimate")
 def api_house_estimate(
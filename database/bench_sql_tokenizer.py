@@ -0,0 +1,84 @@
+# bench_sql_tokenizer.py — tuple 解析速度比較
+# 比較逐字元的 split_tuples（舊版）與 sql_dump.tokenize_values（正則一次抓取）
+# 執行前先檢查 load_dump 的幾個語句格式（INSERT 前有註解、指定欄位順序）
+# 執行：python bench_sql_tokenizer.py [SQL 檔案路徑] [最多 INSERT 數]
+
+from pathlib import Path
+import os, sys, tempfile, time
+
+from sql_dump import DEFAULT_COLS, iter_sql_statements, load_dump, tokenize_values, _INSERT_HEAD
+from parse_sql_to_csv import split_tuples
+
+SQL_PATH = "houseDatabase_version_1.sql"
+
+def _sample_blob(n_rows: int = 50000) -> str:
+    """沒有 dump 檔時，產生格式相同的假資料"""
+    row = "('2024-03-15',2024,1,'NewTaipei','板橋區',12,85.3,25.8,15800000,61.24,185229.78,'住家用','十五層',7,NULL)"
+    return ",".join([row] * n_rows)
+
+# (名稱, dump 內容, 預期筆數)
+_ROW = "('2024-03-15',2024,1,'NewTaipei','板橋區',12,85.3,25.8,15800000,61.24,185229.78,'住家用','十五層',7,NULL)"
+TOKENIZER_CASES = [
+    ("單純 INSERT", f"INSERT INTO `houses` VALUES {_ROW};\n", 1),
+    ("前面有 -- 註解",
+     f"--\n-- Dumping data for table `houses`\n--\n\nINSERT INTO `houses` VALUES {_ROW};\n", 1),
+    ("前面有 /* */ 與 # 註解",
+     f"/* 2024 Q1 */\n# exported\nINSERT INTO `houses` VALUES {_ROW},{_ROW};\n", 2),
+    ("註解與 INSERT 在同一個讀取區塊",
+     f"LOCK TABLES `houses` WRITE;\n-- part 1\nINSERT INTO `houses` VALUES {_ROW};\n"
+     f"-- part 2\nINSERT INTO houses VALUES {_ROW};\nUNLOCK TABLES;\n", 2),
+    ("指定欄位順序",
+     "INSERT INTO `houses` (`district`,`trade_date`) VALUES ('板橋區','2024-03-15');\n", 1),
+    ("其他資料表不算", f"-- x\nINSERT INTO `other` VALUES {_ROW};\n", 0),
+]
+
+def check_tokenizer_cases() -> bool:
+    ok = True
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "case.sql")
+        for name, text, expected in TOKENIZER_CASES:
+            with open(path, "w", encoding="utf-8") as fh:
+                fh.write(text)
+            df = load_dump(path, progress=None)
+            same = len(df) == expected and (expected == 0 or (df["district"] == "板橋區").all())
+            print(f"{'OK ' if same else 'NG '} {name}：{len(df)} / {expected} 筆")
+            ok &= same
+    return ok
+
+def _load_blobs(sql_path: Path, max_inserts: int) -> list:
+    blobs = []
+    with open(sql_path, "rb") as fh:
+        for stmt, _ in iter_sql_statements(fh):
+            text = stmt.decode("utf-8", errors="ignore")
+            head = _INSERT_HEAD.match(text)
+            if head and not head.group(1):
+                blobs.append(text[head.end():])
+                if len(blobs) >= max_inserts:
+                    break
+    return blobs
+
+def _bench(name: str, fn, blobs: list) -> float:
+    t0 = time.perf_counter()
+    rows = sum(fn(b) for b in blobs)
+    dt = time.perf_counter() - t0
+    print(f"  {name:<28} {rows:>9,} 筆  {dt:7.3f} 秒  {rows / dt:>12,.0f} 筆/秒")
+    return rows / dt
+
+def main():
+    if not check_tokenizer_cases():
+        sys.exit(1)
+    sql_path = Path(sys.argv[1] if len(sys.argv) > 1 else SQL_PATH)
+    max_inserts = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    if sql_path.exists():
+        blobs = _load_blobs(sql_path, max_inserts)
+        print(f"📂 {sql_path}：取 {len(blobs)} 個 INSERT")
+    else:
+        blobs = [_sample_blob()]
+        print("📂 找不到 SQL 檔案，使用 50,000 筆假資料")
+
+    old = _bench("split_tuples（逐字元）", lambda b: len(split_tuples(b)), blobs)
+    new = _bench("tokenize_values（正則）", lambda b: tokenize_values(b, DEFAULT_COLS)[0], blobs)
+    print(f"🚀 加速 {new / old:.1f}x")
+
+if __name__ == "__main__":
+    main()
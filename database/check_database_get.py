@@ -0,0 +1,277 @@
+# check_database_get.py — database_get 查詢函式的對照檢查
+# 把 dump 載入成 SQLite 替身（或使用 --mysql 連到 DB_* 環境變數指定的 MySQL），
+# 每個查詢函式的結果與 pandas 直接篩選的結果比對；再以多執行緒與 asyncio 同時查詢，
+# 確認連線池下各查詢的結果互不干擾；以 EXPLAIN 確認查詢計畫使用 houses_indexes.sql 的索引；
+# 再檢查 HouseQuery 的分頁與串流；最後確認 ConnectionPool.close() 關閉全部閒置連線。
+# 執行：python check_database_get.py [SQL 檔案路徑] [--mysql]
+
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+import asyncio, os, re, sys, tempfile, time
+import pandas as pd
+
+import database_get as db
+from sql_dump import DEFAULT_COLS, load_dump
+
+SQL_PATH = "houseDatabase_version_1.sql"
+
+def load_houses(sql_path) -> pd.DataFrame:
+    # 直接解析，不經 df_cache：API 的快取存的是 _prepare_df 整理後的結果，同名鍵不可寫入原始欄位
+    df = load_dump(sql_path)
+    return df[DEFAULT_COLS].copy()
+
+def build_sqlite(df: pd.DataFrame, path) -> db.ConnectionPool:
+    """houses 資料表的 SQLite 替身；trade_date 與 MySQL 的 DATE 一樣以 YYYY-MM-DD 比較"""
+    out = df.copy()
+    out["trade_date"] = out["trade_date"].dt.strftime("%Y-%m-%d")
+    types = {c: "REAL" if pd.api.types.is_numeric_dtype(out[c]) else "TEXT" for c in out.columns}
+    types["id"] = "INTEGER PRIMARY KEY"  # MySQL 由 houses_indexes.sql 加上的自動編號主鍵
+    out["id"] = range(1, len(out) + 1)
+    rows = out.astype(object).where(out.notna(), None).itertuples(index=False, name=None)
+    pool = db.sqlite_pool(path, size=4)
+    with pool.connection() as conn:
+        cur = conn.raw.cursor()
+        cur.execute("DROP TABLE IF EXISTS `houses`")
+        cur.execute("CREATE TABLE `houses` (" + ", ".join(f"`{c}` {t}" for c, t in types.items()) + ")")
+        # 連線池的 SQLite 連線是 autocommit，整批寫入包成一個交易
+        cur.execute("BEGIN")
+        cur.executemany(f"INSERT INTO `houses` VALUES ({', '.join('?' * len(types))})", rows)
+        cur.execute("COMMIT")
+    db.create_indexes(pool)
+    pool.execute("ANALYZE")
+    return pool
+
+def cases(df: pd.DataFrame) -> list:
+    """(名稱, 查詢函式, 參數, pandas 篩選)"""
+    district = df["district"].value_counts().index[0]
+    year = int(df["trade_date"].dt.year.mode()[0])
+    month = int(df["trade_date"].dt.month.mode()[0])
+    d, t, p = df["district"], df["trade_date"], df["price_total"]
+    a, g = df["area_ping"], df["age_years"]
+    ym = (t.dt.year == year) & (t.dt.month == month)
+    price, age, area = (5e6, 2e7), (0, 30), (10, 60)
+    return [
+        ("by_year", db.by_year, (year,), t.dt.year == year),
+        ("by_month", db.by_month, (month,), t.dt.month == month),
+        ("by_year_month", db.by_year_month, (year, month), ym),
+        ("by_district", db.by_district, (district,), d == district),
+        ("by_district_year", db.by_district_year, (district, year), (d == district) & (t.dt.year == year)),
+        ("by_district_year_month", db.by_district_year_month, (district, year, month), (d == district) & ym),
+        ("by_price", db.by_price, price, p.between(*price)),
+        ("by_district_price", db.by_district_price, (district, *price), (d == district) & p.between(*price)),
+        ("by_district_price_time", db.by_district_price_time, (district, *price, year, month),
+         (d == district) & p.between(*price) & ym),
+        ("by_area", db.by_area, area, a.between(*area)),
+        ("by_district_area", db.by_district_area, (district, *area), (d == district) & a.between(*area)),
+        ("by_district_area_price", db.by_district_area_price, (district, *area, *price),
+         (d == district) & a.between(*area) & p.between(*price)),
+        ("by_age", db.by_age, age, g.between(*age)),
+        ("by_district_age", db.by_district_age, (district, *age), (d == district) & g.between(*age)),
+        ("search", db.search, (district, price, age, area),
+         (d == district) & p.between(*price) & g.between(*age) & a.between(*area)),
+        ("search_bytime", db.search_bytime, (district, price, age, area, (year, month)),
+         (d == district) & p.between(*price) & g.between(*age) & a.between(*area) & ym),
+    ]
+
+# 各查詢預期使用的索引（可以從其中任選一個）；by_price / by_area / by_age 命中的列太多，全表掃描才合理
+EXPECTED_INDEXES = {
+    "by_year": {"idx_houses_trade_date"},
+    "by_month": {"idx_houses_trade_date"},
+    "by_year_month": {"idx_houses_trade_date"},
+    "by_district": {"idx_houses_district_date", "idx_houses_district_price",
+                    "idx_houses_district_area", "idx_houses_district_age"},
+    "by_district_year": {"idx_houses_district_date"},
+    "by_district_year_month": {"idx_houses_district_date"},
+    "by_district_price": {"idx_houses_district_price"},
+    "by_district_price_time": {"idx_houses_district_date", "idx_houses_district_price"},
+    "by_district_area": {"idx_houses_district_area"},
+    "by_district_area_price": {"idx_houses_district_area", "idx_houses_district_price"},
+    "by_district_age": {"idx_houses_district_age"},
+    "search": {"idx_houses_district_price", "idx_houses_district_age", "idx_houses_district_area"},
+    "search_bytime": {"idx_houses_district_date", "idx_houses_district_price",
+                      "idx_houses_district_age", "idx_houses_district_area"},
+}
+
+class ExplainPool:
+    """把查詢函式送出的 SQL 改成 EXPLAIN，讓 by_* 直接回傳查詢計畫"""
+
+    def __init__(self, pool: db.ConnectionPool):
+        self.pool = pool
+        self.prefix = "EXPLAIN QUERY PLAN " if pool.dialect == "sqlite" else "EXPLAIN "
+
+    def execute(self, sql, params=()):
+        # 只改查詢條件的 SELECT（by_month 先查 MIN / MAX 年份的那句照常執行）
+        return self.pool.execute(self.prefix + sql, params) if " WHERE " in sql \
+            else self.pool.execute(sql, params)
+
+def used_indexes(pool: db.ConnectionPool, plan) -> tuple:
+    """(實際使用的索引, 可用的索引)；SQLite 只有實際使用的索引"""
+    rows = plan.fetchall()
+    if pool.dialect == "sqlite":
+        used = set(re.findall(r"USING (?:COVERING )?INDEX (\w+)", " ".join(str(r[-1]) for r in rows)))
+        return used, used
+    cols = plan.column_names
+    used, possible = set(), set()
+    for r in rows:
+        row = dict(zip(cols, r))
+        used |= set(filter(None, str(row.get("key") or "").split(",")))
+        possible |= set(filter(None, str(row.get("possible_keys") or "").split(",")))
+    return used, possible
+
+def check_plans(pool: db.ConnectionPool, todo: list) -> bool:
+    ok = True
+    db.set_pool(ExplainPool(pool))
+    try:
+        for name, fn, params, _ in todo:
+            want = EXPECTED_INDEXES.get(name)
+            if not want:
+                continue
+            used, possible = used_indexes(pool, fn(*params))
+            # MySQL 依統計資料選擇：命中比例高的查詢（例如不限行政區的 by_month）可能選全表掃描，
+            # 這時至少要列在 possible_keys 中，表示條件是可以走索引的
+            good = bool(used & want) or (pool.dialect != "sqlite" and bool(possible & want))
+            ok &= good
+            print(f"{'OK ' if good else 'BAD'} EXPLAIN {name:<24} {', '.join(sorted(used)) or '全表掃描'}")
+    finally:
+        db.set_pool(pool)
+    return ok
+
+def check_builder(pool: db.ConnectionPool, df: pd.DataFrame) -> bool:
+    """HouseQuery：條件組合與欄位選擇、keyset 分頁、串流的結果都要與一次取回相同"""
+    ok = True
+    district = df["district"].value_counts().index[0]
+    q = db.HouseQuery(district=district).filter(price=(5e6, None), start="2015-01-01")
+    q = q.select("trade_date", "price_total", "area_ping")
+    mask = (df["district"] == district) & (df["price_total"] >= 5e6) & (df["trade_date"] >= "2015-01-01")
+    whole = q.fetch()
+    good = len(whole) == int(mask.sum()) and whole.column_names == ("trade_date", "price_total", "area_ping")
+    ok &= good
+    print(f"{'OK ' if good else 'BAD'} HouseQuery 組合條件 + 3 欄：{len(whole):,} 筆")
+
+    seen, after, pages = [], None, 0
+    while True:
+        page, after = q.page(500, after)
+        pages += 1
+        seen += [r[page.column_names.index("id")] for r in page]
+        if after is None:
+            break
+    good = len(seen) == len(set(seen)) == len(whole)
+    ok &= good
+    print(f"{'OK ' if good else 'BAD'} keyset 分頁 500 筆 / 頁：{pages} 頁、{len(seen):,} 筆，不重複不遺漏")
+
+    t0 = time.perf_counter()
+    n, total = 0, 0.0
+    for frame in q.frames(1000):
+        n += len(frame)
+        total += float(frame["price_total"].sum())
+    dt = time.perf_counter() - t0
+    good = n == len(whole) and round(total, 2) == round(sum(r[1] for r in whole), 2)
+    ok &= good
+    print(f"{'OK ' if good else 'BAD'} 串流 1,000 筆 / 批：{n:,} 筆 {dt * 1000:.1f} ms")
+
+    # 提早結束串流：連線被丟棄、名額歸還，之後的查詢照常
+    stream = db.HouseQuery().select("id").stream(100)
+    next(stream)
+    stream.close()
+    good = len(db.HouseQuery(district=district).select("id").fetch()) == int((df["district"] == district).sum())
+    ok &= good
+    print(f"{'OK ' if good else 'BAD'} 提早結束串流後繼續查詢")
+
+    # 分頁查詢依索引順序讀取，不需要另外排序
+    plan = ExplainPool(pool).execute(*db.HouseQuery(district=district).select("price_total").sql(pool, after=("2020-01-01", 0), limit=500))
+    text = " ".join(str(v) for r in plan.fetchall() for v in r)
+    good = "TEMP B-TREE" not in text and "filesort" not in text
+    ok &= good
+    print(f"{'OK ' if good else 'BAD'} EXPLAIN keyset 分頁不需額外排序")
+    return ok
+
+def check_close() -> bool:
+    """close() 關閉全部閒置連線並留下空名額；借出中的連線歸還後才關閉"""
+    closed = []
+
+    class Raw:
+        def close(self):
+            closed.append(self)
+
+    pool = db.ConnectionPool(Raw, size=3)
+    with pool.connection(), pool.connection(), pool.connection():
+        pass
+    pool.close()
+    ok = len(closed) == 3 and pool._idle.qsize() == 3
+    print(f"{'OK ' if ok else 'BAD'} close() 關閉閒置連線 {len(closed)}/3 條")
+
+    closed.clear()
+    with pool.connection() as a, pool.connection() as b:
+        with pool.connection():
+            pass
+        pool.close()
+        busy = len(closed) == 1 and a.raw not in closed and b.raw not in closed
+    pool.close()
+    good = busy and len(closed) == 3 and pool._idle.qsize() == 3
+    ok &= good
+    print(f"{'OK ' if good else 'BAD'} close() 不關閉借出中的連線，歸還後再 close() 全部關閉")
+    return ok
+
+def _summary(result) -> tuple:
+    cols = result.column_names
+    i = cols.index("price_total")
+    return len(result), round(sum(float(r[i] or 0) for r in result), 2)
+
+def main() -> int:
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    sql_path = Path(args[0] if args else SQL_PATH)
+    print(f"📂 載入 {sql_path} ...")
+    df = load_houses(sql_path)
+    tmp = tempfile.TemporaryDirectory()
+    if "--mysql" in sys.argv:
+        pool = db.mysql_pool(size=4)
+        created = db.create_indexes(pool)
+        if created:
+            print(f"🧱 建立索引：{', '.join(created)}")
+        print(f"🔌 MySQL {db.DB_CONFIG['host']}:{db.DB_CONFIG['port']}/{db.DB_CONFIG['database']}")
+    else:
+        pool = build_sqlite(df, os.path.join(tmp.name, "houses.db"))
+        print(f"🔌 SQLite 替身（{len(df):,} 筆）")
+    db.set_pool(pool)
+
+    ok = True
+    todo = cases(df)
+    expected = {}
+    for name, fn, params, mask in todo:
+        sub = df[mask]
+        want = (len(sub), round(float(sub["price_total"].sum()), 2))
+        t0 = time.perf_counter()
+        got = _summary(fn(*params))
+        dt = time.perf_counter() - t0
+        good = got == want
+        ok &= good
+        expected[name] = got
+        print(f"{'OK ' if good else 'BAD'} {name:<24} {got[0]:>7,} 筆 {dt * 1000:7.1f} ms"
+              + ("" if good else f"（預期 {want[0]:,} 筆）"))
+
+    # 同時查詢：執行緒數多於連線數，借不到連線的查詢排隊等待
+    jobs = todo * 8
+    with ThreadPoolExecutor(max_workers=16) as ex:
+        results = list(ex.map(lambda c: (c[0], _summary(c[1](*c[2]))), jobs))
+    good = all(expected[name] == got for name, got in results)
+    ok &= good
+    print(f"{'OK ' if good else 'BAD'} 16 執行緒 / {pool.size} 條連線同時查詢 {len(jobs)} 次")
+
+    async def gather():
+        return await asyncio.gather(*(db.arun(fn, *params) for _, fn, params, _ in todo))
+    results = asyncio.run(gather())
+    good = all(expected[c[0]] == _summary(r) for c, r in zip(todo, results))
+    ok &= good
+    print(f"{'OK ' if good else 'BAD'} asyncio.gather {len(todo)} 個查詢")
+
+    ok &= check_plans(pool, todo)
+    ok &= check_builder(pool, df)
+    ok &= check_close()
+
+    pool.close()
+    tmp.cleanup()
+    print("\n✅ 全部一致" if ok else "\n❌ 有不一致的結果")
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,184 @@
+# check_sql_backend.py — SQL 模式（sql_backend.SQLDataset）與記憶體模式（dataset.Dataset）的對照檢查
+# 同一份 transactions_clean.csv：一邊以 load_houses.py 載入 SQLite 替身（或 --mysql 用 DB_* 環境變數的 MySQL），
+# 一邊照 app.py 的流程建立記憶體資料集；逐一比對各 (city, district, usage) 的月 / 年均價、
+# 估價基準中位數、篩選結果與 /regions、/health、/debug 使用的查詢；確認版本在背景更新
+# （讀取 version 不在呼叫端查資料庫），最後比較啟動與查詢耗時。
+# 預設 CSV 不存在時先以 data/scripts/clean.py 重建（見 load_houses.ensure_clean_csv）。
+# 執行：python check_sql_backend.py [CSV 路徑] [--mysql]
+
+import argparse, os, sys, tempfile, threading, time
+import numpy as np
+import pandas as pd
+
+import database_get as db
+import load_houses
+from app import _normalize_admin
+from dataset import Dataset
+from derived_columns import add_risk_columns
+from partition_index import sort_for_index
+from sql_backend import SQLBaselines, SQLDataset
+
+def memory_dataset(csv_path) -> Dataset:
+    """與 load_houses.py 寫入的列相同（conform_frame、去除重複編號），再照 app.py 正規化與算風險欄"""
+    df = load_houses.read_clean_csv(csv_path).drop(columns="record_id")
+    df = sort_for_index(add_risk_columns(_normalize_admin(df)))
+    return Dataset(df, version="memory", last_modified="")
+
+def _same_frame(a: pd.DataFrame, b: pd.DataFrame) -> bool:
+    if a is None or b is None:
+        return a is None and b is None
+    if list(a.columns) != list(b.columns) or len(a) != len(b):
+        return False
+    for c in a.columns:
+        x, y = a[c].to_numpy(), b[c].to_numpy()
+        if x.dtype.kind == "f":
+            if not np.allclose(x, y, rtol=1e-9, atol=0, equal_nan=True):
+                return False
+        elif x.dtype != y.dtype or not (x == y).all():
+            return False
+    return True
+
+def _same_value(a: float, b: float) -> bool:
+    return (np.isnan(a) and np.isnan(b)) or bool(np.isclose(a, b, rtol=1e-9, atol=0))
+
+def keys(mem: Dataset) -> list:
+    """所有行政區 × (住家用, ALL)，加上城市全部、不存在的行政區"""
+    out = [(c, d, u) for c in ("NewTaipei", None) for d in ["ALL"] + sorted(mem.districts("NewTaipei"))
+           for u in ("住家用", "ALL")]
+    return out + [("NewTaipei", "不存在區", "住家用"), ("Taipei", "ALL", "ALL")]
+
+def check_cube(mem: Dataset, sql: SQLDataset, todo: list) -> bool:
+    ok = True
+    for period in ("monthly", "yearly"):
+        bad = [k for k in todo if not _same_frame(getattr(mem.cube, period)(*k), getattr(sql.cube, period)(*k))]
+        print(f"{'OK ' if not bad else 'NG '} {period}：{len(todo) - len(bad)}/{len(todo)} 個條件一致"
+              + (f"，不一致 {bad[:3]}" if bad else ""))
+        ok &= not bad
+    return ok
+
+def check_baselines(mem: Dataset, sql: SQLDataset, todo: list) -> bool:
+    bad = []
+    for k in todo:
+        a, b = mem.baselines.get(*k), sql.baselines.get(*k)
+        if (a is None) != (b is None) or (a is not None and not _same_value(a.median(), b.median())):
+            bad.append(k)
+    print(f"{'OK ' if not bad else 'NG '} 估價基準中位數：{len(todo) - len(bad)}/{len(todo)} 個條件一致"
+          + (f"，不一致 {bad[:3]}" if bad else ""))
+    return not bad
+
+def check_select(mem: Dataset, sql: SQLDataset) -> bool:
+    ok = True
+    lo, hi = mem.date_range()
+    mid = lo + (hi - lo) / 2
+    for kw in (dict(city="NewTaipei", district="板橋區", usage="住家用"),
+               dict(city="NewTaipei", usage="住家用", start_date=mid),
+               dict(district="淡水區", start_date=lo, end_date=mid.normalize()),
+               dict(city="NewTaipei", district="不存在區")):
+        a, b = mem.index.select(**kw), sql.index.select(**kw)
+        same = (len(a) == len(b) and _same_value(a["price_total"].sum(), b["price_total"].sum())
+                and _same_value(a["adj_price_per_ping"].sum(), b["adj_price_per_ping"].sum()))
+        print(f"{'OK ' if same else 'NG '} select {kw}：{len(a):,} / {len(b):,} 筆")
+        ok &= same
+    return ok
+
+def check_summary(mem: Dataset, sql: SQLDataset) -> bool:
+    checks = [
+        ("筆數", len(mem) == len(sql)),
+        ("日期範圍", mem.date_range() == sql.date_range()),
+        ("新北行政區", sorted(mem.districts("NewTaipei")) == sorted(sql.districts("NewTaipei"))),
+        ("行政區筆數", mem.district_counts().sort_values("district").to_numpy().tolist()
+                       == sql.district_counts().sort_values("district").to_numpy().tolist()),
+    ]
+    for city, usage in ((None, "住家用"), ("NewTaipei", None)):
+        # 端點只輸出日期字串，類別 / 字串欄與日期單位不同不影響結果
+        types = {"city": object, "district": object, "min_date": "datetime64[ns]", "max_date": "datetime64[ns]"}
+        a = mem.regions(city, usage).astype(types).sort_values(["city", "district"]).reset_index(drop=True)
+        b = sql.regions(city, usage).astype(types).sort_values(["city", "district"]).reset_index(drop=True)
+        checks.append((f"regions({city}, {usage})", _same_frame(a, b)))
+    for name, same in checks:
+        print(f"{'OK ' if same else 'NG '} {name}")
+    return all(same for _, same in checks)
+
+def check_refresh(pool) -> bool:
+    """ttl 到期後讀取 version 不在呼叫端查資料庫（背景 refresh）；新增一列後版本更新、估價基準換新"""
+    sql = SQLDataset(pool, version="sql", ttl=0)
+    before, baselines = sql.version, sql.baselines
+    if sql._refreshing is not None:
+        sql._refreshing.join()
+
+    calls = []
+    execute = pool.execute
+    pool.execute = lambda *a, **kw: (calls.append(threading.current_thread()), execute(*a, **kw))[1]
+    cols = ", ".join(f"`{c}`" for c in load_houses.DEFAULT_COLS)
+    try:
+        # 複製一筆成交（record_id 留空，不與唯一索引衝突）
+        execute(f"INSERT INTO `houses` ({cols}) SELECT {cols} FROM `houses` LIMIT 1")
+        sql.version
+        sql._refreshing.join()
+        checks = [
+            ("讀取 version 不在呼叫端查資料庫", threading.current_thread() not in calls and len(calls) == 1),
+            ("背景 refresh 後版本更新", sql.version != before
+             and len(sql) == execute("SELECT COUNT(*) FROM `houses`").fetchone()[0]),
+            ("版本更新後估價基準換新", sql.baselines is not baselines),
+        ]
+    finally:
+        pool.execute = execute
+        last = execute("SELECT MAX(`id`) FROM `houses`").fetchone()[0]
+        execute("DELETE FROM `houses` WHERE `id` = %s", (last,))
+    for name, same in checks:
+        print(f"{'OK ' if same else 'NG '} {name}")
+    return all(same for _, same in checks)
+
+def _timed(fn, repeat: int = 20) -> float:
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - t0) / repeat * 1000
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="SQL 模式與記憶體模式的對照檢查")
+    ap.add_argument("csv", nargs="?", default=str(load_houses.CSV_PATH))
+    ap.add_argument("--mysql", action="store_true", help="載入並查詢 DB_* 環境變數指定的 MySQL（會寫入 houses）")
+    args = ap.parse_args()
+    args.csv = str(load_houses.ensure_clean_csv(args.csv))
+    if not os.path.exists(args.csv):
+        print(f"❌ 找不到 {args.csv}，請先執行 data/scripts/clean.py")
+        return 1
+
+    tmp = tempfile.TemporaryDirectory()
+    pool = (db.mysql_pool(size=4, allow_local_infile=True) if args.mysql
+            else db.sqlite_pool(os.path.join(tmp.name, "houses.db"), size=4))
+    load_houses.load(args.csv, pool)
+
+    t0 = time.perf_counter()
+    mem = memory_dataset(args.csv)
+    t_mem = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    sql = SQLDataset(pool, version="sql")
+    t_sql = time.perf_counter() - t0
+    print(f"⏱️ 建立資料集：記憶體 {t_mem:.2f} 秒 ／ SQL {t_sql * 1000:.1f} ms")
+
+    todo = keys(mem)
+    ok = check_summary(mem, sql)
+    ok &= check_cube(mem, sql, todo)
+    ok &= check_baselines(mem, sql, todo)
+    ok &= check_select(mem, sql)
+    ok &= check_refresh(pool)
+
+    # 每次查詢的耗時（SQL 模式的估價基準查過一次就保留，這裡每次換新的 SQLBaselines 量未快取的成本）
+    for name, fn in (
+        ("monthly(NewTaipei, ALL, 住家用)", lambda: sql.cube.monthly("NewTaipei", "ALL", "住家用")),
+        ("monthly(NewTaipei, 板橋區, 住家用)", lambda: sql.cube.monthly("NewTaipei", "板橋區", "住家用")),
+        ("baseline(NewTaipei, 板橋區, 住家用)",
+         lambda: SQLBaselines(pool).get("NewTaipei", "板橋區", "住家用").median()),
+        ("baseline(NewTaipei, ALL, 住家用)", lambda: SQLBaselines(pool).get("NewTaipei", "ALL", "住家用").median()),
+    ):
+        print(f"⏱️ SQL {name}：{_timed(fn):.1f} ms")
+
+    pool.close()
+    tmp.cleanup()
+    print("\n✅ 全部一致" if ok else "\n❌ 有不一致的結果")
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,226 @@
+# check_sql_download.py — sql_download 的續傳與 SHA-256 驗證檢查
+# 在本機啟動支援 HTTP Range 的 http.server（背景執行緒），模擬：
+#   - 完整下載並讀取 <url>.sha256 驗證
+#   - 下載到一半連線中斷：同一次呼叫內重試續傳（重試間隔 2、4 秒）、以及下次呼叫時從 .part 續傳（確認送出的 Range）
+#   - .part 已是完整檔案（伺服器回 416）、伺服器不支援 Range（回 200，從頭下載）
+#   - SHA-256 不符：拋出 DownloadError，刪除 .part，不產生正式檔案
+#   - 伺服器回傳的 206 區段不是從 .part 結尾開始：捨棄 .part 從頭下載
+#   - .gz / .zst 壓縮的 dump 中斷後續傳，下載結果以 sql_dump.load_dump 解析與未壓縮的相同
+#     （.zst 需要 zstandard 套件，未安裝時略過）
+# 執行：python check_sql_download.py
+
+from pathlib import Path
+import gzip, hashlib, http.server, os, re, sys, tempfile, threading
+import numpy as np
+
+from sql_download import DownloadError, download, fetch_published_sha256, part_path
+from sql_dump import load_dump
+
+PAYLOAD = os.urandom(300_000) + b"INSERT INTO `houses` VALUES (...);\n" * 2000
+DIGEST = hashlib.sha256(PAYLOAD).hexdigest()
+
+class RangeServer(http.server.ThreadingHTTPServer):
+    """files：路徑 → 內容；cut_after：接下來幾次回應只送這麼多 bytes 就斷線；ranges：收到的 Range 起點；
+    ignore_offset：收到 Range 時仍回 206，但區段從 0 開始（模擬不正確的 proxy）"""
+
+    def __init__(self, files: dict):
+        super().__init__(("127.0.0.1", 0), RangeHandler)
+        self.files = files
+        self.cut_after = []
+        self.ranges = []
+        self.accept_ranges = True
+        self.ignore_offset = False
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+
+    def url(self, path: str) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/{path}"
+
+class RangeHandler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        srv = self.server
+        data = srv.files.get(self.path.lstrip("/"))
+        if data is None:
+            self.send_error(404)
+            return
+        start = 0
+        m = re.match(r"bytes=(\d+)-$", self.headers.get("Range", ""))
+        if m and srv.accept_ranges:
+            start = int(m.group(1))
+            srv.ranges.append(start)
+            if srv.ignore_offset:
+                start = 0
+            if start >= len(data):
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{len(data)}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{len(data) - 1}/{len(data)}")
+        else:
+            srv.ranges.append(None)
+            self.send_response(200)
+        body = data[start:]
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if srv.cut_after and not self.path.endswith(".sha256"):
+            # 宣告完整長度，卻只送一部分就關閉連線
+            self.wfile.write(body[:srv.cut_after.pop(0)])
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+def sample_dump(rows: int = 3000) -> bytes:
+    """houses 的小型 dump：每 500 列一句 INSERT，含 NULL 與需要跳脫的字串"""
+    rng = np.random.default_rng(0)
+    districts = ["板橋區", "新莊區", "淡水區", "O\\'Brien區"]
+    out = [b"-- sample dump\n"]
+    for s in range(0, rows, 500):
+        values = []
+        for i in range(s, min(rows, s + 500)):
+            year = 2015 + i % 10
+            price = int(rng.integers(3_000_000, 60_000_000))
+            ping = round(float(rng.uniform(10, 80)), 2)
+            values.append(
+                f"('{year}-{i % 12 + 1:02d}-15',{year},{i % 12 // 3 + 1},'新北市','{districts[i % 4]}',"
+                f"{i % 50},{ping * 3.3058:.2f},{ping},{price},{price / ping / 10000:.2f},{price / ping / 3.3058:.2f},"
+                f"'住家用',{'NULL' if i % 7 == 0 else repr(str(i % 30) + '層')},{i % 20},"
+                f"{'NULL' if i % 3 else round(i % 100 / 100, 3)})")
+        out.append(("INSERT INTO `houses` VALUES " + ",".join(values) + ";\n").encode("utf-8"))
+    return b"".join(out)
+
+def compressors() -> dict:
+    out = {".gz": gzip.compress}
+    try:
+        import zstandard
+        out[".zst"] = zstandard.ZstdCompressor().compress
+    except ImportError:
+        out[".zst"] = None
+    return out
+
+def _read(path) -> bytes:
+    return Path(path).read_bytes() if Path(path).exists() else b""
+
+def check(name: str, ok: bool, detail: str = "") -> bool:
+    print(f"{'OK ' if ok else 'NG '} {name}" + (f"：{detail}" if detail else ""))
+    return ok
+
+def main() -> int:
+    srv = RangeServer({"dump.sql": PAYLOAD, "dump.sql.sha256": f"{DIGEST}  dump.sql\n".encode()})
+    tmp = tempfile.TemporaryDirectory()
+    dest = Path(tmp.name) / "dump.sql"
+    url = srv.url("dump.sql")
+    ok = True
+
+    def reset():
+        for p in (dest, part_path(dest)):
+            if p.exists():
+                p.unlink()
+        srv.ranges.clear()
+        srv.cut_after.clear()
+        srv.accept_ranges = True
+
+    # 1. 完整下載 + 發布的 SHA-256
+    reset()
+    digest = fetch_published_sha256(url)
+    download(url, dest, sha256=digest, chunk_size=65536)
+    ok &= check("完整下載並驗證 <url>.sha256", digest == DIGEST and _read(dest) == PAYLOAD)
+    ok &= check("沒有發布 .sha256 時回傳 None", fetch_published_sha256(srv.url("other.sql")) is None)
+
+    # 2. 同一次呼叫內：前兩次回應中斷，重試時以 Range 續傳
+    reset()
+    srv.cut_after[:] = [100_000, 150_000]
+    download(url, dest, sha256=DIGEST, chunk_size=65536, retries=5)
+    ok &= check("中斷後自動重試續傳", _read(dest) == PAYLOAD and not part_path(dest).exists(),
+                f"Range 起點 {srv.ranges}")
+    ok &= check("續傳從已下載的位置開始", srv.ranges == [None, 100_000, 250_000])
+
+    # 3. 下載失敗留下 .part，下次呼叫（例如重新啟動）從 .part 續傳
+    reset()
+    srv.cut_after[:] = [120_000]
+    try:
+        download(url, dest, sha256=DIGEST, chunk_size=65536, retries=1)
+        failed = False
+    except DownloadError:
+        failed = True
+    have = len(_read(part_path(dest)))
+    ok &= check("中斷且不重試時保留 .part", failed and have == 120_000 and not dest.exists(), f"{have:,} bytes")
+    download(url, dest, sha256=DIGEST, chunk_size=65536)
+    ok &= check("下次呼叫從 .part 續傳", _read(dest) == PAYLOAD and srv.ranges[-1] == 120_000,
+                f"Range 起點 {srv.ranges}")
+
+    # 4. .part 已是完整檔案：伺服器回 416，直接驗證後改名
+    reset()
+    part_path(dest).write_bytes(PAYLOAD)
+    download(url, dest, sha256=DIGEST)
+    ok &= check("完整的 .part（416）直接驗證", _read(dest) == PAYLOAD and srv.ranges == [len(PAYLOAD)])
+
+    # 5. 伺服器不支援 Range：回 200 時捨棄 .part，從頭下載
+    reset()
+    srv.accept_ranges = False
+    part_path(dest).write_bytes(b"garbage" * 1000)
+    download(url, dest, sha256=DIGEST)
+    ok &= check("不支援 Range 時從頭下載", _read(dest) == PAYLOAD and srv.ranges == [None])
+
+    # 6. SHA-256 不符：拋出 DownloadError、刪除 .part、不產生正式檔案
+    reset()
+    try:
+        download(url, dest, sha256="0" * 64)
+        rejected = False
+    except DownloadError as e:
+        rejected = "SHA-256" in str(e)
+    ok &= check("SHA-256 不符時拒絕", rejected and not dest.exists() and not part_path(dest).exists())
+
+    # 7. 續傳接上被竄改的 .part：驗證失敗，下次重新下載即正確
+    reset()
+    part_path(dest).write_bytes(b"X" * 50_000)
+    try:
+        download(url, dest, sha256=DIGEST)
+        rejected = False
+    except DownloadError:
+        rejected = True
+    download(url, dest, sha256=DIGEST)
+    ok &= check("損毀的 .part 被拒絕後重新下載", rejected and _read(dest) == PAYLOAD)
+
+    # 8. 206 的區段不是從 .part 結尾開始：不可接上，捨棄 .part 從頭下載
+    reset()
+    part_path(dest).write_bytes(PAYLOAD[:100_000])
+    srv.ignore_offset = True
+    download(url, dest, sha256=DIGEST)
+    srv.ignore_offset = False
+    ok &= check("206 區段不符時從頭下載", _read(dest) == PAYLOAD and srv.ranges == [100_000, None],
+                f"Range 起點 {srv.ranges}")
+
+    # 9. 壓縮的 dump：中斷後續傳，解析結果與未壓縮的相同
+    plain = sample_dump()
+    plain_path = Path(tmp.name) / "plain.sql"
+    plain_path.write_bytes(plain)
+    expected = load_dump(plain_path, progress=None)
+    for ext, compress in compressors().items():
+        if compress is None:
+            print(f"--  {ext} dump：未安裝 zstandard，略過")
+            continue
+        data = compress(plain)
+        srv.files[f"dump.sql{ext}"] = data
+        target = Path(tmp.name) / f"dump.sql{ext}"
+        srv.ranges.clear()
+        srv.cut_after[:] = [len(data) // 2]
+        download(srv.url(f"dump.sql{ext}"), target, sha256=hashlib.sha256(data).hexdigest(),
+                 chunk_size=4096, retries=2)
+        got = load_dump(target, progress=None)
+        ok &= check(f"{ext} dump 續傳後解析", got.equals(expected) and srv.ranges == [None, len(data) // 2],
+                    f"{len(data):,} bytes，{len(got):,} 筆")
+
+    srv.shutdown()
+    srv.server_close()
+    tmp.cleanup()
+    print("\n✅ 全部通過" if ok else "\n❌ 有檢查未通過")
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
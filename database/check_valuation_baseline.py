@@ -0,0 +1,89 @@
+# check_valuation_baseline.py — BaselineTable.extended 的對照檢查
+# 以 app.py 整理好的資料（.cache/ 欄式快取，沒有時重新解析 dump）切成「原有」與「新增」兩部分，
+# extended 後每個彙總 key 的 latest / 筆數 / 中位數必須與整份資料直接建立的 BaselineTable 相同：
+#   - 最新一季整批加入（latest 往後移、移除超出視窗的成交、整段合併）
+#   - 隨機的小批次（逐筆 bisect），含比視窗還舊的成交、單價為空與沒有日期的列
+#   - 只有舊成交的一批（latest 不變）
+# 同時確認原本的表沒有被修改，最後比較 extended 與整份重建的耗時。
+# 執行：python check_valuation_baseline.py [SQL 檔案路徑]
+
+from pathlib import Path
+import sys, time
+import numpy as np
+import pandas as pd
+
+from app import _prepare_df
+from df_cache import load_or_build
+from valuation_baseline import BaselineTable
+
+SQL_PATH = "houseDatabase_version_1.sql"
+
+def snapshot(table: BaselineTable) -> dict:
+    return {k: (w.latest, len(w), w.median()) for k, w in table._windows.items()}
+
+def _same(a: dict, b: dict) -> list:
+    """不一致的 key（中位數以相對誤差 1e-12 比較，NaN 視為相同）"""
+    bad = []
+    for k in a.keys() | b.keys():
+        if k not in a or k not in b:
+            bad.append(k)
+            continue
+        (la, na, ma), (lb, nb, mb) = a[k], b[k]
+        if la != lb or na != nb or not (ma == mb or (np.isnan(ma) and np.isnan(mb))
+                                         or abs(ma - mb) <= 1e-12 * abs(mb)):
+            bad.append(k)
+    return bad
+
+def check(name: str, base: pd.DataFrame, batches: list) -> bool:
+    table = BaselineTable(base)
+    before = snapshot(table)
+    t0 = time.perf_counter()
+    out = table
+    for rows in batches:
+        out = out.extended(rows)
+    dt = time.perf_counter() - t0
+    bad = _same(snapshot(out), snapshot(BaselineTable(pd.concat([base, *batches], ignore_index=True))))
+    untouched = not _same(before, snapshot(table))
+    good = not bad and untouched
+    print(f"{'OK ' if good else 'BAD'} {name}：{len(out._windows)} 個 key，加入 {sum(map(len, batches)):,} 筆"
+          f"（{dt * 1000:.0f} ms）" + (f"，不一致 {bad[:3]}" if bad else "") + ("" if untouched else "，原本的表被修改"))
+    return good
+
+def main() -> int:
+    sql_path = Path(sys.argv[1] if len(sys.argv) > 1 else SQL_PATH)
+    df = load_or_build(sql_path, _prepare_df, required=("adj_price_per_ping", "risk_factor"))
+    df = df[["city", "district", "usage", "trade_date", "adj_price_per_ping"]].copy()
+    rng = np.random.default_rng(0)
+    ok = True
+
+    # 1. 最新一季整批加入
+    split = df["trade_date"].max() - pd.DateOffset(months=3)
+    ok &= check("最新一季整批加入", df[df["trade_date"] <= split], [df[df["trade_date"] > split]])
+
+    # 2. 隨機小批次：順序打亂，含舊成交、單價為空、沒有日期的列
+    pick = rng.permutation(len(df))
+    base, rest = df.iloc[pick[:-2000]], df.iloc[pick[-2000:]].copy()
+    rest.iloc[::7, rest.columns.get_loc("adj_price_per_ping")] = np.nan
+    rest.iloc[::11, rest.columns.get_loc("trade_date")] = pd.NaT
+    ok &= check("隨機小批次", base, [rest.iloc[i:i + 50] for i in range(0, len(rest), 50)])
+
+    # 3. 只有舊成交（latest 不變，早於視窗的不保留）
+    old = df["trade_date"] < df["trade_date"].min() + pd.DateOffset(years=2)
+    ok &= check("只有舊成交", df[~old], [df[old].iloc[:3000]])
+
+    # 耗時：extended 與整份重建
+    recent = df[df["trade_date"] > split]
+    table = BaselineTable(df[df["trade_date"] <= split])
+    t0 = time.perf_counter()
+    table.extended(recent)
+    t_ext = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    BaselineTable(df)
+    t_full = time.perf_counter() - t0
+    print(f"⏱️ 加入最新一季 {len(recent):,} 筆：extended {t_ext * 1000:.0f} ms ／ 整份重建 {t_full * 1000:.0f} ms")
+
+    print("\n✅ 全部一致" if ok else "\n❌ 有不一致的結果")
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
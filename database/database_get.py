@@ -1,82 +1,548 @@
-import mysql.connector
-
-link = mysql.connector.connect(
-    host = 'localhost',
-    port = 3306,
-    user = 'root',
-    password = 'zaxscdvf',
-    database = 'database001'
+# database_get.py — houses 資料表的查詢函式（連線池 + 參數化 prepared statement）
+# 原本 import 時建立一條全域連線與一個共用 cursor，每次查詢都覆蓋上一次的結果、也不能同時查詢：
+#   - ConnectionPool：最多 size 條連線，每次查詢借出一條、用完歸還；執行緒安全
+#   - SQL 與值分開傳（%s 參數），MySQL 使用伺服器端 prepared statement，
+#     同一條連線上重複的 SQL 直接沿用已 prepare 的 statement
+#   - 每次查詢回傳獨立的 QueryResult（結果已讀完），不同查詢互不影響
+#   - asyncio 中以 await arun(by_year, 2023) / await pool.aexecute(...) 在執行緒中查詢，不阻塞事件迴圈
+#   - 本機沒有 MySQL 時，set_pool(sqlite_pool("houses.db")) 改用 SQLite 替身（對照見 check_database_get.py）
+#
+# 連線設定（環境變數）：DB_HOST / DB_PORT / DB_USER / DB_PASSWORD / DB_NAME，
+# 連線池大小 DB_POOL_SIZE（預設 8）、借連線的等待上限 DB_POOL_TIMEOUT 秒（預設 30）；
+# DB_SQLITE=houses.db 時預設連線池改用該 SQLite 檔案
+#
+# 日期條件寫成半開區間（`trade_date` >= 起日 AND `trade_date` < 迄日），不對欄位套 YEAR() / MONTH()，
+# 才能使用 houses_indexes.sql 建立的索引（create_indexes() 套用，EXPLAIN 對照見 check_database_get.py）
+#
+# 查詢條件以 HouseQuery 組合（行政區 / 日期 / 總價 / 坪數 / 屋齡任選），只取需要的欄位，
+# 支援 keyset 分頁與串流（逐批讀取，不把整個結果留在記憶體）；by_* / search* 是組好的常用查詢
+
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, List, Optional, Sequence
+import asyncio, os, queue, re, sqlite3, threading, time
+
+from sql_dump import DEFAULT_COLS
+
+try:
+    import mysql.connector
+except ImportError:  # 只用 SQLite 替身時不需要
+    mysql = None
+
+DB_CONFIG = dict(
+    host=os.getenv("DB_HOST", "localhost"),
+    port=int(os.getenv("DB_PORT", 3306)),
+    user=os.getenv("DB_USER", "root"),
+    password=os.getenv("DB_PASSWORD", "zaxscdvf"),
+    database=os.getenv("DB_NAME", "database001"),
 )
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 8))
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 30))
+SQLITE_PATH = os.getenv("DB_SQLITE")  # 設定時 get_pool() 改用這個 SQLite 檔案（本機 / 測試用）
+STATEMENT_CACHE = 64  # 每條連線保留的 prepared statement 數
+INDEX_SQL = Path(__file__).with_name("houses_indexes.sql")
+HOUSE_COLUMNS = (*DEFAULT_COLS, "id", "record_id")  # houses_indexes.sql 加上的主鍵與實價登錄編號
+KEYSET = ("trade_date", "id")          # 分頁的排序鍵（必須唯一）
+STREAM_BATCH = 5000                    # 串流時每次向伺服器讀取的列數
+PING_AFTER = 60.0     # 閒置超過這麼多秒的連線，借出前先確認仍然連著（MySQL wait_timeout 會關掉閒置連線）
+
+class PoolTimeout(RuntimeError):
+    pass
+
+class QueryResult:
+    """一次查詢的完整結果；保留 fetchall() / fetchone()，原本當作 cursor 使用的程式不用修改"""
+
+    def __init__(self, columns: Sequence[str], rows: list):
+        self.column_names = tuple(columns)
+        self.rows = rows
+        self._pos = 0
+
+    def fetchone(self):
+        if self._pos >= len(self.rows):
+            return None
+        self._pos += 1
+        return self.rows[self._pos - 1]
+
+    def fetchall(self) -> list:
+        rows, self._pos = self.rows[self._pos:], len(self.rows)
+        return rows
+
+    @property
+    def rowcount(self) -> int:
+        return len(self.rows)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __iter__(self):
+        return iter(self.rows)
+
+class _Connection:
+    """借出中的連線；同一時間只有借用者使用，prepared cursor 的快取不需上鎖"""
+
+    def __init__(self, raw, prepared: bool):
+        self.raw = raw
+        self.prepared = prepared
+        self.last_used = time.monotonic()
+        self._statements = OrderedDict()  # SQL → (prepared cursor, SQL 物件)
+
+    def _cursor(self, sql: str):
+        if not self.prepared:
+            return self.raw.cursor(), sql
+        entry = self._statements.pop(sql, None)
+        if entry is None:
+            if len(self._statements) >= STATEMENT_CACHE:
+                self._statements.popitem(last=False)[1][0].close()
+            entry = (self.raw.cursor(prepared=True), sql)
+        self._statements[sql] = entry
+        # mysql.connector 以 `operation is not 上次的 operation` 判斷是否要重新 prepare，
+        # 所以要傳入第一次 prepare 時的同一個字串物件
+        return entry
+
+    def execute(self, sql: str, params: Sequence = ()) -> QueryResult:
+        cur, sql = self._cursor(sql)
+        try:
+            cur.execute(sql, tuple(params))
+            columns = [d[0] for d in cur.description] if cur.description else []
+            rows = cur.fetchall() if cur.description else []
+        finally:
+            if not self.prepared:
+                cur.close()
+        return QueryResult(columns, rows)
+
+    def stream(self, sql: str, params: Sequence = (), size: int = STREAM_BATCH):
+        """逐批讀取結果（MySQL 的 prepared cursor 不緩衝，fetchmany 才向伺服器讀列）"""
+        cur, sql = self._cursor(sql)
+        try:
+            cur.execute(sql, tuple(params))
+            columns = [d[0] for d in cur.description]
+            while True:
+                rows = cur.fetchmany(size)
+                if not rows:
+                    break
+                yield QueryResult(columns, rows)
+        finally:
+            if not self.prepared:
+                cur.close()
+
+    def close(self):
+        for cur, _ in self._statements.values():
+            try:
+                cur.close()
+            except Exception:
+                pass
+        self._statements.clear()
+        try:
+            self.raw.close()
+        except Exception:
+            pass
+
+class ConnectionPool:
+    """connect() 建立一條 DB-API 連線；最多 size 條，閒置的連線放回佇列重複使用
+
+    dialect 為 "mysql" 或 "sqlite"；paramstyle 為 "format"（%s，MySQL）或 "qmark"（?，SQLite），
+    查詢一律以 %s 撰寫，qmark 時自動換成 ?。ping(raw) 在連線閒置超過 PING_AFTER 秒後、借出前呼叫。
+    """
+
+    def __init__(self, connect: Callable, size: int = POOL_SIZE, paramstyle: str = "format",
+                 prepared: bool = False, timeout: float = POOL_TIMEOUT, ping: Optional[Callable] = None,
+                 dialect: str = "mysql"):
+        self._connect = connect
+        self.size = size
+        self.dialect = dialect
+        self.paramstyle = paramstyle
+        self.prepared = prepared
+        self.timeout = timeout
+        self._ping = ping
+        self._idle = queue.LifoQueue(maxsize=size)  # 後進先出：常用的連線保持溫熱
+        for _ in range(size):
+            self._idle.put(None)  # None：尚未建立的名額，第一次借出時才連線
+
+    def _checkout(self) -> _Connection:
+        try:
+            conn = self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise PoolTimeout(f"{self.timeout:g} 秒內沒有可用的資料庫連線（上限 {self.size} 條）") from None
+        try:
+            if conn is not None and self._ping and time.monotonic() - conn.last_used > PING_AFTER:
+                try:
+                    self._ping(conn.raw)
+                except Exception:
+                    conn.close()
+                    conn = None
+            if conn is None:
+                conn = _Connection(self._connect(), self.prepared)
+        except BaseException:
+            self._idle.put(None)
+            raise
+        return conn
+
+    @contextmanager
+    def connection(self):
+        """借出一條連線；with 區塊內發生例外時丟棄這條連線（可能已斷線或停在未讀完的結果上）"""
+        conn = self._checkout()
+        try:
+            yield conn
+        except BaseException:
+            conn.close()
+            self._idle.put(None)
+            raise
+        conn.last_used = time.monotonic()
+        self._idle.put(conn)
+
+    def sql(self, sql: str) -> str:
+        return sql.replace("%s", "?") if self.paramstyle == "qmark" else sql
+
+    def execute(self, sql: str, params: Sequence = ()) -> QueryResult:
+        with self.connection() as conn:
+            return conn.execute(self.sql(sql), params)
+
+    def stream(self, sql: str, params: Sequence = (), size: int = STREAM_BATCH):
+        """逐批產生 QueryResult；整個串流期間占用同一條連線"""
+        with self.connection() as conn:
+            yield from conn.stream(self.sql(sql), params, size)
+
+    async def aexecute(self, sql: str, params: Sequence = ()) -> QueryResult:
+        return await asyncio.get_running_loop().run_in_executor(None, self.execute, sql, params)
+
+    def close(self):
+        """關閉閒置的連線；借出中的連線在歸還後仍可使用
+
+        先取出佇列中全部的連線再放回空名額：LifoQueue 邊取邊放回時，下一次取到的會是剛放回的 None。
+        """
+        drained = []
+        while True:
+            try:
+                drained.append(self._idle.get_nowait())
+            except queue.Empty:
+                break
+        for conn in drained:
+            if conn is not None:
+                conn.close()
+        for _ in drained:
+            self._idle.put(None)
+
+def mysql_pool(size: int = POOL_SIZE, **config) -> ConnectionPool:
+    """MySQL / MariaDB 連線池；config 覆蓋 DB_CONFIG（host、port、user、password、database）"""
+    if mysql is None:
+        raise RuntimeError("需要 mysql-connector-python：pip install mysql-connector-python")
+    # autocommit：只讀查詢不留交易，避免 REPEATABLE READ 讓連線一直看到舊快照
+    cfg = {**DB_CONFIG, **config, "autocommit": True}
+    return ConnectionPool(lambda: mysql.connector.connect(**cfg), size, paramstyle="format",
+                          prepared=True, ping=lambda raw: raw.ping(reconnect=False))
+
+def sqlite_pool(path, size: int = POOL_SIZE) -> ConnectionPool:
+    """SQLite 替身（測試 / 本機用）；path 為檔案或 "file:...?mode=memory&cache=shared" 這類 URI
 
-base = link.cursor()
+    trade_date 以 "YYYY-MM-DD" 文字保存，與 MySQL 的 DATE 一樣可以用日期字串比較範圍。
+    """
+    path = str(path)
 
-def by_year(keyword): 
-    conment = "SELECT * FROM `houses` WHERE YEAR(`trade_date`) = " + str(keyword)
-    return output(conment)
+    def connect():
+        return sqlite3.connect(path, uri=path.startswith("file:"), check_same_thread=False,
+                               isolation_level=None)
+    return ConnectionPool(connect, size, paramstyle="qmark", dialect="sqlite")
+
+_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+
+def get_pool() -> ConnectionPool:
+    """預設的連線池：第一次查詢時才依 DB_CONFIG 建立（import 本模組不會連線）；
+    設定環境變數 DB_SQLITE 時改開該 SQLite 檔案"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = sqlite_pool(SQLITE_PATH) if SQLITE_PATH else mysql_pool()
+    return _pool
+
+def set_pool(pool: Optional[ConnectionPool]) -> Optional[ConnectionPool]:
+    """改用指定的連線池（例如 SQLite 替身），回傳原本的連線池"""
+    global _pool
+    with _pool_lock:
+        old, _pool = _pool, pool
+    return old
+
+def _table_info(pool: ConnectionPool):
+    # (已存在的索引, 已存在的欄位)
+    if pool.dialect == "sqlite":
+        indexes = "SELECT `name` FROM `sqlite_master` WHERE `type` = 'index' AND `tbl_name` = 'houses'"
+        columns = "SELECT `name` FROM pragma_table_info('houses')"
+    else:
+        indexes = ("SELECT DISTINCT `INDEX_NAME` FROM `information_schema`.`STATISTICS` "
+                   "WHERE `TABLE_SCHEMA` = DATABASE() AND `TABLE_NAME` = 'houses'")
+        columns = ("SELECT `COLUMN_NAME` FROM `information_schema`.`COLUMNS` "
+                   "WHERE `TABLE_SCHEMA` = DATABASE() AND `TABLE_NAME` = 'houses'")
+    return {row[0] for row in pool.execute(indexes)}, {row[0] for row in pool.execute(columns)}
+
+def _migration_statements(path=INDEX_SQL) -> List[str]:
+    text = "\n".join(line for line in Path(path).read_text(encoding="utf-8").splitlines()
+                     if not line.lstrip().startswith("--"))
+    return [st.strip() for st in text.split(";") if st.strip()]
+
+def query_indexes(path=INDEX_SQL) -> List[str]:
+    """houses_indexes.sql 中的一般（非 UNIQUE）查詢索引名稱；大量載入前可先移除、載入後再建"""
+    return [m.group(1) for st in _migration_statements(path)
+            for m in [re.match(r"CREATE\s+INDEX\s+`?(\w+)`?", st, re.I)] if m]
+
+def create_indexes(pool: Optional[ConnectionPool] = None, path=INDEX_SQL) -> List[str]:
+    """套用 houses_indexes.sql 中尚未套用的敘述，回傳新建的欄位 / 索引名稱
+
+    ADD COLUMN 依欄位是否存在、CREATE INDEX 依索引是否存在判斷；其他 ALTER TABLE（改欄位型別）
+    只在有索引要建立時執行。SQLite 不能事後加主鍵、也沒有 MODIFY，這兩種敘述只在 MySQL 執行
+    （SQLite 的替身表自行建立 id 欄，TEXT 欄可以直接建索引）。
+    """
+    pool = pool or get_pool()
+    statements = _migration_statements(path)
+    have_indexes, have_columns = _table_info(pool)
+    todo, alters = [], []
+    for st in statements:
+        index = re.match(r"CREATE\s+(?:UNIQUE\s+)?INDEX\s+`?(\w+)`?", st, re.I)
+        column = re.search(r"ADD\s+COLUMN\s+`?(\w+)`?", st, re.I)
+        if index and index.group(1) not in have_indexes:
+            todo.append((index.group(1), st))
+        elif column and column.group(1) not in have_columns:
+            if pool.dialect != "sqlite" or "PRIMARY KEY" not in st.upper():
+                todo.append((column.group(1), st))
+        elif not index and not column and re.match(r"ALTER\s+TABLE", st, re.I) and pool.dialect != "sqlite":
+            alters.append(st)
+    if not todo:
+        return []
+    with pool.connection() as conn:
+        cur = conn.raw.cursor()
+        for st in alters:
+            cur.execute(st)
+        for _, st in todo:
+            cur.execute(st)
+        cur.close()
+    return [name for name, _ in todo]
+
+# -----日期範圍（半開區間，字串與 DATE 欄比較時 MySQL 會轉成日期）-----
+DATE_RANGE = "`trade_date` >= %s AND `trade_date` < %s"
+
+def _year_range(year):
+    year = int(year)
+    return f"{year:04d}-01-01", f"{year + 1:04d}-01-01"
+
+def _month_range(year, month):
+    year, month = int(year), int(month)
+    nxt = (year + 1, 1) if month == 12 else (year, month + 1)
+    return f"{year:04d}-{month:02d}-01", f"{nxt[0]:04d}-{nxt[1]:02d}-01"
+
+def _date_param(value) -> str:
+    # date / datetime / Timestamp → "YYYY-MM-DD"（SQLite 替身以文字比較，不能帶時間）
+    return value.strftime("%Y-%m-%d") if hasattr(value, "strftime") else str(value)
+
+def _trade_years(pool: ConnectionPool):
+    # 資料涵蓋的年份（trade_date 有索引，MIN / MAX 直接讀索引兩端）
+    lo, hi = pool.execute("SELECT MIN(`trade_date`), MAX(`trade_date`) FROM `houses`").fetchone()
+    return range(int(str(lo)[:4]), int(str(hi)[:4]) + 1) if lo is not None else range(0)
+
+def _quote(columns) -> List[str]:
+    # 欄名不能當參數傳，只接受 houses 的欄位
+    columns = [columns] if isinstance(columns, str) else list(columns)
+    unknown = [c for c in columns if c not in HOUSE_COLUMNS]
+    if unknown:
+        raise ValueError(f"houses 沒有這些欄位：{', '.join(unknown)}")
+    return [f"`{c}`" for c in columns]
+
+class HouseQuery:
+    """houses 的條件查詢；filter() / select() 回傳新的查詢物件，可以逐步組合
+
+        q = HouseQuery(district="板橋區", price=(5e6, 2e7)).select("trade_date", "price_total")
+        q.fetch()                        # 一次取回（QueryResult）
+        page, after = q.page(500)        # keyset 分頁；下一頁 q.page(500, after)，after 為 None 表示沒有下一頁
+        for df in q.frames(10000): ...   # 串流：伺服器端逐批讀取（不緩衝整個結果），每批一個 DataFrame
+
+    city / district / usage：城市、行政區、用途，或其清單；start / end：交易日期半開區間 [start, end)；
+    year / month：年、年月，或只給 month 時為每一年的同一個月；
+    price / area / age：(下界, 上界)，包含兩端，任一端為 None 表示不限。
+    未指定欄位時為 SELECT *；分頁依 key（預設 trade_date, id）排序，key 欄位會自動加入結果。
+    """
+    FILTERS = ("city", "district", "usage", "start", "end", "year", "month", "price", "area", "age")
+    EQUALS = ("city", "district", "usage")
+    RANGES = (("price", "price_total"), ("area", "area_ping"), ("age", "age_years"))
+
+    def __init__(self, columns: Optional[Sequence[str]] = None, key: Sequence[str] = KEYSET, **filters):
+        unknown = sorted(set(filters) - set(self.FILTERS))
+        if unknown:
+            raise TypeError(f"不支援的條件：{', '.join(unknown)}")
+        _quote(key)
+        if columns:
+            _quote(columns)
+        self.columns = tuple(columns) if columns else None
+        self.key = tuple(key)
+        self.filters = {k: v for k, v in filters.items() if v is not None}
+
+    def filter(self, **filters) -> "HouseQuery":
+        return HouseQuery(self.columns, self.key, **{**self.filters, **filters})
+
+    def select(self, *columns: str) -> "HouseQuery":
+        return HouseQuery(columns or None, self.key, **self.filters)
+
+    def _date_ranges(self, pool: ConnectionPool) -> Optional[list]:
+        year, month = self.filters.get("year"), self.filters.get("month")
+        if year is not None and month is not None:
+            return [_month_range(year, month)]
+        if year is not None:
+            return [_year_range(year)]
+        if month is not None:
+            return [_month_range(y, month) for y in _trade_years(pool)]
+        return None
+
+    def _where(self, pool: ConnectionPool):
+        f, conds, params = self.filters, [], []
+        for col in self.EQUALS:
+            if col not in f:
+                continue
+            values = f[col]
+            if isinstance(values, str):
+                conds.append(f"`{col}` = %s")
+                params.append(values)
+            else:
+                values = list(values)
+                conds.append(f"`{col}` IN (" + ", ".join(["%s"] * len(values)) + ")" if values else "1 = 0")
+                params += values
+        ranges = self._date_ranges(pool)
+        if ranges is not None:
+            if len(ranges) == 1:
+                conds.append(DATE_RANGE)
+            else:
+                conds.append("(" + " OR ".join(f"({DATE_RANGE})" for _ in ranges) + ")" if ranges else "1 = 0")
+            params += [v for r in ranges for v in r]
+        if "start" in f:
+            conds.append("`trade_date` >= %s")
+            params.append(_date_param(f["start"]))
+        if "end" in f:
+            conds.append("`trade_date` < %s")
+            params.append(_date_param(f["end"]))
+        for name, col in self.RANGES:
+            lower, upper = f.get(name, (None, None))
+            if lower is not None and upper is not None:
+                conds.append(f"`{col}` between %s AND %s")
+                params += [lower, upper]
+            elif lower is not None:
+                conds.append(f"`{col}` >= %s")
+                params.append(lower)
+            elif upper is not None:
+                conds.append(f"`{col}` <= %s")
+                params.append(upper)
+        return conds, params
+
+    def sql(self, pool: Optional[ConnectionPool] = None, after: Optional[Sequence] = None,
+            limit: Optional[int] = None):
+        """(SQL, 參數)；給 limit 或 after 時依 key 排序，after 為上一頁最後一列的 key 值"""
+        pool = pool or get_pool()
+        columns = self.columns
+        if columns and limit is not None:
+            columns = columns + tuple(k for k in self.key if k not in columns)
+        conds, params = self._where(pool)
+        if after is not None:
+            # (k1, k2) > (a1, a2) 展開成 k1 > a1 OR (k1 = a1 AND k2 > a2)，兩種資料庫都能走索引範圍
+            keys, after = _quote(self.key), list(after)
+            parts = []
+            for i in range(len(keys)):
+                parts.append("(" + " AND ".join([f"{k} = %s" for k in keys[:i]] + [f"{keys[i]} > %s"]) + ")")
+                params += after[:i] + [after[i]]
+            conds.append("(" + " OR ".join(parts) + ")")
+        sql = "SELECT " + (", ".join(_quote(columns)) if columns else "*") + " FROM `houses`"
+        if conds:
+            sql += " WHERE " + " AND ".join(conds)
+        if limit is not None or after is not None:
+            sql += " ORDER BY " + ", ".join(_quote(self.key))
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+        return sql, params
+
+    def fetch(self, pool: Optional[ConnectionPool] = None) -> QueryResult:
+        pool = pool or get_pool()
+        return pool.execute(*self.sql(pool))
+
+    def page(self, limit: int, after: Optional[Sequence] = None, pool: Optional[ConnectionPool] = None):
+        """(這一頁, 下一頁的 after)；不用 OFFSET，翻到後面的頁數也只讀 limit 列"""
+        pool = pool or get_pool()
+        result = pool.execute(*self.sql(pool, after=after, limit=limit))
+        if len(result) < limit:
+            return result, None
+        idx = [result.column_names.index(k) for k in self.key]
+        last = result.rows[-1]
+        return result, tuple(last[i] for i in idx)
+
+    def batches(self, size: int = STREAM_BATCH, pool: Optional[ConnectionPool] = None):
+        """逐批產生 QueryResult；串流期間占用一條連線，提早結束時該連線會被丟棄"""
+        pool = pool or get_pool()
+        yield from pool.stream(*self.sql(pool), size=size)
+
+    def stream(self, size: int = STREAM_BATCH, pool: Optional[ConnectionPool] = None):
+        """逐列產生結果（tuple）"""
+        for batch in self.batches(size, pool):
+            yield from batch
+
+    def frames(self, size: int = STREAM_BATCH, pool: Optional[ConnectionPool] = None):
+        """逐批產生 DataFrame"""
+        import pandas as pd
+        for batch in self.batches(size, pool):
+            yield pd.DataFrame.from_records(batch.rows, columns=list(batch.column_names))
+
+# -----原本的查詢函式（SELECT *，一次取回），改由 HouseQuery 組成-----
+def by_year(keyword):
+    return HouseQuery(year=keyword).fetch()
 
 def by_month(keyword):
-    conment = "SELECT * FROM `houses` WHERE MONTH(`trade_date`) = " + str(keyword)
-    return output(conment)
+    # 不限年份的某個月：資料涵蓋的每一年各一段範圍，以 OR 連接
+    return HouseQuery(month=keyword).fetch()
 
 def by_year_month(year,month):
-    conment = "SELECT * FROM `houses` WHERE YEAR(`trade_date`) = " + str(year) + " AND MONTH(`trade_date`) = " + str(month)
-    return output(conment)
+    return HouseQuery(year=year, month=month).fetch()
 
 def by_district(keyword):
-    conment = "SELECT * FROM `houses` WHERE `district` = '" + str(keyword) + "'"
-    return output(conment)
+    return HouseQuery(district=keyword).fetch()
 
 def by_district_year(keyword,year):
-    conment = "SELECT * FROM `houses` WHERE `district` = '" + str(keyword) + "' AND YEAR(`trade_date`) = " + str(year)
-    return output(conment)
+    return HouseQuery(district=keyword, year=year).fetch()
 
 def by_district_year_month(keyword,year,month):
-    conment = "SELECT * FROM `houses` WHERE `district` = '" + str(keyword) + "' AND YEAR(`trade_date`) = " + str(year) + " AND MONTH(`trade_date`) = " + str(month)
-    return output(conment)
+    return HouseQuery(district=keyword, year=year, month=month).fetch()
 
 def by_price(lower,upper):
-    conment = "SELECT * FROM `houses` WHERE `price_total` between " + str(lower) + " AND " + str(upper)
-    return output(conment)
+    return HouseQuery(price=(lower, upper)).fetch()
 
 def by_district_price(keyword,lower,upper):
-    conment = "SELECT * FROM `houses` WHERE `price_total` between " + str(lower) + " AND " + str(upper) + " AND `district` = '" + str(keyword) + "'"
-    return output(conment)
+    return HouseQuery(district=keyword, price=(lower, upper)).fetch()
 
 def by_district_price_time(keyword,lower,upper,year,month):
-    conment = "SELECT * FROM `houses` WHERE `price_total` between " + str(lower) + " AND " + str(upper) + " AND `district` = '" + str(keyword) + "' AND YEAR(`trade_date`) = " + str(year) + " AND MONTH(`trade_date`) = " + str(month)
-    return output(conment)
+    return HouseQuery(district=keyword, price=(lower, upper), year=year, month=month).fetch()
 
 def by_area(lower,upper):
-    conment = "SELECT * FROM `houses` WHERE `area_ping` between " + str(lower) + " AND " + str(upper)
-    return output(conment)
+    return HouseQuery(area=(lower, upper)).fetch()
 
 def by_district_area(keyword,lower,upper):
-    conment = "SELECT * FROM `houses` WHERE `area_ping` between " + str(lower) + " AND " + str(upper) + " AND `district` = '" + str(keyword) + "'"
-    return output(conment)
+    return HouseQuery(district=keyword, area=(lower, upper)).fetch()
 
 def by_district_area_price(keyword,a_lower,a_upper,p_lower,p_upper):
-    conment = "SELECT * FROM `houses` WHERE `area_ping` between " + str(a_lower) + " AND " + str(a_upper) + " AND `district` = '" + str(keyword) + "' AND `price_total` between " + str(p_lower) + " AND " + str(p_upper)
-    return output(conment)
+    return HouseQuery(district=keyword, area=(a_lower, a_upper), price=(p_lower, p_upper)).fetch()
 
 def by_age(lower,upper):
-    conment = "SELECT * FROM `houses` WHERE `age_years` between " + str(lower) + " AND " + str(upper)
-    return output(conment)
+    return HouseQuery(age=(lower, upper)).fetch()
 
 def by_district_age(keyword,lower,upper):
-    conment = "SELECT * FROM `houses` WHERE `age_years` between " + str(lower) + " AND " + str(upper) + " AND `district` = '" + str(keyword) + "'"
-    return output(conment)
+    return HouseQuery(district=keyword, age=(lower, upper)).fetch()
 
 def search(district,price,age,area):
-    conment = "SELECT * FROM `houses` WHERE `price_total` between " + str(price[0]) + " AND " + str(price[1]) + " AND `district` = '" + str(district) + "' AND `age_years` between " + str(age[0]) + " AND " + str(age[1]) + " AND `area_ping` between " + str(area[0]) + " AND " + str(area[1])
-    return output(conment)
+    return HouseQuery(district=district, price=tuple(price), age=tuple(age), area=tuple(area)).fetch()
 
 def search_bytime(district,price,age,area,time):
-    conment = "SELECT * FROM `houses` WHERE `price_total` between " + str(price[0]) + " AND " + str(price[1]) + " AND `district` = '" + str(district) + "' AND YEAR(`trade_date`) = " + str(time[0]) + " AND MONTH(`trade_date`) = " + str(time[1])+ " AND `age_years` between " + str(age[0]) + " AND " + str(age[1]) + " AND `area_ping` between " + str(area[0]) + " AND " + str(area[1])
-    return output(conment)
+    return HouseQuery(district=district, price=tuple(price), age=tuple(age), area=tuple(area),
+                      year=time[0], month=time[1]).fetch()
+
+def output(conment, params=()):
+    # 每次查詢向連線池借一條連線，回傳獨立的結果
+    return get_pool().execute(conment, params)
 
-def output(conment):
-    base.execute(conment)
-    return base
+async def arun(fn, *args):
+    """在 asyncio 中呼叫上面的查詢函式：await arun(by_district, '板橋區')"""
+    return await asyncio.get_running_loop().run_in_executor(None, fn, *args)
 
 #for row in by_district_age('鶯歌區',1,12).fetchall() :
-#    print(row)
\ No newline at end of file
+#    print(row)
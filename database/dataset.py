@@ -0,0 +1,149 @@
+# dataset.py — 資料集的背景載入與原子切換
+# 下載 + 解析 dump 需要數秒到數十秒，不能擋住 uvicorn 綁定 port：
+#   - Dataset：一次載入的結果（DF 與衍生的索引 / 彙總），建立後不再修改
+#   - DatasetLoader：在背景執行緒建立 Dataset，過程中回報階段與進度，
+#     完成後一次替換 current 參照，請求端永遠只看到完整的舊版或新版
+#   - 新一季資料以 Dataset.extended 在舊版旁建立新版（彙總與估價基準只處理新列），
+#     再經 DatasetLoader.update 切換，服務不中斷
+
+from typing import Callable, Dict, Optional
+import threading, time, traceback
+import pandas as pd
+
+from partition_index import PartitionIndex, sort_for_index
+from aggregate_cube import AggregateCube
+from valuation_baseline import BaselineTable
+
+def append_rows(df: pd.DataFrame, rows: pd.DataFrame) -> pd.DataFrame:
+    """合併新列並重新排序；類別欄取兩邊類別的聯集（依字串排序，與 _normalize_admin 一致）"""
+    cols = {}
+    for c in df.columns:
+        a, b = df[c], rows[c] if c in rows.columns else pd.Series(None, index=rows.index, dtype=object)
+        if isinstance(a.dtype, pd.CategoricalDtype) and isinstance(b.dtype, pd.CategoricalDtype):
+            # 快取載入的類別是 object、新解析的可能是 str，統一成 object 再重新編碼
+            cats = pd.Index(sorted(set(a.cat.categories) | set(b.cat.categories)), dtype=object)
+            cols[c] = pd.concat([a.cat.set_categories(cats), b.cat.set_categories(cats)], ignore_index=True)
+        else:
+            cols[c] = pd.concat([a, b], ignore_index=True)
+    return sort_for_index(pd.DataFrame(cols, columns=df.columns))
+
+class Dataset:
+    """DF 及其分區索引、月 / 年彙總、估價基準；version 作為 ETag 的依據，
+    ingested 為已套用的季度檔（檔名 → 筆數）"""
+
+    def __init__(self, df: pd.DataFrame, version: str, last_modified: str,
+                 cube: Optional[AggregateCube] = None, baselines: Optional[BaselineTable] = None,
+                 ingested: Optional[Dict[str, int]] = None):
+        self.df = df
+        self.ingested = dict(ingested or {})
+        self.index = PartitionIndex(df)
+        self.cube = AggregateCube(df) if cube is None else cube
+        self.baselines = BaselineTable(df) if baselines is None else baselines
+        self.version = version
+        self.last_modified = last_modified
+
+    def extended(self, rows: pd.DataFrame, version: str, last_modified: str,
+                 name: Optional[str] = None) -> "Dataset":
+        """加入新成交（已正規化、已算風險欄）的新版本；自身不變，舊版可繼續服務。name 為來源檔名"""
+        ingested = {**self.ingested, name: len(rows)} if name else self.ingested
+        return Dataset(append_rows(self.df, rows), version, last_modified,
+                       cube=self.cube.extended(rows), baselines=self.baselines.extended(rows),
+                       ingested=ingested)
+
+    # 以下查詢在 SQL 模式由 sql_backend.SQLDataset 以相同介面提供
+    def __len__(self) -> int:
+        return len(self.df)
+
+    def date_range(self) -> tuple:
+        t = self.df["trade_date"]
+        return t.min(), t.max()
+
+    def districts(self, city: str) -> list:
+        """city 內出現過的行政區"""
+        return self.df.loc[self.df["city"] == city, "district"].dropna().unique().tolist()
+
+    def regions(self, city: Optional[str] = None, usage: Optional[str] = None) -> pd.DataFrame:
+        """(city, district) → 最早 / 最晚成交日與筆數，依筆數由多到少"""
+        sub = self.index.select(city=city, usage=usage)
+        return (sub.groupby(["city", "district"], observed=True)["trade_date"]
+                   .agg(min_date="min", max_date="max", n="size")
+                   .reset_index().sort_values("n", ascending=False))
+
+    def district_counts(self, raw: bool = False) -> pd.DataFrame:
+        """行政區筆數，由多到少；raw=True 時依 (原始名稱, 正規化後名稱) 分組"""
+        keys = ["district_raw", "district"] if raw else "district"
+        return (self.df.groupby(keys, observed=True).size().reset_index(name="n")
+                    .sort_values("n", ascending=False))
+
+class DatasetLoader:
+    """load(report) 在背景執行緒中建立 Dataset；report(phase, done, total, rows) 更新進度"""
+
+    def __init__(self, load: Callable[[Callable], Dataset]):
+        self._load = load
+        self._lock = threading.Lock()
+        self._update_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.current: Optional[Dataset] = None
+        self.state = "idle"  # idle → loading → ready / error
+        self.phase = ""
+        self.progress = {"done": 0, "total": 0, "rows": 0}
+        self.error: Optional[str] = None
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    def start(self):
+        """啟動背景載入；已在載入中時不重複啟動"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self.state, self.error = "loading", None
+            self.started_at, self.finished_at = time.time(), None
+            self._thread = threading.Thread(target=self._run, name="dataset-loader", daemon=True)
+            self._thread.start()
+
+    def report(self, phase: str, done: int = 0, total: int = 0, rows: int = 0):
+        self.phase = phase
+        self.progress = {"done": int(done), "total": int(total), "rows": int(rows)}
+
+    def publish(self, dataset: Dataset):
+        """原子替換目前的資料集（單一參照指派）"""
+        self.current = dataset
+        self.state, self.phase = "ready", "done"
+        self.finished_at = time.time()
+
+    def update(self, fn: Callable[[Dataset], Dataset]) -> Dataset:
+        """以 fn(目前版本) 建立新版本並切換；多個更新依序執行，不會互相覆蓋"""
+        with self._update_lock:
+            current = self.current
+            if current is None:
+                raise RuntimeError("dataset is not loaded yet")
+            dataset = fn(current)
+            self.publish(dataset)
+            return dataset
+
+    def _run(self):
+        try:
+            self.publish(self._load(self.report))
+        except Exception as e:
+            traceback.print_exc()
+            self.error = f"{type(e).__name__}: {e}"
+            self.state = "error" if self.current is None else "ready"
+            self.finished_at = time.time()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """等待背景載入結束（腳本 / 測試用）；回傳是否已有可用資料"""
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        return self.current is not None
+
+    def status(self) -> dict:
+        p = self.progress
+        pct = round(p["done"] / p["total"] * 100, 1) if p["total"] else None
+        end = self.finished_at or time.time()
+        return {
+            "state": self.state, "phase": self.phase,
+            "progress": {**p, "percent": pct},
+            "elapsed_sec": round(end - self.started_at, 1) if self.started_at else None,
+            "error": self.error,
+        }
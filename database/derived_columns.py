@@ -0,0 +1,43 @@
+# derived_columns.py — 風險係數與校正後單價（向量化）
+# app.py 的 _prepare_df 與 parse_sql_to_csv.py 的 add_derived_columns 共用
+
+import numpy as np
+import pandas as pd
+import math
+
+RISK_A0, RISK_K = 30.0, 0.12  # sigmoid 中心屋齡與斜率
+RISK_DEFAULT = 0.5            # 屋齡未知時的風險係數
+
+def risk_factor_scalar(age) -> float:
+    """單筆屋齡 → 風險係數（四捨五入到小數 3 位）"""
+    if age is None or pd.isna(age): return RISK_DEFAULT
+    return round(1.0 / (1.0 + math.exp(-RISK_K * (float(age) - RISK_A0))), 3)
+
+def risk_factor_from_age(age) -> np.ndarray:
+    """整欄屋齡 → 風險係數，結果與 risk_factor_scalar 逐筆計算完全相同"""
+    age = pd.to_numeric(pd.Series(age), errors="coerce").to_numpy(dtype=np.float64)
+    with np.errstate(over="ignore"):
+        sig = 1.0 / (1.0 + np.exp(-RISK_K * (age - RISK_A0)))
+    rf = np.round(sig, 3)
+
+    # np.exp 與 math.exp 可能差 1 ulp，np.round 也不是十進位精確捨入；
+    # 只有落在捨入邊界附近的值會受影響，這些少數值改用純 Python 重算
+    frac = sig * 1000.0 - np.floor(sig * 1000.0)
+    edge = np.flatnonzero(np.abs(frac - 0.5) < 1e-6)
+    for i in edge:
+        rf[i] = risk_factor_scalar(age[i])
+
+    rf[np.isnan(age)] = RISK_DEFAULT
+    return rf
+
+def add_risk_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """補齊缺漏的 risk_factor，並計算 adj_price_per_ping = 每坪單價 × (1 − 風險)"""
+    rf = pd.to_numeric(df["risk_factor"], errors="coerce").to_numpy(dtype=np.float64, copy=True)
+    missing = np.isnan(rf)
+    if missing.any():
+        rf[missing] = risk_factor_from_age(df["age_years"].to_numpy()[missing])
+    df["risk_factor"] = rf
+
+    price = pd.to_numeric(df["price_per_ping"], errors="coerce").to_numpy(dtype=np.float64)
+    df["adj_price_per_ping"] = price * (1.0 - rf)  # price 為 NaN 時結果自然為 NaN
+    return df
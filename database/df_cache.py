@@ -0,0 +1,162 @@
+# df_cache.py — 已整理好的 DataFrame 欄式快取
+# 每個欄位存成一個 .npy（文字 / 類別欄存 codes + categories），下次啟動以
+# memory-map 直接載入，不必重新解析 SQL dump。
+# 快取以 SQL 檔的 大小 + mtime + SHA-256 為鍵，dump 變動時自動重建；
+# 呼叫端以 required 指定必要欄位，其他 build 函式寫入的同名快取（缺欄）視為失效。
+#
+# 數值欄與類別 codes 都直接以 memory-map 當作 DataFrame 的底層陣列（不複製），
+# uvicorn --workers N 的多個 worker 共用同一份 page cache，記憶體不會隨 worker 數倍增；
+# 建立快取時以檔案鎖排隊，只有第一個 worker 解析 dump，其餘等待後直接載入。
+
+from pathlib import Path
+from contextlib import contextmanager
+from typing import Callable, Iterable, Optional
+import numpy as np
+import pandas as pd
+import hashlib, json, os, shutil, time
+
+try:
+    import fcntl
+except ImportError:  # Windows：不支援多 worker 共用，鎖退化為無作用
+    fcntl = None
+
+CACHE_VERSION = 4  # 快取格式或 _prepare_df 輸出改變時遞增，使舊快取失效
+CACHE_DIR = Path(os.getenv("DF_CACHE_DIR", Path(__file__).parent / ".cache"))
+HASH_CHUNK = 1 << 20
+
+def file_sha256(path) -> str:
+    """分塊計算檔案的 SHA-256"""
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(HASH_CHUNK), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def _cache_path(sql_path: Path, cache_dir: Path) -> Path:
+    return Path(cache_dir) / (Path(sql_path).stem + ".cols")
+
+def _fingerprint_matches(meta: dict, sql_path: Path) -> bool:
+    """大小不同必定失效；mtime 相同直接採用；mtime 不同時以 SHA-256 判定"""
+    st = sql_path.stat()
+    if meta.get("version") != CACHE_VERSION or meta.get("size") != st.st_size:
+        return False
+    if meta.get("mtime_ns") == st.st_mtime_ns:
+        return True
+    return meta.get("sha256") == file_sha256(sql_path)
+
+def save_df(df: pd.DataFrame, sql_path, cache_dir=CACHE_DIR) -> Path:
+    """將 df 逐欄寫入快取目錄（先寫暫存目錄再改名，避免半成品）"""
+    sql_path = Path(sql_path)
+    target = _cache_path(sql_path, cache_dir)
+    tmp = target.with_name(target.name + f".tmp{os.getpid()}")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+
+    columns = []
+    for i, c in enumerate(df.columns):
+        s = df[c]
+        fname = f"{i:02d}"
+        if isinstance(s.dtype, pd.CategoricalDtype):
+            # codes 保留 pandas 原本的整數寬度，載入時 from_codes 才能直接沿用 memory-map
+            kind, cats = "category", s.cat.categories.tolist()
+            codes = s.cat.codes.to_numpy()
+        elif s.dtype.kind in "biufcmM":
+            kind, cats = "array", None
+            np.save(tmp / f"{fname}.npy", s.to_numpy())
+        else:
+            # 文字欄：重複值極多，存 codes + 不重複值即可
+            kind = "object"
+            codes, uniques = pd.factorize(s.to_numpy(dtype=object))
+            cats = uniques.tolist()
+        if kind == "category":
+            np.save(tmp / f"{fname}.npy", codes)
+        elif kind == "object":
+            np.save(tmp / f"{fname}.npy", codes.astype(np.int32))
+        columns.append({"name": c, "file": fname, "kind": kind, "categories": cats})
+
+    st = sql_path.stat()
+    meta = {
+        "version": CACHE_VERSION, "size": st.st_size, "mtime_ns": st.st_mtime_ns,
+        "sha256": file_sha256(sql_path), "rows": int(len(df)),
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"), "columns": columns,
+    }
+    (tmp / "meta.json").write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+
+    shutil.rmtree(target, ignore_errors=True)
+    tmp.rename(target)
+    return target
+
+def load_df(sql_path, cache_dir=CACHE_DIR, required: Iterable[str] = ()) -> Optional[pd.DataFrame]:
+    """讀取有效的快取；不存在、已失效或缺少 required 欄位時回傳 None。數值欄與類別 codes 以唯讀 memory-map 載入"""
+    sql_path = Path(sql_path)
+    path = _cache_path(sql_path, cache_dir)
+    meta_path = path / "meta.json"
+    if not meta_path.exists() or not sql_path.exists():
+        return None
+    try:
+        meta = json.loads(meta_path.read_text(encoding="utf-8"))
+        if not _fingerprint_matches(meta, sql_path):
+            return None
+        missing = set(required) - {c["name"] for c in meta["columns"]}
+        if missing:
+            print(f"⚠️  快取缺少欄位 {sorted(missing)}，將重新建立")
+            return None
+        cols = {}
+        for col in meta["columns"]:
+            arr = np.load(path / f"{col['file']}.npy", mmap_mode="r")
+            if col["kind"] == "array":
+                cols[col["name"]] = arr
+            elif col["kind"] == "category":
+                cols[col["name"]] = pd.Categorical.from_codes(arr, categories=col["categories"], validate=False)
+            else:
+                uniques = np.array(col["categories"] + [None], dtype=object)
+                cols[col["name"]] = pd.Series(uniques.take(arr), dtype=object)
+        return pd.DataFrame(cols, columns=[c["name"] for c in meta["columns"]], copy=False)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"⚠️  快取讀取失敗，將重新建立: {e}")
+        return None
+
+@contextmanager
+def build_lock(sql_path, cache_dir=CACHE_DIR):
+    """同一份快取同時只讓一個行程建立（多個 worker 同時啟動時排隊）"""
+    if fcntl is None:
+        yield
+        return
+    lock_path = _cache_path(Path(sql_path), cache_dir).with_suffix(".lock")
+    try:
+        lock_path.parent.mkdir(parents=True, exist_ok=True)
+        fh = open(lock_path, "a")
+    except OSError:
+        yield  # 快取目錄不可寫：各自建立，不共用
+        return
+    with fh:
+        fcntl.flock(fh, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(fh, fcntl.LOCK_UN)
+
+def load_or_build(sql_path, build: Callable[[Path], pd.DataFrame], cache_dir=CACHE_DIR,
+                  required: Iterable[str] = ()) -> pd.DataFrame:
+    """有有效快取（含 required 欄位）就直接載入，否則呼叫 build(sql_path) 並寫入快取"""
+    required = tuple(required)
+    t0 = time.perf_counter()
+    df = load_df(sql_path, cache_dir, required)
+    if df is None:
+        with build_lock(sql_path, cache_dir):
+            # 等待鎖的期間可能已由其他 worker 建好
+            df = load_df(sql_path, cache_dir, required)
+            if df is None:
+                df = build(sql_path)
+                try:
+                    target = save_df(df, sql_path, cache_dir)
+                    print(f"💾 已寫入快取: {target}")
+                except OSError as e:
+                    # 唯讀磁碟等情況下照常服務，只是下次仍需重新解析
+                    print(f"⚠️  無法寫入快取: {e}")
+                    return df
+                # 改用 memory-map 版本，釋放解析時的私有記憶體，與其他 worker 共用同一份
+                mapped = load_df(sql_path, cache_dir, required)
+                return mapped if mapped is not None else df
+    print(f"⚡ 使用快取 {_cache_path(Path(sql_path), cache_dir)}（{time.perf_counter() - t0:.2f} 秒）")
+    return df
@@ -0,0 +1,44 @@
+# frame_json.py — DataFrame 直接序列化成 JSON bytes 的回應類別
+# to_dict(orient="records") 會為每一列建立一個 dict，FastAPI 的 jsonable_encoder
+# 再逐一轉換 Timestamp / numpy 純量；這裡改用 pandas 內建的 C 序列化器直接輸出，
+# 不經過逐列 dict。
+#   - records：[{"col": v, ...}, ...]，與原本的回應格式相同
+#   - columns：{"col": [v, ...], ...}，欄式輸出，體積較小、前端畫圖可直接使用
+# 日期輸出為 ISO 8601（"2024-01-01T00:00:00"），NaN / NaT 輸出為 null。
+
+from typing import Any
+import json
+import pandas as pd
+from fastapi.responses import Response
+
+FORMATS = ("records", "columns")
+_JSON_OPTS = dict(date_format="iso", date_unit="s", double_precision=15, force_ascii=False)
+
+def _dumps(value: Any) -> bytes:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def frame_to_json(df: pd.DataFrame, orient: str = "records") -> bytes:
+    """DataFrame → JSON bytes；orient 為 "records" 或 "columns" """
+    if orient == "records":
+        return df.to_json(orient="records", **_JSON_OPTS).encode("utf-8")
+    if orient == "columns":
+        parts = [_dumps(str(c)) + b":" + df[c].to_json(orient="values", **_JSON_OPTS).encode("utf-8")
+                 for c in df.columns]
+        return b"{" + b",".join(parts) + b"}"
+    raise ValueError(f"unknown orient: {orient}")
+
+class FrameJSONResponse(Response):
+    """content 可以是 DataFrame，或值含有 DataFrame 的 dict（其餘值以 json 序列化）"""
+    media_type = "application/json"
+
+    def __init__(self, content: Any, orient: str = "records", **kwargs):
+        self.orient = orient
+        super().__init__(content, **kwargs)
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, pd.DataFrame):
+            return frame_to_json(content, self.orient)
+        if isinstance(content, dict):
+            parts = [_dumps(str(k)) + b":" + self.render(v) for k, v in content.items()]
+            return b"{" + b",".join(parts) + b"}"
+        return _dumps(content)
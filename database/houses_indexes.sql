@@ -0,0 +1,24 @@
+-- houses_indexes.sql — houses 資料表的主鍵與查詢索引（database_get.py 的查詢依這些索引設計）
+-- 套用：mysql -u root -p database001 < houses_indexes.sql
+--   或：python -c "import database_get; database_get.create_indexes()"（已存在的欄位 / 索引會略過）
+--
+-- 日期條件一律寫成半開區間（trade_date >= 起日 AND trade_date < 迄日），
+-- 行政區相等 + 日期 / 總價 / 坪數 / 屋齡範圍可以直接在複合索引上做範圍掃描。
+
+-- district 若是 TEXT（例如由 pandas.to_sql 建立）不能直接建索引，先改成 VARCHAR
+ALTER TABLE `houses` MODIFY `district` VARCHAR(32) NULL;
+
+-- 自動編號主鍵：keyset 分頁依 (trade_date, id) 排序；InnoDB 的次要索引都附帶主鍵，
+-- 所以 (district, trade_date) 索引本身就是 (district, trade_date, id) 的順序，分頁不用另外排序
+ALTER TABLE `houses` ADD COLUMN `id` BIGINT UNSIGNED NOT NULL AUTO_INCREMENT PRIMARY KEY;
+
+-- 實價登錄的編號：load_houses.py 依此 upsert（重複載入同一季不會產生重複列）
+ALTER TABLE `houses` ADD COLUMN `record_id` VARCHAR(32) NULL;
+CREATE UNIQUE INDEX `uq_houses_record_id` ON `houses` (`record_id`);
+
+CREATE INDEX `idx_houses_district_date` ON `houses` (`district`, `trade_date`);
+CREATE INDEX `idx_houses_district_price` ON `houses` (`district`, `price_total`);
+CREATE INDEX `idx_houses_district_area` ON `houses` (`district`, `area_ping`);
+CREATE INDEX `idx_houses_district_age` ON `houses` (`district`, `age_years`);
+-- 不限行政區的 by_year / by_month / by_year_month
+CREATE INDEX `idx_houses_trade_date` ON `houses` (`trade_date`);
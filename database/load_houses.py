@@ -0,0 +1,241 @@
+# load_houses.py — 把 clean.py 的 transactions_clean.csv 大量載入 houses 資料表
+# 取代重播 houseDatabase_version_1.sql（一筆筆解析巨大的 INSERT）：
+#   1. 讀 CSV、以 sql_dump.conform_frame 轉成 houses 的欄位（與 dump 相同），另外帶上 record_id
+#   2. 確認資料表存在、套用 houses_indexes.sql（id 主鍵、record_id 唯一索引）
+#   3. 先移除查詢用的索引（--keep-indexes 可保留），整批寫入後再一次重建，不必每筆都更新索引；
+#      寫入失敗時只補回移除的索引（不套用 ALTER TABLE、不 ANALYZE），並拋出原本的錯誤
+#   4. 依 record_id upsert：已存在的編號更新內容、保留原本的 id；重複載入同一份檔案不會產生重複列
+#      - infile：LOAD DATA LOCAL INFILE 到暫存表，再以一句 INSERT ... SELECT ... ON DUPLICATE KEY UPDATE 合併
+#      - executemany：每批 --batch 筆的多列 INSERT ... ON DUPLICATE KEY UPDATE（SQLite 為 ON CONFLICT）
+#      - auto（預設）：伺服器允許 local_infile 時用 infile，否則 executemany
+#   5. 回報各階段耗時與每秒筆數
+#
+# 預設的 transactions_clean.csv 不進版本控制，找不到時先執行 data/scripts/clean.py 由 data/raw 重建。
+#
+# 執行：python load_houses.py [CSV 路徑] [--method auto|infile|executemany] [--batch 5000]
+#                           [--keep-indexes] [--sqlite houses.db]
+# MySQL 連線設定同 database_get.py（DB_HOST / DB_PORT / DB_USER / DB_PASSWORD / DB_NAME）
+
+from pathlib import Path
+from typing import Optional
+import argparse, os, re, subprocess, sys, tempfile, time
+import pandas as pd
+
+import database_get as db
+from sql_dump import DEFAULT_COLS, INT_COLS, STR_COLS, conform_frame
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+CSV_PATH = REPO_ROOT / "data" / "clean" / "transactions_clean.csv"
+CLEAN_SCRIPT = REPO_ROOT / "data" / "scripts" / "clean.py"
+LOAD_BATCH = 5000
+LOAD_COLS = [*DEFAULT_COLS, "record_id"]
+
+def ensure_clean_csv(csv_path=CSV_PATH) -> Path:
+    """預設路徑的 CSV 不存在時執行 clean.py 重建（clean.py 以 repo 根目錄為工作目錄）；其他路徑原樣回傳"""
+    csv_path = Path(csv_path)
+    if not csv_path.exists() and csv_path.resolve() == CSV_PATH:
+        print(f"🧹 找不到 {csv_path}，執行 {CLEAN_SCRIPT.relative_to(REPO_ROOT)} 重建...")
+        subprocess.run([sys.executable, str(CLEAN_SCRIPT)], cwd=REPO_ROOT, check=True)
+    return csv_path
+
+def _column_type(c: str) -> str:
+    if c == "trade_date":
+        return "DATE"
+    if c in STR_COLS:
+        return "VARCHAR(32)"
+    return "BIGINT" if c in INT_COLS or c == "price_total" else "DOUBLE"
+
+def houses_ddl(dialect: str) -> str:
+    """houses 資料表（與 dump 相同的欄位，加上 id 主鍵與 record_id）"""
+    cols = [f"`{c}` {_column_type(c)} NULL" for c in DEFAULT_COLS]
+    cols.append("`id` INTEGER PRIMARY KEY" if dialect == "sqlite"
+                else "`id` BIGINT UNSIGNED NOT NULL AUTO_INCREMENT PRIMARY KEY")
+    cols.append("`record_id` VARCHAR(32) NULL")
+    return "CREATE TABLE IF NOT EXISTS `houses` (\n  " + ",\n  ".join(cols) + "\n)"
+
+def read_clean_csv(path) -> pd.DataFrame:
+    """transactions_clean.csv → LOAD_COLS；沒有 record_id 的列無法 upsert，略過"""
+    df = pd.read_csv(path, encoding="utf-8-sig", low_memory=False)
+    out = conform_frame(df)
+    out["record_id"] = df["record_id"].astype(object).where(df["record_id"].notna(), None).to_numpy()
+    missing = out["record_id"].isna()
+    if missing.any():
+        print(f"⚠️  {int(missing.sum()):,} 筆沒有 record_id，略過")
+        out = out[~missing]
+    # 同一份檔案內重複的編號保留最後一筆（與逐批 upsert 的結果相同）
+    return out.drop_duplicates("record_id", keep="last")[LOAD_COLS].reset_index(drop=True)
+
+def _python_columns(df: pd.DataFrame) -> list:
+    # 每欄轉成 Python 純量（驅動程式不接受 numpy int64），NaN / NaT → None，日期 → "YYYY-MM-DD"
+    cols = []
+    for c in df.columns:
+        s = df[c]
+        if c == "trade_date":
+            vals = s.dt.strftime("%Y-%m-%d").astype(object)
+        else:
+            vals = s.astype(object)
+        cols.append(vals.where(s.notna(), None).tolist())
+    return cols
+
+def _upsert_sql(dialect: str, columns: list) -> str:
+    # VALUES(col)：MySQL 8.0.20 起建議改用別名寫法，但 MariaDB 只支援 VALUES()
+    names = ", ".join(f"`{c}`" for c in columns)
+    marks = ", ".join(["%s"] * len(columns))
+    updates = [c for c in columns if c != "record_id"]
+    if dialect == "sqlite":
+        return (f"INSERT INTO `houses` ({names}) VALUES ({marks}) ON CONFLICT(`record_id`) DO UPDATE SET "
+                + ", ".join(f"`{c}` = excluded.`{c}`" for c in updates))
+    return (f"INSERT INTO `houses` ({names}) VALUES ({marks}) ON DUPLICATE KEY UPDATE "
+            + ", ".join(f"`{c}` = VALUES(`{c}`)" for c in updates))
+
+def load_executemany(pool: db.ConnectionPool, df: pd.DataFrame, batch: int = LOAD_BATCH):
+    """每批 batch 筆的 upsert；mysql.connector 會把 executemany 的 INSERT 合併成一句多列 INSERT"""
+    sql = pool.sql(_upsert_sql(pool.dialect, list(df.columns)))
+    cols = _python_columns(df)
+    with pool.connection() as conn:
+        cur = conn.raw.cursor()
+        cur.execute("BEGIN")
+        for start in range(0, len(df), batch):
+            cur.executemany(sql, list(zip(*(c[start:start + batch] for c in cols))))
+        cur.execute("COMMIT")
+        cur.close()
+
+def _infile_text(df: pd.DataFrame) -> str:
+    # LOAD DATA 預設格式：tab 分隔、\N 為 NULL、反斜線跳脫
+    parts = []
+    for c in df.columns:
+        s = df[c]
+        if c == "trade_date":
+            t = s.dt.strftime("%Y-%m-%d")
+        elif c in STR_COLS or c == "record_id":
+            t = s.astype(object).where(s.notna(), None).astype(str)
+            t = t.str.replace("\\", "\\\\", regex=False).str.replace("\t", "\\t", regex=False) \
+                 .str.replace("\n", "\\n", regex=False)
+        elif c in INT_COLS or c == "price_total":
+            t = s.round().astype("Int64").astype(str)
+        else:
+            t = s.astype(str)  # 最短且可還原的十進位表示
+        parts.append(t.where(s.notna(), "\\N"))
+    return "\n".join(parts[0].str.cat(parts[1:], sep="\t")) + "\n"
+
+def load_infile(pool: db.ConnectionPool, df: pd.DataFrame):
+    """LOAD DATA LOCAL INFILE 到暫存表（沒有索引），再一次合併進 houses"""
+    names = ", ".join(f"`{c}`" for c in df.columns)
+    updates = ", ".join(f"`{c}` = VALUES(`{c}`)" for c in df.columns if c != "record_id")
+    with tempfile.NamedTemporaryFile("w", encoding="utf-8", suffix=".tsv", delete=False) as fh:
+        fh.write(_infile_text(df))
+    try:
+        with pool.connection() as conn:
+            cur = conn.raw.cursor()
+            cur.execute(f"CREATE TEMPORARY TABLE `houses_load` SELECT {names} FROM `houses` LIMIT 0")
+            cur.execute(f"LOAD DATA LOCAL INFILE %s INTO TABLE `houses_load` CHARACTER SET utf8mb4 ({names})",
+                        (fh.name,))
+            cur.execute("BEGIN")
+            cur.execute(f"INSERT INTO `houses` ({names}) SELECT {names} FROM `houses_load` "
+                        f"ON DUPLICATE KEY UPDATE {updates}")
+            cur.execute("COMMIT")
+            cur.execute("DROP TEMPORARY TABLE `houses_load`")
+            cur.close()
+    finally:
+        os.unlink(fh.name)
+
+def _local_infile_enabled(pool: db.ConnectionPool) -> bool:
+    if pool.dialect == "sqlite":
+        return False
+    try:
+        value = pool.execute("SELECT @@GLOBAL.local_infile").fetchone()[0]
+    except Exception:
+        return False
+    return str(value) in ("1", "ON")
+
+def drop_query_indexes(pool: db.ConnectionPool) -> list:
+    """移除 houses_indexes.sql 中的查詢索引（主鍵與 record_id 唯一索引保留，upsert 需要）"""
+    have, _ = db._table_info(pool)
+    dropped = [name for name in db.query_indexes() if name in have]
+    with pool.connection() as conn:
+        cur = conn.raw.cursor()
+        for name in dropped:
+            cur.execute(f"DROP INDEX `{name}`" + ("" if pool.dialect == "sqlite" else " ON `houses`"))
+        cur.close()
+    return dropped
+
+def restore_query_indexes(pool: db.ConnectionPool, names: list) -> list:
+    """載入失敗時重建先前移除的查詢索引；個別失敗只顯示警告，不蓋過原本的錯誤。回傳已重建的名稱"""
+    statements = {m.group(1): st for st in db._migration_statements()
+                  for m in [re.match(r"CREATE\s+INDEX\s+`?(\w+)`?", st, re.I)] if m}
+    restored = []
+    for name in names:
+        try:
+            pool.execute(statements[name])
+            restored.append(name)
+        except Exception as e:
+            print(f"⚠️  無法重建索引 {name}：{type(e).__name__}: {e}（重新執行 load_houses.py 會補上）")
+    return restored
+
+def _count(pool: db.ConnectionPool) -> int:
+    return int(pool.execute("SELECT COUNT(*) FROM `houses`").fetchone()[0])
+
+def load(csv_path=CSV_PATH, pool: Optional[db.ConnectionPool] = None, method: str = "auto",
+         batch: int = LOAD_BATCH, keep_indexes: bool = False) -> dict:
+    """載入並回傳統計（筆數、各階段秒數）"""
+    pool = pool or db.mysql_pool(size=1, allow_local_infile=True)
+    timings = {}
+
+    t0 = time.perf_counter()
+    df = read_clean_csv(csv_path)
+    timings["read"] = time.perf_counter() - t0
+    print(f"📄 {csv_path}：{len(df):,} 筆（{timings['read']:.2f} 秒）")
+
+    t0 = time.perf_counter()
+    pool.execute(houses_ddl(pool.dialect))
+    created = db.create_indexes(pool)
+    if created:
+        print(f"🧱 套用 houses_indexes.sql：{', '.join(created)}")
+    before = _count(pool)
+    dropped = [] if keep_indexes else drop_query_indexes(pool)
+    timings["prepare"] = time.perf_counter() - t0
+
+    if method == "auto":
+        method = "infile" if _local_infile_enabled(pool) else "executemany"
+    print(f"🚚 {method} 載入{'（暫時移除 ' + str(len(dropped)) + ' 個查詢索引）' if dropped else ''}...")
+    t0 = time.perf_counter()
+    try:
+        if method == "infile":
+            load_infile(pool, df)
+        else:
+            load_executemany(pool, df, batch)
+    except BaseException:
+        # 只補回剛才移除的查詢索引（不改欄位型別、不 ANALYZE），再拋出原本的錯誤
+        restore_query_indexes(pool, dropped)
+        raise
+    timings["load"] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    db.create_indexes(pool)
+    pool.execute("ANALYZE" if pool.dialect == "sqlite" else "ANALYZE TABLE `houses`")
+    timings["index"] = time.perf_counter() - t0
+
+    after = _count(pool)
+    total = sum(timings.values())
+    stats = {"rows": len(df), "inserted": after - before, "updated": len(df) - (after - before),
+             "method": method, "seconds": {k: round(v, 3) for k, v in timings.items()},
+             "rows_per_sec": round(len(df) / timings["load"]) if timings["load"] else None}
+    print(f"✅ {len(df):,} 筆：新增 {stats['inserted']:,}、更新 {stats['updated']:,}")
+    print(f"   讀檔 {timings['read']:.2f}s ／ 準備 {timings['prepare']:.2f}s ／ 寫入 {timings['load']:.2f}s"
+          f"（{stats['rows_per_sec']:,} 筆/秒）／ 重建索引 {timings['index']:.2f}s ／ 合計 {total:.2f}s")
+    return stats
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="把 transactions_clean.csv 大量載入 houses 資料表（依 record_id upsert）")
+    ap.add_argument("csv", nargs="?", default=str(CSV_PATH))
+    ap.add_argument("--method", choices=["auto", "infile", "executemany"], default="auto")
+    ap.add_argument("--batch", type=int, default=LOAD_BATCH, help="executemany 每批筆數")
+    ap.add_argument("--keep-indexes", action="store_true", help="載入時不移除查詢索引（少量增補時使用）")
+    ap.add_argument("--sqlite", help="改載入到 SQLite 檔案（本機測試用）")
+    args = ap.parse_args()
+    pool = db.sqlite_pool(args.sqlite, size=1) if args.sqlite else None
+    try:
+        load(ensure_clean_csv(args.csv), pool, args.method, args.batch, args.keep_indexes)
+    except Exception as e:
+        print(f"❌ {type(e).__name__}: {e}")
+        sys.exit(1)
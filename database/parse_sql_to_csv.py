@@ -2,23 +2,18 @@
 # 功能：將 MySQL dump 檔案轉換為 CSV 或 Excel
 # 執行：python parse_sql_to_csv.py
 
-from pathlib import Path
 import pandas as pd
 import re
-import math
 from datetime import datetime
 
+from sql_dump import DEFAULT_COLS, load_dump
+from derived_columns import add_risk_columns, risk_factor_scalar
+
 # ==================== 設定 ====================
 SQL_PATH = "houseDatabase_version_1.sql"
 OUTPUT_CSV = "houses_data.csv"
 OUTPUT_EXCEL = "houses_data.xlsx"
 
-DEFAULT_COLS = [
-    "trade_date", "year", "quarter", "city", "district", "age_years",
-    "area_m2", "area_ping", "price_total", "price_per_ping", "unit_price_m2",
-    "usage", "total_floors", "floor", "risk_factor"
-]
-
 NEWTAIPEI_29 = [
     "板橋區","三重區","中和區","永和區","新莊區","新店區","樹林區","鶯歌區","三峽區",
     "淡水區","汐止區","瑞芳區","土城區","蘆洲區","五股區","泰山區","林口區","深坑區",
@@ -27,6 +22,8 @@ NEWTAIPEI_29 = [
 ]
 
 # ==================== 解析函數 ====================
+# parse_sql_value / split_tuples 為逐字元的參考實作，
+# 實際載入改用 sql_dump.tokenize_values；保留供 bench_sql_tokenizer.py 比對。
 def parse_sql_value(val: str):
     """解析單個 SQL 值"""
     val = val.strip()
@@ -42,7 +39,7 @@ def parse_sql_value(val: str):
         return val
 
 def split_tuples(values_text: str) -> list:
-    """使用正則表達式切分並解析 tuple"""
+    """使用正則表達式切分並解析 tuple（參考實作）"""
     values_text = values_text.strip()
     rows = []
     
@@ -101,34 +98,12 @@ def split_tuples(values_text: str) -> list:
     return rows
 
 def load_sql_to_dataframe(sql_path: str) -> pd.DataFrame:
-    """載入 SQL dump 並轉換為 DataFrame"""
+    """載入 SQL dump 並轉換為 DataFrame（串流解析，見 sql_dump.py）"""
     print(f"📂 讀取檔案: {sql_path}")
-    text = Path(sql_path).read_text(encoding="utf-8", errors="ignore")
-    
-    print("🔍 尋找 INSERT 語句...")
-    pattern = re.compile(
-        r"INSERT\s+INTO\s+`?houses`?\s+VALUES\s*(.+?);",
-        flags=re.IGNORECASE | re.DOTALL
-    )
-    
-    all_rows = []
-    insert_count = 0
+    df = load_dump(sql_path)
+    print(f"✅ 解析出 {len(df):,} 筆資料")
     
-    for values_blob in pattern.findall(text):
-        insert_count += 1
-        rows = split_tuples(values_blob)
-        all_rows.extend(rows)
-        
-        if insert_count % 5 == 0:
-            print(f"  處理 {insert_count} 個 INSERT，累計 {len(all_rows):,} 筆資料...")
-    
-    print(f"✅ 共處理 {insert_count} 個 INSERT")
-    print(f"✅ 解析出 {len(all_rows):,} 筆資料")
-    
-    # 建立 DataFrame
-    df = pd.DataFrame(all_rows, columns=DEFAULT_COLS)
-    
-    # 資料型別轉換
+    # 資料型別轉換（load_dump 已將數值欄轉為 float64 / int64）
     df["trade_date"] = pd.to_datetime(df["trade_date"], errors="coerce")
     df["year"] = pd.to_numeric(df["year"], errors="coerce")
     df["quarter"] = pd.to_numeric(df["quarter"], errors="coerce")
@@ -220,27 +195,14 @@ def normalize_districts(df: pd.DataFrame) -> pd.DataFrame:
 # ==================== 計算衍生欄位 ====================
 def calculate_risk_factor(age):
     """計算風險係數（根據屋齡）"""
-    if pd.isna(age):
-        return 0.5
-    a0, k = 30.0, 0.12
-    return round(1.0 / (1.0 + math.exp(-k * (float(age) - a0))), 3)
+    return risk_factor_scalar(age)
 
 def add_derived_columns(df: pd.DataFrame) -> pd.DataFrame:
     """增加衍生欄位"""
     print("🔧 計算衍生欄位...")
     
-    # 填補風險係數
-    df["risk_factor"] = df.apply(
-        lambda row: calculate_risk_factor(row["age_years"]) if pd.isna(row["risk_factor"]) else row["risk_factor"],
-        axis=1
-    )
-    
-    # 調整後每坪單價
-    df["adj_price_per_ping"] = df.apply(
-        lambda row: None if pd.isna(row["price_per_ping"]) 
-                    else row["price_per_ping"] * (1 - row["risk_factor"]),
-        axis=1
-    )
+    # 填補風險係數、調整後每坪單價（向量化，見 derived_columns.py）
+    df = add_risk_columns(df)
     
     # 年月欄位
     df["year_month"] = df["trade_date"].dt.to_period("M").astype(str)
@@ -274,4 +236,39 @@ def print_statistics(df: pd.DataFrame):
         # 檢查29區完整性
         found_districts = set(newtaipei["district"].unique())
         missing = [d for d in NEWTAIPEI_29 if d not in found_districts]
-        print(f"\n✅ 新北市29區覆蓋:
\ No newline at end of file
+        print(f"\n✅ 新北市29區覆蓋: {29 - len(missing)}/29")
+        if missing:
+            print(f"⚠️  缺少的區域: {', '.join(missing)}")
+    
+    # 用途分布
+    print(f"\n用途分布:")
+    for usage, count in df["usage"].value_counts().head(10).items():
+        print(f"  • {usage}: {count:,} 筆")
+
+# ==================== 主程式 ====================
+def main():
+    """主程式"""
+    print("=" * 80)
+    print("🏠 SQL dump → CSV / Excel 轉換工具")
+    print("=" * 80)
+    
+    df = load_sql_to_dataframe(SQL_PATH)
+    df = normalize_districts(df)
+    df = add_derived_columns(df)
+    print_statistics(df)
+    
+    # 匯出 CSV（utf-8-sig 讓 Excel 正確顯示中文）
+    df.to_csv(OUTPUT_CSV, index=False, encoding="utf-8-sig")
+    print(f"\n💾 已匯出 CSV: {OUTPUT_CSV}")
+    
+    # 匯出 Excel（需要 openpyxl）
+    try:
+        df.to_excel(OUTPUT_EXCEL, index=False)
+        print(f"💾 已匯出 Excel: {OUTPUT_EXCEL}")
+    except ImportError as e:
+        print(f"⚠️  略過 Excel 匯出（{e}）")
+    
+    print(f"\n✅ 完成！{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+
+if __name__ == "__main__":
+    main()
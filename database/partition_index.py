@@ -0,0 +1,84 @@
+# partition_index.py — (city, district, usage) 分區索引
+# DF 事先依 (city, district, usage, trade_date) 排序，每個分區是一段連續列，
+# 篩選時只需查表取得區段，再以二分搜尋切日期，不必對整個 DataFrame 做遮罩。
+
+from typing import Optional
+import numpy as np
+import pandas as pd
+
+PARTITION_KEYS = ["city", "district", "usage"]
+SORT_KEYS = PARTITION_KEYS + ["trade_date"]
+
+def sort_for_index(df: pd.DataFrame) -> pd.DataFrame:
+    """依分區鍵與日期排序（NaT 排在各分區最後）"""
+    return df.sort_values(SORT_KEYS, kind="stable", na_position="last").reset_index(drop=True)
+
+class PartitionIndex:
+    """分區 → 列區段的查表索引；df 必須已經過 sort_for_index"""
+
+    def __init__(self, df: pd.DataFrame):
+        self.df = df
+        n = len(df)
+        # trade_date 轉成 int64（ns 以外的單位也一樣單調），NaT 以 valid_stop 排除
+        self.dates = df["trade_date"].to_numpy()
+        self.partitions = {}  # (city, district, usage) -> (start, valid_stop, stop)
+        if n == 0:
+            return
+
+        codes = [pd.factorize(df[c], use_na_sentinel=False) for c in PARTITION_KEYS]
+        change = np.zeros(n, dtype=bool)
+        change[0] = True
+        for c, _ in codes:
+            change[1:] |= c[1:] != c[:-1]
+        starts = np.flatnonzero(change)
+        stops = np.append(starts[1:], n)
+        nat = np.isnat(self.dates)
+        for a, b in zip(starts, stops):
+            key = tuple(uniques[c[a]] for c, uniques in codes)
+            valid = b - int(nat[a:b].sum())
+            self.partitions[key] = (int(a), int(valid), int(b))
+
+    def _ranges(self, city, district, usage, start_date, end_date) -> list:
+        lo = np.datetime64(pd.Timestamp(start_date)) if start_date else None
+        hi = np.datetime64(pd.Timestamp(end_date)) if end_date else None
+        if city and district and usage:
+            # 三個鍵都指定：直接查表，不掃描所有分區
+            hit = self.partitions.get((city, district, usage))
+            spans = [hit] if hit is not None else []
+        else:
+            spans = [span for (c, d, u), span in self.partitions.items()
+                     if (not city or c == city) and (not district or d == district) and (not usage or u == usage)]
+        ranges = []
+        for a, valid, b in spans:
+            if lo is None and hi is None:
+                ranges.append((a, b))
+                continue
+            # 有日期條件時 NaT 一律排除（與布林遮罩行為一致）
+            seg = self.dates[a:valid]
+            i = a + (np.searchsorted(seg, lo, side="left") if lo is not None else 0)
+            j = a + (np.searchsorted(seg, hi, side="right") if hi is not None else len(seg))
+            if i < j:
+                ranges.append((int(i), int(j)))
+        ranges.sort()
+        merged = []
+        for a, b in ranges:
+            if merged and merged[-1][1] == a:
+                merged[-1] = (merged[-1][0], b)
+            else:
+                merged.append((a, b))
+        return merged
+
+    def select(self, city: Optional[str] = None, district: Optional[str] = None,
+               usage: Optional[str] = None, start_date=None, end_date=None) -> pd.DataFrame:
+        """依條件取出資料；None 表示不限。單一連續區段時回傳切片（不複製）"""
+        ranges = self._ranges(city, district, usage, start_date, end_date)
+        if not ranges:
+            return self.df.iloc[0:0]
+        if len(ranges) == 1:
+            a, b = ranges[0]
+            return self.df.iloc[a:b]
+        pos = np.concatenate([np.arange(a, b) for a, b in ranges])
+        return self.df.take(pos)
+
+    def keys(self) -> list:
+        return list(self.partitions)
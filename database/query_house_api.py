@@ -57,6 +57,12 @@ def get_valuation(city, district, area_m2, usage="住家用"):
     )
     return response.json()
 
+def get_batch_valuation(items):
+    """批次估價：items 為 [{"district":..., "area_m2":..., ...}, ...]，一次請求取回全部結果"""
+    response = requests.post(f"{API_BASE}/valuation/batch", json=items)
+    response.raise_for_status()
+    return response.json()
+
 # ==================== 分析功能 ====================
 
 def print_health_report():
@@ -67,6 +73,14 @@ def print_health_report():
     
     try:
         health = get_health()
+        if health['status'] != "ok":
+            # 服務剛啟動，資料仍在背景載入（或載入失敗）
+            loading = health.get('loading', {})
+            pct = loading.get('progress', {}).get('percent')
+            print(f"⏳ 狀態: {health['status']}（{loading.get('phase', '')} {pct if pct is not None else '-'}%）")
+            if loading.get('error'):
+                print(f"❌ 載入錯誤: {loading['error']}")
+            return health
         print(f"✅ 狀態: {health['status']}")
         print(f"📊 總資料筆數: {health['rows']:,} 筆")
         print(f"📅 資料範圍: {health['date_range'][0]} ~ {health['date_range'][1]}")
@@ -213,18 +227,23 @@ def batch_valuation(district, areas=[50, 80, 100, 150]):
     print(f"\n{'面積(m²)':<12} {'面積(坪)':<12} {'每坪單價(萬)':<15} {'預估總價(萬)'}")
     print("-" * 80)
     
-    for area in areas:
-        try:
-            valuation = get_valuation("NewTaipei", district, area)
-            results.append(valuation)
-            
-            print(f"{valuation['area_m2']:<12} "
-                  f"{valuation['area_ping']:<12.2f} "
-                  f"{valuation['baseline_pp_ping']:<15,} "
-                  f"{valuation['est_total']:>12,}")
-            
-        except Exception as e:
-            print(f"{area:<12} 查詢失敗: {e}")
+    try:
+        items = [{"city": "NewTaipei", "district": district, "area_m2": area} for area in areas]
+        valuations = get_batch_valuation(items)
+    except Exception as e:
+        print(f"批次查詢失敗: {e}")
+        return results
+    
+    for area, valuation in zip(areas, valuations):
+        if "error" in valuation:
+            print(f"{area:<12} 查詢失敗: {valuation['error']}")
+            continue
+        results.append(valuation)
+        
+        print(f"{valuation['area_m2']:<12} "
+              f"{valuation['area_ping']:<12.2f} "
+              f"{valuation['baseline_pp_ping']:<15,} "
+              f"{valuation['est_total']:>12,}")
     
     return results
 
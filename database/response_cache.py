@@ -0,0 +1,132 @@
+# response_cache.py — 唯讀端點的回應快取（ETag / Last-Modified + LRU）
+# 資料載入後不會變動，同一路徑 + 查詢參數的回應只需產生一次：
+#   - 以 (路徑, 正規化後的 query string) 為 key，把序列化好的 JSON bytes 放進有上限的 LRU
+#   - ETag 由資料版本與 key 決定；快取中已有這個 key 的 200 回應時，條件式請求不必產生內容就能回 304，
+#     沒有時先執行端點，只有端點回 200 才比對 If-None-Match / If-Modified-Since（錯誤回應照常傳回）
+# 以 ASGI middleware 實作，必須註冊在 CORSMiddleware 內層，快取命中時仍會加上 CORS 標頭。
+
+from collections import OrderedDict
+from typing import Callable, Iterable, Optional
+from urllib.parse import parse_qsl, urlencode
+import hashlib, threading
+
+class ResponseCache:
+    """執行緒安全的 LRU：key → (資料版本, body, content-type)"""
+
+    def __init__(self, maxsize: int = 512):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def get(self, version: str, key: tuple) -> Optional[tuple]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] != version:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1], entry[2]
+
+    def put(self, version: str, key: tuple, body: bytes, content_type: bytes):
+        with self._lock:
+            self._data[key] = (version, body, content_type)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+def normalize_query(query_string: bytes) -> str:
+    """參數排序後重新編碼，?a=1&b=2 與 ?b=2&a=1 視為同一個 key"""
+    pairs = parse_qsl(query_string.decode("latin-1"), keep_blank_values=True)
+    return urlencode(sorted(pairs))
+
+def make_etag(version: str, key: tuple) -> str:
+    digest = hashlib.sha1(repr((version, key)).encode("utf-8")).hexdigest()[:16]
+    return f'"{digest}"'
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    tags = [t.strip() for t in if_none_match.split(",")]
+    return etag in tags or f"W/{etag}" in tags
+
+class ResponseCacheMiddleware:
+    """只處理 paths 內的 GET 請求；get_version() 回傳 None 時（例如資料載入中）不快取"""
+
+    def __init__(self, app, cache: ResponseCache, paths: Iterable[str],
+                 get_version: Callable[[], Optional[str]], get_last_modified: Callable[[], str]):
+        self.app = app
+        self.cache = cache
+        self.paths = set(paths)
+        self.get_version = get_version
+        self.get_last_modified = get_last_modified
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "GET" or scope["path"] not in self.paths:
+            return await self.app(scope, receive, send)
+        version = self.get_version()
+        if version is None:
+            return await self.app(scope, receive, send)
+
+        key = (scope["path"], normalize_query(scope.get("query_string", b"")))
+        etag = make_etag(version, key)
+        last_modified = self.get_last_modified()
+        validators = [
+            (b"etag", etag.encode("latin-1")),
+            (b"last-modified", last_modified.encode("latin-1")),
+            (b"cache-control", b"no-cache"),
+        ]
+
+        req_headers = {k.lower(): v.decode("latin-1") for k, v in scope["headers"]}
+        inm = req_headers.get(b"if-none-match")
+        ims = req_headers.get(b"if-modified-since")
+        not_modified = (inm is not None and _etag_matches(inm, etag)) or (inm is None and ims == last_modified)
+
+        hit = self.cache.get(version, key)
+        if hit is not None and not_modified:
+            await send({"type": "http.response.start", "status": 304, "headers": validators})
+            await send({"type": "http.response.body", "body": b""})
+            return
+        if hit is not None:
+            body, content_type = hit
+            await send({"type": "http.response.start", "status": 200, "headers": [
+                (b"content-type", content_type), (b"content-length", str(len(body)).encode()),
+                *validators, (b"x-cache", b"HIT"),
+            ]})
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        state = {"status": None, "content_type": b"application/json", "chunks": []}
+
+        async def capture(message):
+            if message["type"] == "http.response.start":
+                state["status"] = message["status"]
+                if message["status"] == 200:
+                    for k, v in message.get("headers", []):
+                        if k.lower() == b"content-type":
+                            state["content_type"] = v
+                    if not_modified:
+                        # 端點成功且驗證碼相符：內容仍放進快取，回給客戶端的是 304
+                        message = {"type": "http.response.start", "status": 304, "headers": validators}
+                    else:
+                        message = dict(message, headers=[*message.get("headers", []), *validators, (b"x-cache", b"MISS")])
+            elif message["type"] == "http.response.body" and state["status"] == 200:
+                state["chunks"].append(message.get("body", b""))
+                done = not message.get("more_body", False)
+                if done:
+                    self.cache.put(version, key, b"".join(state["chunks"]), state["content_type"])
+                if not_modified:
+                    if not done:
+                        return
+                    message = {"type": "http.response.body", "body": b""}
+            await send(message)
+
+        await self.app(scope, receive, capture)
@@ -0,0 +1,258 @@
+# sql_backend.py — 直接查資料庫的資料集（app.py 的 DATA_BACKEND=sql）
+# 記憶體模式（dataset.Dataset）啟動時把整份資料載入 DataFrame，再預先建立分區索引 / 彙總 / 估價基準；
+# SQL 模式啟動時只建立連線池（database_get.get_pool），每個請求把篩選與彙總交給資料庫：
+#   - SQLIndex.select：條件篩選（HouseQuery），只取回符合的列
+#   - SQLCube.monthly / yearly：資料庫端 GROUP BY 年月 / 年，結果欄位與 AggregateCube 相同
+#   - SQLBaselines.get(...).median()：近 24 個月視窗的中位數由資料庫以一句 window function 查詢算出
+#     （MySQL 8.0+ / MariaDB 10.2+ / SQLite 3.25+）
+#   - 校正後單價在 SQL 中計算（risk_factor 為空時依屋齡 sigmoid 補上，與 derived_columns 相同）
+# 介面與 Dataset 的 index / cube / baselines 相同，app.py 的端點不必區分兩種模式。
+# houses 的城市 / 行政區 / 用途必須已正規化（load_houses.py 載入的 clean.py 輸出即是）；
+# 原始 dump 的名稱寫法不一，只能用記憶體模式（載入時才正規化）。
+
+from email.utils import formatdate
+from typing import Optional
+import threading, time
+import numpy as np
+import pandas as pd
+
+import database_get as db
+from aggregate_cube import rollup_key
+from derived_columns import RISK_A0, RISK_DEFAULT, RISK_K, add_risk_columns
+from sql_dump import DEFAULT_COLS
+from valuation_baseline import WINDOW_MONTHS, _window_cut
+
+VERSION_TTL = 30.0  # 秒；版本（ETag）每隔這麼久在背景以 COUNT(*) / MAX(trade_date) 確認資料是否變動
+
+# 校正後單價 = 每坪單價 × (1 − 風險係數)，與 derived_columns.add_risk_columns 相同
+RISK_SQL = (f"COALESCE(`risk_factor`, CASE WHEN `age_years` IS NULL THEN {RISK_DEFAULT} "
+            f"ELSE ROUND(1.0 / (1.0 + EXP(-{RISK_K} * (`age_years` - {RISK_A0}))), 3) END)")
+ADJ_PRICE_SQL = f"`price_per_ping` * (1.0 - {RISK_SQL})"
+
+# 年 / 年月（YYYYMM 整數）的分組運算式；SQLite 替身的 trade_date 是 "YYYY-MM-DD" 文字
+PERIOD_SQL = {
+    "mysql": {"year": "YEAR(`trade_date`)",
+              "month": "YEAR(`trade_date`) * 100 + MONTH(`trade_date`)"},
+    "sqlite": {"year": "CAST(substr(`trade_date`, 1, 4) AS INTEGER)",
+               "month": "CAST(substr(`trade_date`, 1, 4) AS INTEGER) * 100 + CAST(substr(`trade_date`, 6, 2) AS INTEGER)"},
+}
+
+def _query(city=None, district=None, usage=None, **filters) -> db.HouseQuery:
+    """查詢參數 → HouseQuery；空值或 "ALL"（district / usage）表示不限，與 rollup_key 相同"""
+    c, d, u = rollup_key(city, district, usage)
+    return db.HouseQuery(city=c, district=d, usage=u, **filters)
+
+def _where(pool: db.ConnectionPool, query: db.HouseQuery, *extra: str):
+    conds, params = query._where(pool)
+    conds = conds + list(extra)
+    return (" WHERE " + " AND ".join(conds)) if conds else "", params
+
+def _dates(values) -> pd.Series:
+    # MySQL 回傳 date、SQLite 回傳 "YYYY-MM-DD" 文字
+    return pd.to_datetime(pd.Series(values, dtype=object)).astype("datetime64[ns]")
+
+class SQLIndex:
+    """PartitionIndex.select 的資料庫版本"""
+
+    def __init__(self, pool: db.ConnectionPool):
+        self.pool = pool
+
+    def select(self, city: Optional[str] = None, district: Optional[str] = None,
+               usage: Optional[str] = None, start_date=None, end_date=None) -> pd.DataFrame:
+        """依條件取出資料（含 adj_price_per_ping）；None 表示不限，日期兩端都包含"""
+        # PartitionIndex 的 end_date 包含當天，HouseQuery 的 end 不含，往後推一天
+        end = pd.Timestamp(end_date).normalize() + pd.Timedelta(days=1) if end_date else None
+        q = _query(city, district, usage, start=start_date or None, end=end).select(*DEFAULT_COLS)
+        result = q.fetch(self.pool)
+        df = pd.DataFrame.from_records(result.rows, columns=list(result.column_names))
+        df["trade_date"] = _dates(df["trade_date"])
+        return add_risk_columns(df)
+
+class SQLCube:
+    """AggregateCube 的資料庫版本：每次查詢在資料庫端 GROUP BY"""
+
+    def __init__(self, pool: db.ConnectionPool):
+        self.pool = pool
+
+    def _rollup(self, period: str, city, district, usage) -> Optional[pd.DataFrame]:
+        expr = PERIOD_SQL[self.pool.dialect][period]
+        where, params = _where(self.pool, _query(city, district, usage))
+        rows = self.pool.execute(
+            f"SELECT {expr} AS `period`, AVG(`price_per_ping`), AVG({ADJ_PRICE_SQL}), COUNT(*) "
+            f"FROM `houses`{where} GROUP BY `period` ORDER BY `period`", params).fetchall()
+        if not rows:
+            return None
+        # 沒有成交日期的列自成一組（period 為 NULL），與 AggregateCube 一樣不列出
+        rows = [r for r in rows if r[0] is not None]
+        p = np.array([int(r[0]) for r in rows], dtype=np.int64)
+        return pd.DataFrame({
+            period: (p.astype(np.int32) if period == "year" else
+                     ((p // 100 - 1970) * 12 + p % 100 - 1).astype("datetime64[M]").astype("datetime64[ns]")),
+            "avg_raw": np.array([r[1] for r in rows], dtype=np.float64),
+            "avg_adj": np.array([r[2] for r in rows], dtype=np.float64),
+            "n": np.array([r[3] for r in rows], dtype=np.int64),
+        })
+
+    def monthly(self, city, district="ALL", usage="ALL") -> Optional[pd.DataFrame]:
+        """月均價；沒有任何資料時回傳 None"""
+        return self._rollup("month", city, district, usage)
+
+    def yearly(self, city, district="ALL", usage="ALL") -> Optional[pd.DataFrame]:
+        """年均價；沒有任何資料時回傳 None"""
+        return self._rollup("year", city, district, usage)
+
+class SQLWindow:
+    """WindowMedian 的資料庫版本：latest 之前 months 個月內（含邊界）的校正後單價中位數"""
+
+    def __init__(self, pool: db.ConnectionPool, query: db.HouseQuery,
+                 latest: Optional[pd.Timestamp], months: int = WINDOW_MONTHS):
+        self.pool = pool
+        self.query = query
+        self.latest = latest
+        self.months = months
+        self._median: Optional[float] = None
+
+    def median(self) -> float:
+        """視窗內價格中位數；沒有資料時為 NaN（第一次查詢後保留結果）"""
+        if self._median is None:
+            self._median = self._query_median()
+        return self._median
+
+    def _query_median(self) -> float:
+        if self.latest is None:
+            return float("nan")
+        q = self.query.filter(start=_window_cut(self.latest, self.months))
+        where, params = _where(self.pool, q, "`price_per_ping` IS NOT NULL")
+        # 筆數與排序在同一句查詢內（同一個快照），期間有新資料寫入也不會錯位；
+        # 第 rn 筆為中間一筆（奇數）或兩筆（偶數）⇔ 2·rn ∈ {n, n+1, n+2}，只傳回一個值。
+        # SQL 內沒有依 n 變化的常數，同一條件重複查詢時沿用已 prepare 的 statement
+        row = self.pool.execute(
+            f"SELECT AVG(`adj`) FROM (SELECT `adj`, ROW_NUMBER() OVER (ORDER BY `adj`) AS `rn`, "
+            f"COUNT(*) OVER () AS `n` FROM (SELECT {ADJ_PRICE_SQL} AS `adj` FROM `houses`{where}) AS `w`) AS `r` "
+            f"WHERE 2 * `rn` IN (`n`, `n` + 1, `n` + 2)", params).fetchone()
+        return float(row[0]) if row and row[0] is not None else float("nan")
+
+class SQLBaselines:
+    """BaselineTable 的資料庫版本；查過的 key 保留視窗（資料版本變動時整個換新）"""
+
+    def __init__(self, pool: db.ConnectionPool, months: int = WINDOW_MONTHS):
+        self.pool = pool
+        self.months = months
+        self._windows = {}
+
+    def get(self, city, district, usage) -> Optional[SQLWindow]:
+        """查詢條件對應的視窗；該條件下沒有任何成交時回傳 None"""
+        key = rollup_key(city, district, usage)
+        window = self._windows.get(key)
+        if window is None:
+            q = _query(*key)
+            where, params = _where(self.pool, q)
+            # 與 WindowMedian 相同：latest 以所有成交計算（包含單價為空的成交）
+            n, latest = self.pool.execute(f"SELECT COUNT(*), MAX(`trade_date`) FROM `houses`{where}",
+                                          params).fetchone()
+            if not n:
+                return None
+            latest = pd.Timestamp(str(latest)) if latest is not None else None
+            window = self._windows[key] = SQLWindow(self.pool, q, latest, self.months)
+        return window
+
+class SQLDataset:
+    """Dataset 的資料庫版本；version 作為 ETag 的依據，資料表變動（例如 load_houses.py 載入新一季）後
+    最多 ttl 秒內更新，估價基準的快取也一併清除。只偵測筆數與最新成交日的變化。
+
+    version / baselines 只讀取已保存的戳記，不查資料庫（ResponseCacheMiddleware 在事件迴圈中讀取 version）；
+    超過 ttl 時另開背景執行緒 refresh()，完成前沿用舊版本。
+    """
+
+    def __init__(self, pool: db.ConnectionPool, version: str, months: int = WINDOW_MONTHS,
+                 ttl: float = VERSION_TTL):
+        self.pool = pool
+        self.index = SQLIndex(pool)
+        self.cube = SQLCube(pool)
+        self.months = months
+        self.ttl = ttl
+        self._prefix = version
+        self._lock = threading.Lock()
+        self._stamp = None
+        self._checked = 0.0
+        self._refreshing: Optional[threading.Thread] = None
+        self.refresh()
+
+    def refresh(self) -> bool:
+        """重新讀取資料戳記（筆數、最新成交日）；有變動時更新版本並回傳 True"""
+        count, latest = self.pool.execute("SELECT COUNT(*), MAX(`trade_date`) FROM `houses`").fetchone()
+        stamp = (int(count), str(latest))
+        with self._lock:
+            self._checked = time.monotonic()
+            if stamp == self._stamp:
+                return False
+            self._stamp = stamp
+            self._baselines = SQLBaselines(self.pool, self.months)
+            self._version = f"{self._prefix}-sql-{stamp[0]}-{stamp[1]}"
+            self.last_modified = formatdate(time.time(), usegmt=True)
+            return True
+
+    def _refresh_quietly(self):
+        try:
+            self.refresh()
+        except Exception as e:
+            # 資料庫暫時連不上：沿用舊版本，下一個 ttl 再試
+            print(f"⚠️  無法確認資料版本：{type(e).__name__}: {e}")
+            with self._lock:
+                self._checked = time.monotonic()
+
+    def _check(self):
+        """超過 ttl 時在背景重新讀取戳記；同一時間只有一個 refresh 執行緒"""
+        if time.monotonic() - self._checked <= self.ttl:
+            return
+        with self._lock:
+            if time.monotonic() - self._checked <= self.ttl or (
+                    self._refreshing is not None and self._refreshing.is_alive()):
+                return
+            self._refreshing = threading.Thread(target=self._refresh_quietly, name="sql-version", daemon=True)
+            self._refreshing.start()
+
+    @property
+    def version(self) -> str:
+        self._check()
+        return self._version
+
+    @property
+    def baselines(self) -> SQLBaselines:
+        self._check()
+        return self._baselines
+
+    def __len__(self) -> int:
+        return self._stamp[0]
+
+    def date_range(self) -> tuple:
+        lo, hi = self.pool.execute("SELECT MIN(`trade_date`), MAX(`trade_date`) FROM `houses`").fetchone()
+        return tuple(pd.Timestamp(str(v)) if v is not None else pd.NaT for v in (lo, hi))
+
+    def districts(self, city: str) -> list:
+        """city 內出現過的行政區"""
+        rows = self.pool.execute("SELECT DISTINCT `district` FROM `houses` "
+                                 "WHERE `city` = %s AND `district` IS NOT NULL", (city,)).fetchall()
+        return [r[0] for r in rows]
+
+    def regions(self, city: Optional[str] = None, usage: Optional[str] = None) -> pd.DataFrame:
+        """(city, district) → 最早 / 最晚成交日與筆數，依筆數由多到少"""
+        where, params = _where(self.pool, _query(city, None, usage),
+                               "`city` IS NOT NULL", "`district` IS NOT NULL")
+        rows = self.pool.execute(
+            f"SELECT `city`, `district`, MIN(`trade_date`), MAX(`trade_date`), COUNT(*) FROM `houses`{where} "
+            f"GROUP BY `city`, `district` ORDER BY COUNT(*) DESC, `city`, `district`", params).fetchall()
+        return pd.DataFrame({
+            "city": [r[0] for r in rows], "district": [r[1] for r in rows],
+            "min_date": _dates([r[2] for r in rows]), "max_date": _dates([r[3] for r in rows]),
+            "n": np.array([r[4] for r in rows], dtype=np.int64),
+        })
+
+    def district_counts(self, raw: bool = False) -> pd.DataFrame:
+        """行政區筆數，由多到少；raw=True 時多一欄 district_raw（資料表存的即是正規化後的名稱）"""
+        rows = self.pool.execute("SELECT `district`, COUNT(*) FROM `houses` WHERE `district` IS NOT NULL "
+                                 "GROUP BY `district` ORDER BY COUNT(*) DESC, `district`").fetchall()
+        out = pd.DataFrame({"district": [r[0] for r in rows], "n": np.array([r[1] for r in rows], dtype=np.int64)})
+        if raw:
+            out.insert(0, "district_raw", out["district"])
+        return out
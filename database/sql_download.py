@@ -0,0 +1,134 @@
+# sql_download.py — 遠端 dump 的續傳下載與 SHA-256 驗證
+# 下載到 <dest>.part，中斷後以 HTTP Range 從已下載的位置續傳（重試時與下次啟動皆然），
+# 完成後驗證 SHA-256 才改名為正式檔案，避免把不完整或損毀的檔案交給解析器。
+# 壓縮的 dump（.gz / .zst）原樣保存，解析時由 sql_dump.open_dump 邊讀邊解壓。
+#
+# 單獨執行：python sql_download.py <url> <dest> [--sha256 HEX]
+
+from pathlib import Path
+from typing import Callable, Optional
+import http.client, os, re, sys, time
+import urllib.error, urllib.request
+
+from df_cache import file_sha256
+
+DOWNLOAD_CHUNK = 1 << 20
+DOWNLOAD_TIMEOUT = float(os.getenv("DOWNLOAD_TIMEOUT", 30))
+DOWNLOAD_RETRIES = int(os.getenv("DOWNLOAD_RETRIES", 5))
+
+class DownloadError(RuntimeError):
+    pass
+
+def part_path(dest) -> Path:
+    dest = Path(dest)
+    return dest.with_name(dest.name + ".part")
+
+def fetch_published_sha256(url: str, timeout: float = DOWNLOAD_TIMEOUT) -> Optional[str]:
+    """讀取與檔案並列發布的 <url>.sha256（sha256sum 格式）；不存在時回傳 None"""
+    try:
+        with urllib.request.urlopen(url + ".sha256", timeout=timeout) as resp:
+            text = resp.read(4096).decode("ascii", errors="ignore").strip()
+    except urllib.error.HTTPError as e:
+        if e.code == 404:
+            return None
+        raise
+    digest = text.split()[0].lower() if text else ""
+    if len(digest) != 64 or any(ch not in "0123456789abcdef" for ch in digest):
+        raise DownloadError(f"無法辨識的 SHA-256 檔案內容: {text[:80]!r}")
+    return digest
+
+def _retryable(e: Exception) -> bool:
+    """連線中斷、逾時、5xx 可以重試；其他 4xx 重試也沒用"""
+    if isinstance(e, urllib.error.HTTPError):
+        return e.code >= 500
+    return isinstance(e, (urllib.error.URLError, http.client.HTTPException, OSError))
+
+def _range_start(content_range: Optional[str]) -> Optional[int]:
+    """Content-Range: bytes START-END/TOTAL 的起點；沒有或無法辨識時回傳 None"""
+    m = re.match(r"\s*bytes\s+(\d+)-\d+/(?:\d+|\*)\s*$", content_range or "")
+    return int(m.group(1)) if m else None
+
+def _fetch_into(url: str, part: Path, chunk_size: int, timeout: float,
+                progress: Optional[Callable[[int, int], None]]):
+    """把 url 的內容接在 part 後面；伺服器不支援 Range、或回傳的區段不是從 part 的結尾開始時從頭下載"""
+    have = part.stat().st_size if part.exists() else 0
+    headers = {"Range": f"bytes={have}-"} if have else {}
+    try:
+        resp = urllib.request.urlopen(urllib.request.Request(url, headers=headers), timeout=timeout)
+    except urllib.error.HTTPError as e:
+        if e.code == 416 and have:
+            return  # Range 超出檔尾：.part 已是完整檔案，交給 SHA-256 判定
+        raise
+    with resp:
+        if have and resp.status != 206:
+            have = 0
+        elif have and _range_start(resp.headers.get("Content-Range")) != have:
+            # 伺服器 / proxy 回了別的區段：接上去會讓 .part 錯位，捨棄後從頭下載
+            print(f"⚠️  續傳區段不符（要求 {have:,}-，收到 {resp.headers.get('Content-Range')}），從頭下載...")
+            resp.close()
+            part.unlink()
+            return _fetch_into(url, part, chunk_size, timeout, progress)
+        length = resp.headers.get("Content-Length")
+        total = have + int(length) if length is not None else 0
+        done = have
+        with open(part, "ab" if have else "wb") as fh:
+            while True:
+                chunk = resp.read(chunk_size)
+                if not chunk:
+                    break
+                fh.write(chunk)
+                done += len(chunk)
+                if progress:
+                    progress(done, total)
+    if total and done < total:
+        raise http.client.IncompleteRead(b"", total - done)
+
+def download(url: str, dest, sha256: Optional[str] = None,
+             progress: Optional[Callable[[int, int], None]] = None,
+             chunk_size: int = DOWNLOAD_CHUNK, timeout: float = DOWNLOAD_TIMEOUT,
+             retries: int = DOWNLOAD_RETRIES) -> Path:
+    """下載 url 到 dest（可續傳）；給定 sha256 時驗證，不符則刪除 .part 並拋出 DownloadError
+
+    progress(done_bytes, total_bytes) 每讀一塊呼叫一次；total 未知時為 0。
+    """
+    dest = Path(dest)
+    part = part_path(dest)
+    for attempt in range(1, retries + 1):
+        try:
+            _fetch_into(url, part, chunk_size, timeout, progress)
+            break
+        except Exception as e:
+            if not _retryable(e) or attempt == retries:
+                raise DownloadError(f"下載失敗（第 {attempt} 次）: {e}") from e
+            wait = min(2 ** attempt, 30)
+            have = part.stat().st_size if part.exists() else 0
+            print(f"⚠️  下載中斷（{e}），{wait} 秒後從 {have:,} bytes 續傳...")
+            time.sleep(wait)
+
+    if sha256:
+        actual = file_sha256(part)
+        if actual != sha256.lower():
+            part.unlink()
+            raise DownloadError(f"SHA-256 不符：預期 {sha256}，實際 {actual}")
+    part.replace(dest)
+    return dest
+
+def print_download_progress(done: int, total: int):
+    if total:
+        print(f"\r  下載 {done / total * 100:5.1f}%（{done / 1048576:.1f} / {total / 1048576:.1f} MB）",
+              end="" if done < total else "\n", flush=True)
+
+if __name__ == "__main__":
+    import argparse
+    ap = argparse.ArgumentParser(description="續傳下載 dump 並驗證 SHA-256")
+    ap.add_argument("url")
+    ap.add_argument("dest")
+    ap.add_argument("--sha256", help="預期的 SHA-256；省略時嘗試讀取 <url>.sha256")
+    args = ap.parse_args()
+    digest = args.sha256 or fetch_published_sha256(args.url)
+    try:
+        path = download(args.url, args.dest, sha256=digest, progress=print_download_progress)
+    except DownloadError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    print(f"✅ {path}（{'已驗證 SHA-256' if digest else '未提供 SHA-256'}）")
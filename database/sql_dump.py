@@ -0,0 +1,283 @@
+# sql_dump.py — houses 資料表 MySQL dump 的串流讀取與 tuple 解析
+# app.py（API 啟動）與 parse_sql_to_csv.py（CSV 匯出）共用
+#
+# 流程：分塊讀檔 → 切出完整 INSERT 語句 → 以編譯好的正則一次抓出整段 VALUES
+# 的所有欄位 → 直接轉成型別欄位（數值 float64、文字 object），不再逐字元掃描。
+
+from pathlib import Path
+from array import array
+import numpy as np
+import pandas as pd
+import re, math, warnings
+
+DEFAULT_COLS = [
+    "trade_date","year","quarter","city","district","age_years",
+    "area_m2","area_ping","price_total","price_per_ping","unit_price_m2",
+    "usage","total_floors","floor","risk_factor"
+]
+
+COL_ALIASES = {
+    "date":"trade_date", "tradedate":"trade_date",
+    "yr":"year", "yyyy":"year",
+    "q":"quarter","quart":"quarter",
+    "cty":"city","cityname":"city","city_name":"city",
+    "dist":"district","districtname":"district","district_name":"district",
+    "town":"district","region":"district","area_name":"district",
+    "age":"age_years","ageyear":"age_years",
+    "aream2":"area_m2","m2":"area_m2",
+    "areaping":"area_ping","ping":"area_ping",
+    "totalprice":"price_total","total_price":"price_total",
+    "pp_ping":"price_per_ping","priceperping":"price_per_ping",
+    "unitprice":"unit_price_m2","unitpricem2":"unit_price_m2",
+    "use":"usage","purpose":"usage",
+    "floors":"total_floors","totalfloor":"total_floors","total_floors":"total_floors",
+    "floorno":"floor","floor_num":"floor",
+    "risk":"risk_factor","riskfactor":"risk_factor"
+}
+
+# 欄位型別：文字欄保留字串，整數欄在沒有 NULL 時轉回 int64，其餘為 float64
+STR_COLS = {"trade_date", "city", "district", "usage", "total_floors"}
+INT_COLS = {"year", "quarter", "price_total"}
+
+SQL_CHUNK_SIZE = 1 << 20  # 每次讀取 1 MB
+_STMT_END = re.compile(rb";[ \t]*\r?\n")
+# 語句開頭可能有空白與註解（-- / # 單行、/* */ 區塊；mysqldump 常在 INSERT 前加 "-- Dumping data" 等說明）
+_INSERT_HEAD = re.compile(
+    r"(?:\s+|--[^\n]*(?:\n|$)|\#[^\n]*(?:\n|$)|/\*.*?\*/)*"
+    r"INSERT\s+INTO\s+`?houses`?\s*(\([^)]+\))?\s+VALUES\s*",
+    flags=re.IGNORECASE | re.DOTALL
+)
+
+def norm_colname(s: str) -> str:
+    """正規化欄位名稱"""
+    if not s: return s
+    k = s.strip().strip("`").strip()
+    k = re.sub(r"\s+", "", k)
+    k = k.replace("__", "_").replace("-", "_").lower()
+    k = k.replace(" ", "").replace("\t","").replace("\r","").replace("\n","")
+    if k in DEFAULT_COLS:
+        return k
+    return COL_ALIASES.get(k, k)
+
+# ===================== Tokenizer =====================
+# 單一欄位：'字串'（支援 \x 跳脫與 '' 重複引號）或裸值（數字 / NULL）
+_FIELD = r"\s*(?:'([^'\\]*(?:(?:\\.|'')[^'\\]*)*)'|([^,()'\s]*))\s*"
+_TUPLE_RE_CACHE = {}
+
+def _tuple_re(ncols: int):
+    """依欄位數編譯 (f1,f2,...,fn) 的正則；每個欄位佔兩個 group（引號內容, 裸值）"""
+    pat = _TUPLE_RE_CACHE.get(ncols)
+    if pat is None:
+        pat = re.compile(r"\(" + ",".join([_FIELD] * ncols) + r"\)", re.DOTALL)
+        _TUPLE_RE_CACHE[ncols] = pat
+    return pat
+
+_ESCAPES = {"0": "\0", "b": "\b", "n": "\n", "r": "\r", "t": "\t", "Z": "\x1a"}
+_ESCAPE_RE = re.compile(r"\\(.)|''", re.DOTALL)
+
+def unescape_sql_string(s: str) -> str:
+    """還原 MySQL 字串跳脫（\\' \\\\ \\n ... 與 ''）"""
+    if "\\" not in s and "''" not in s:
+        return s
+    return _ESCAPE_RE.sub(lambda m: "'" if m.group(1) is None else _ESCAPES.get(m.group(1), m.group(1)), s)
+
+def _to_float_array(values) -> np.ndarray:
+    """數值欄字串 → float64；NULL / 空字串 / 無法解析者為 NaN"""
+    n = len(values)
+    if n == 0:
+        return np.empty(0, dtype=np.float64)
+    # 整欄串成一個字串交給 NumPy 的 C 解析器；遇到異常值才退回逐格轉換
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", DeprecationWarning)
+            arr = np.fromstring(",".join(values).replace("NULL", "nan"), sep=",")
+        if arr.size == n:
+            return arr
+    except ValueError:
+        pass
+    return pd.to_numeric(pd.Series(values, dtype=object), errors="coerce").to_numpy(dtype=np.float64)
+
+def _to_str_array(quoted, bare) -> np.ndarray:
+    """文字欄 → object 陣列；相同字串共用同一物件，NULL 為 None"""
+    if bare.count("") == len(bare):
+        merged = quoted
+    else:
+        merged = [q if not b else (None if b == "NULL" else b) for q, b in zip(quoted, bare)]
+    codes, uniques = pd.factorize(np.array(merged, dtype=object))
+    uniques = np.array([unescape_sql_string(u) for u in uniques] + [None], dtype=object)
+    return uniques.take(codes)  # code -1（NULL）對應到最後的 None
+
+def tokenize_values(values_text: str, col_names: list, str_cols=STR_COLS) -> tuple:
+    """解析一段 VALUES 內容，直接輸出型別欄位
+
+    回傳 (筆數, {欄位名稱: ndarray})。欄位數不符 col_names 的 tuple 會被略過。
+    """
+    matches = _tuple_re(len(col_names)).findall(values_text)
+    if not matches:
+        return 0, {}
+    groups = list(zip(*matches))
+    del matches
+    cols = {}
+    for i, name in enumerate(col_names):
+        quoted, bare = groups[2 * i], groups[2 * i + 1]
+        if name in str_cols:
+            cols[name] = _to_str_array(quoted, bare)
+        else:
+            # 數值偶爾也會被加上引號，以裸值優先
+            cols[name] = _to_float_array(bare if bare.count("") == 0 else
+                                         [b or q for q, b in zip(quoted, bare)])
+    return len(groups[0]), cols
+
+# ===================== 串流讀取 =====================
+def iter_sql_statements(fh, chunk_size: int = SQL_CHUNK_SIZE):
+    """分塊讀取 dump，逐一產生完整語句 (bytes, 已讀位元組數)"""
+    buf = b""
+    done = 0
+    while True:
+        chunk = fh.read(chunk_size)
+        if not chunk:
+            break
+        done += len(chunk)
+        # 只在新讀入的部分（含前一塊尾端）尋找語句結尾，避免重複掃描
+        scan_from = max(len(buf) - 2, 0)
+        buf += chunk
+        pos = 0
+        for m in _STMT_END.finditer(buf, scan_from):
+            yield buf[pos:m.start()], done
+            pos = m.end()
+        buf = buf[pos:]
+    if buf.strip():
+        yield buf.rstrip().rstrip(b";"), done
+
+class ColumnBuffers:
+    """依欄位型別累積解析結果：數值欄存 array('d')，文字欄存 list"""
+
+    def __init__(self, columns=DEFAULT_COLS):
+        self.columns = list(columns)
+        self.data = {c: ([] if c in STR_COLS else array("d")) for c in self.columns}
+        self.rows = 0
+
+    def extend(self, n: int, cols: dict):
+        """附加一批 tokenize_values 的結果；缺少的欄位補 NULL"""
+        if not n: return
+        for c in self.columns:
+            vals = cols.get(c)
+            buf = self.data[c]
+            if c in STR_COLS:
+                buf.extend([None] * n if vals is None else vals)
+            elif vals is None:
+                buf.extend(array("d", [math.nan]) * n)
+            else:
+                buf.frombytes(np.ascontiguousarray(vals, dtype=np.float64).tobytes())
+        self.rows += n
+
+    def to_frame(self) -> pd.DataFrame:
+        """轉成 DataFrame；邊轉邊釋放緩衝區，峰值記憶體接近最終 DataFrame"""
+        cols = {}
+        for c in self.columns:
+            buf = self.data.pop(c)
+            if c in STR_COLS:
+                cols[c] = pd.Series(buf, dtype=object)
+            else:
+                arr = np.frombuffer(buf, dtype=np.float64).copy()
+                if c in INT_COLS and not np.isnan(arr).any():
+                    arr = arr.astype(np.int64)
+                cols[c] = arr
+            del buf
+        self.data = {}
+        return pd.DataFrame(cols, columns=self.columns)
+
+_GZIP_MAGIC = b"\x1f\x8b"
+_ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+def open_dump(sql_path):
+    """開啟 dump，依檔頭自動辨識 gzip / zstd 並邊讀邊解壓（不寫出解壓後的檔案）
+
+    回傳 (fh, raw)：從 fh 讀取解壓後內容，raw.tell() 為已讀取的壓縮前位元組數（進度用）。
+    zstd 需要另外安裝 zstandard 套件。
+    """
+    raw = open(sql_path, "rb")
+    magic = raw.read(4)
+    raw.seek(0)
+    if magic.startswith(_GZIP_MAGIC):
+        import gzip
+        return gzip.GzipFile(fileobj=raw, mode="rb"), raw
+    if magic == _ZSTD_MAGIC:
+        try:
+            import zstandard
+        except ImportError:
+            raw.close()
+            raise RuntimeError("讀取 .zst dump 需要 zstandard 套件：pip install zstandard")
+        return zstandard.ZstdDecompressor().stream_reader(raw), raw
+    return raw, raw
+
+# clean.py 輸出的 CSV 沒有這兩欄，以對應的原始欄位代替（與匯入 MySQL 時相同）
+CLEAN_CSV_FALLBACKS = {"area_m2": "building_area_m2", "floor": "transfer_floor_num"}
+
+def conform_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """其他來源（例如 clean.py 輸出的季度 CSV）→ 與 load_dump 相同的欄位與型別"""
+    df = df.rename(columns=lambda c: norm_colname(str(c)))
+    cols = {}
+    for c in DEFAULT_COLS:
+        src = c if c in df.columns else CLEAN_CSV_FALLBACKS.get(c)
+        s = df[src] if src in df.columns else pd.Series(np.nan, index=df.index)
+        if c in STR_COLS:
+            vals = s.astype(object).to_numpy()
+            cols[c] = pd.Series([None if pd.isna(v) else str(v) for v in vals], dtype=object)
+        else:
+            arr = pd.to_numeric(s, errors="coerce").to_numpy(dtype=np.float64)
+            if c in INT_COLS and not np.isnan(arr).any():
+                arr = arr.astype(np.int64)
+            cols[c] = arr
+    out = pd.DataFrame(cols, columns=DEFAULT_COLS)
+    out["trade_date"] = pd.to_datetime(out["trade_date"], errors="coerce")
+    return out
+
+def print_progress(done: int, total: int, rows: int):
+    pct = done / total * 100 if total else 100.0
+    print(f"  讀取 {pct:5.1f}%，累計 {rows:,} 筆...")
+
+def load_dump(sql_path, progress=print_progress, chunk_size: int = SQL_CHUNK_SIZE) -> pd.DataFrame:
+    """串流載入 houses 的 INSERT 語句，回傳 DEFAULT_COLS 欄位的 DataFrame
+
+    progress(done_bytes, total_bytes, rows) 會在每 5 個 INSERT 及結束時呼叫一次；
+    壓縮檔（gzip / zstd）的位元組數以壓縮前的檔案計算。trade_date 已轉成 datetime64。
+    """
+    sql_path = Path(sql_path)
+    if not sql_path.exists():
+        raise FileNotFoundError(f"SQL file not found: {sql_path}")
+    total = sql_path.stat().st_size
+
+    buffers = ColumnBuffers(DEFAULT_COLS)
+    insert_count = 0
+    done = 0
+
+    fh, raw = open_dump(sql_path)
+    with raw, fh:
+        for stmt, _ in iter_sql_statements(fh, chunk_size):
+            done = raw.tell()
+            text = stmt.decode("utf-8", errors="ignore")
+            head = _INSERT_HEAD.match(text)
+            if not head:
+                continue
+            insert_count += 1
+
+            # 取得欄位順序（如果有的話）
+            colgrp = head.group(1)
+            if colgrp:
+                col_names = [norm_colname(c.strip()) for c in colgrp.strip()[1:-1].split(",")]
+            else:
+                col_names = DEFAULT_COLS
+
+            buffers.extend(*tokenize_values(text[head.end():], col_names))
+            del text, stmt
+
+            if progress and insert_count % 5 == 0:
+                progress(done, total, buffers.rows)
+
+    if progress:
+        progress(done, total, buffers.rows)
+
+    df = buffers.to_frame()
+    df["trade_date"] = pd.to_datetime(df["trade_date"], errors="coerce")
+    return df
@@ -0,0 +1,147 @@
+# valuation_baseline.py — /valuation 的基準單價表
+# 每個 (city, district, usage)（含「全部」彙總）維護最近 24 個月的校正後單價，
+# 另存一份排序好的價格，中位數 O(1) 取得。
+# 新增成交（例如新一季資料）用 extended：只更新受影響的分區，不修改原本的表。
+#   - latest 往後移時，從依日期排序的一端移除超出視窗的成交，再從排序好的價格中刪去
+#   - 新成交少時逐筆 bisect 插入（O(log n) 找位置）；一次很多筆時先排序新成交、再與原本
+#     排序好的兩段合併（timsort 對兩段已排序的資料為線性），都不重新排序整個視窗
+
+from bisect import bisect_left, bisect_right
+from functools import lru_cache
+import copy
+from typing import Optional
+import numpy as np
+import pandas as pd
+
+from aggregate_cube import DIMS, rollup_key, rollup_levels
+
+WINDOW_MONTHS = 24
+# 插入 / 移除的筆數不超過這個數時逐筆 bisect，超過時改為整段合併（逐筆 list.insert 各需搬移 O(n)）
+BISECT_BATCH = 256
+
+def _window_cut(latest: pd.Timestamp, months: int) -> pd.Timestamp:
+    return latest - pd.DateOffset(months=months)
+
+@lru_cache(maxsize=1024)
+def _cut_ns(latest: pd.Timestamp, months: int) -> int:
+    """視窗起點（ns 整數）；同一批新增的各分區多半有相同的 latest，DateOffset 只算一次"""
+    return int(np.datetime64(_window_cut(latest, months), "ns").astype(np.int64))
+
+class WindowMedian:
+    """單一分區的滑動視窗：latest 之前 months 個月內（含邊界）的價格中位數"""
+
+    def __init__(self, dates: np.ndarray, prices: np.ndarray, months: int = WINDOW_MONTHS):
+        self.months = months
+        dates = np.asarray(dates, dtype="datetime64[ns]")
+        prices = np.asarray(prices, dtype=np.float64)
+        valid = ~np.isnat(dates)
+        self.latest = pd.Timestamp(dates[valid].max()) if valid.any() else None
+        self._dates, self._by_date, self._sorted = [], [], []
+        self._cut = None  # 視窗起點（ns 整數，含邊界）
+        if self.latest is None:
+            return
+        # 與原本相同：latest 以所有成交計算，中位數只取單價非空值
+        self._cut = _cut_ns(self.latest, months)
+        keep = valid & (dates.view(np.int64) >= self._cut) & ~np.isnan(prices)
+        order = np.argsort(dates[keep], kind="stable")
+        self._dates = dates[keep][order].view(np.int64).tolist()
+        self._by_date = prices[keep][order].tolist()
+        self._sorted = sorted(self._by_date)
+
+    def __len__(self) -> int:
+        return len(self._sorted)
+
+    def extended(self, dates: np.ndarray, prices: np.ndarray) -> "WindowMedian":
+        """加入一批成交後的新視窗（自身不變）"""
+        out = copy.copy(self)
+        out._dates, out._by_date, out._sorted = list(self._dates), list(self._by_date), list(self._sorted)
+        dates = np.asarray(dates, dtype="datetime64[ns]")
+        prices = np.asarray(prices, dtype=np.float64)
+        valid = ~np.isnat(dates)
+        if not valid.any():
+            return out
+        # latest 以所有成交計算（包含單價為空的成交），先移到這批的最新日期再插入
+        out._advance(pd.Timestamp(dates[valid].max()))
+        ns = dates.view(np.int64)
+        keep = valid & (ns >= out._cut) & ~np.isnan(prices)
+        if keep.sum() <= BISECT_BATCH:
+            for d, p in zip(ns[keep].tolist(), prices[keep].tolist()):
+                i = bisect_right(out._dates, d)
+                out._dates.insert(i, d)
+                out._by_date.insert(i, p)
+                out._sorted.insert(bisect_left(out._sorted, p), p)
+        else:
+            out._merge(ns[keep], prices[keep])
+        return out
+
+    def _advance(self, latest: pd.Timestamp):
+        """latest 往後移時更新視窗起點，並移除早於起點的成交"""
+        if self.latest is not None and latest <= self.latest:
+            return
+        self.latest = latest
+        self._cut = _cut_ns(latest, self.months)
+        k = bisect_left(self._dates, self._cut)
+        if k <= BISECT_BATCH:
+            for p in self._by_date[:k]:
+                del self._sorted[bisect_left(self._sorted, p)]
+        elif k:
+            # 移除的值排序後在 _sorted 中逐一定位（相同的值依序往後一格），一次刪除
+            prices = np.array(self._sorted, dtype=np.float64)
+            drop = np.sort(np.array(self._by_date[:k], dtype=np.float64))
+            repeat = np.arange(k) - np.searchsorted(drop, drop, side="left")
+            self._sorted = np.delete(prices, np.searchsorted(prices, drop, side="left") + repeat).tolist()
+        del self._dates[:k], self._by_date[:k]
+
+    def _merge(self, dates: np.ndarray, prices: np.ndarray):
+        """整段合併：新成交排序後與原本依日期、依價格排序的 list 合併"""
+        order = np.argsort(dates, kind="stable")
+        all_dates = np.concatenate([np.array(self._dates, dtype=np.int64), dates[order]])
+        all_prices = np.concatenate([np.array(self._by_date, dtype=np.float64), prices[order]])
+        # stable 排序對整數為 timsort：兩段已排序的資料只需一次合併，日期相同時舊成交在前
+        merged = np.argsort(all_dates, kind="stable")
+        self._dates = all_dates[merged].tolist()
+        self._by_date = all_prices[merged].tolist()
+        self._sorted = sorted(self._sorted + np.sort(prices).tolist())
+
+    def median(self) -> float:
+        """視窗內價格中位數；沒有資料時為 NaN"""
+        p, n = self._sorted, len(self._sorted)
+        if n == 0:
+            return float("nan")
+        m = n // 2
+        return p[m] if n % 2 else (p[m - 1] + p[m]) / 2
+
+class BaselineTable:
+    """所有彙總 key → WindowMedian"""
+
+    def __init__(self, df: pd.DataFrame, months: int = WINDOW_MONTHS):
+        self.months = months
+        self._windows = {}
+        for key, dates, prices in self._groups(df):
+            self._windows[key] = WindowMedian(dates, prices, months)
+
+    @staticmethod
+    def _groups(df: pd.DataFrame):
+        """逐一產生 (彙總 key, 日期, 校正後單價)，涵蓋所有彙總層級"""
+        dates = df["trade_date"].to_numpy().astype("datetime64[ns]")
+        prices = df["adj_price_per_ping"].to_numpy(dtype=np.float64)
+        for keep in rollup_levels():
+            groups = df.groupby(keep, observed=True).indices if keep else {(): np.arange(len(df))}
+            for key, idx in groups.items():
+                key = key if isinstance(key, tuple) else (key,)
+                values = dict(zip(keep, key))
+                yield tuple(values.get(d) for d in DIMS), dates[idx], prices[idx]
+
+    def extended(self, rows: pd.DataFrame) -> "BaselineTable":
+        """加入一批新成交後的新表（自身不變，可在服務中的舊表旁建立）；只更新受影響的 key"""
+        out = copy.copy(self)
+        out._windows = dict(self._windows)
+        for key, dates, prices in self._groups(rows):
+            old = self._windows.get(key)
+            out._windows[key] = (WindowMedian(dates, prices, self.months) if old is None
+                                 else old.extended(dates, prices))
+        return out
+
+    def get(self, city, district, usage) -> Optional[WindowMedian]:
+        """查詢條件對應的視窗；該條件下沒有任何成交時回傳 None"""
+        return self._windows.get(rollup_key(city, district, usage))